@@ -0,0 +1,111 @@
+"""
+Memory benchmark of the configuration loaders: core-structure.yaml parsed whole (populate_configuration)
+against streamed one DeploymentGroup / Environment Group at a time (populate_configuration(streaming=True)).
+
+Each loader runs in its own process, so the peak resident memory of one doesn't hide the other. The
+Python heap peak is measured with tracemalloc, and the loaded configurations are compared to check both
+loaders give the same result.
+
+Usage:
+    python benchmark/bench_config_loader.py --scale 1000
+    python benchmark/bench_config_loader.py --resources path/to/Resources
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOADERS = ('full', 'streaming')
+
+
+def _plain(value):
+    # models -> dicts, so both loaders can be compared by content
+    if hasattr(value, 'to_dict'):
+        return {key: _plain(item) for key, item in value.to_dict().items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def measure(resource_folder, loader):
+    """
+    Loads the configuration with the given loader in this process and returns its measurements.
+    """
+    import contextlib
+    import io
+    import tracemalloc
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        resource = None
+    from providers.YamlHelper import populate_configuration
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = populate_configuration(resource_folder, streaming=loader == 'streaming')
+    seconds = time.perf_counter() - start_time
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_rss = None
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    return {
+        'loader': loader,
+        'seconds': seconds,
+        'heap_peak_mb': peak / (1024 * 1024),
+        'heap_retained_mb': retained / (1024 * 1024),
+        'peak_rss_mb': peak_rss,
+        'components': sum(len(app['Components']) for app in config['applications']),
+        'services': sum(len(environment['Services']) for environment in config['environments']),
+        # canonical JSON, pickle output depends on which objects happen to be shared
+        'digest': hashlib.sha256(json.dumps(_plain(config), sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    }
+
+
+def run_loader(resource_folder, loader):
+    command = [sys.executable, os.path.abspath(__file__), '--resources', resource_folder, '--measure', loader]
+    process = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of the full and streaming configuration loaders")
+    parser.add_argument('--resources', default=None, help="Resources folder to load (default: fixtures generated at --scale)")
+    parser.add_argument('--scale', type=int, default=1000, help="Scale of the generated fixtures when --resources isn't given")
+    parser.add_argument('--measure', choices=LOADERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.resources, args.measure)))
+        return
+
+    resource_folder = args.resources
+    if resource_folder is None:
+        from generate_fixtures import generate_fixtures
+        resource_folder = generate_fixtures(args.scale, tempfile.mkdtemp(prefix=f"fixtures-x{args.scale}-"))
+
+    size_mb = os.path.getsize(os.path.join(resource_folder, 'core-structure.yaml')) / (1024 * 1024)
+    results = [run_loader(resource_folder, loader) for loader in LOADERS]
+    print(f"core-structure.yaml: {size_mb:.1f} MB, {results[0]['components']} components, {results[0]['services']} services")
+    print(f"{'Loader':<12}{'Seconds':>10}{'Heap peak MB':>15}{'Retained MB':>14}{'Peak RSS MB':>14}")
+    for result in results:
+        rss = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else '-'
+        print(f"{result['loader']:<12}{result['seconds']:>10.2f}{result['heap_peak_mb']:>15.1f}{result['heap_retained_mb']:>14.1f}{rss:>14}")
+    identical = len({result['digest'] for result in results}) == 1
+    print(f"Loaded configurations identical: {identical}")
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == '__main__':
+    main()
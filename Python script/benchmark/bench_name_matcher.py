@@ -0,0 +1,96 @@
+"""
+Benchmark of the autolink application/service name matching: NameMatcher against the pairwise
+comparison of every application with every service it replaces.
+
+The pairwise loop is timed on a sample of applications and extrapolated, and the matches of the
+sample are compared with NameMatcher's to check both give the same result.
+
+Usage:
+    python benchmark/bench_name_matcher.py --applications 10000 --services 50000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+import Levenshtein
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from providers.NameMatcher import NameMatcher  # noqa: E402
+
+
+SIMILARITY_THRESHOLD = 0.9 # same as providers.Phoenix
+WORDS = ['payments', 'ledger', 'gateway', 'accounts', 'identity', 'search', 'orders', 'billing', 'customer',
+         'risk', 'fraud', 'loans', 'cards', 'notifications', 'reporting', 'pricing', 'catalog', 'checkout']
+
+
+def _name(rng):
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return '-'.join(words) + f"-{rng.randint(0, 99999)}"
+
+
+def _variant(rng, name):
+    # a service named after an application, with a small edit (typo, suffix, separator)
+    kind = rng.random()
+    if kind < 0.3:
+        return name.upper() if rng.random() < 0.5 else name
+    if kind < 0.6:
+        position = rng.randrange(len(name))
+        return name[:position] + rng.choice(string.ascii_lowercase) + name[position + 1:]
+    if kind < 0.8:
+        return name + rng.choice(['-svc', '-api', '1'])
+    return name.replace('-', '_')
+
+
+def generate_names(applications, services, seed=42):
+    rng = random.Random(seed)
+    app_names = [_name(rng) for _ in range(applications)]
+    service_names = [_variant(rng, rng.choice(app_names)) if rng.random() < 0.3 else _name(rng) for _ in range(services)]
+    return app_names, service_names
+
+
+def pairwise_matches(app_name, service_names, threshold=SIMILARITY_THRESHOLD):
+    return [index for index, service_name in enumerate(service_names)
+            if app_name.lower() == service_name.lower() or Levenshtein.ratio(app_name, service_name) > threshold]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NameMatcher against the pairwise name comparison")
+    parser.add_argument('--applications', type=int, default=10000)
+    parser.add_argument('--services', type=int, default=50000)
+    parser.add_argument('--sample', type=int, default=200, help="Applications compared pairwise to extrapolate and verify")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app_names, service_names = generate_names(args.applications, args.services, args.seed)
+
+    start_time = time.perf_counter()
+    matcher = NameMatcher(service_names, SIMILARITY_THRESHOLD)
+    index_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    matches = [[index for index, _ in matcher.matches(app_name)] for app_name in app_names]
+    match_seconds = time.perf_counter() - start_time
+
+    sample = random.Random(args.seed).sample(range(len(app_names)), min(args.sample, len(app_names)))
+    start_time = time.perf_counter()
+    expected = {position: pairwise_matches(app_names[position], service_names) for position in sample}
+    pairwise_seconds = (time.perf_counter() - start_time) * len(app_names) / len(sample)
+    mismatches = [position for position in sample if expected[position] != matches[position]]
+
+    total_pairs = len(app_names) * len(service_names)
+    print(f"{len(app_names)} applications x {len(service_names)} services ({total_pairs:,} pairs)")
+    print(f"NameMatcher: index {index_seconds:.2f}s, matching {match_seconds:.2f}s, "
+          f"{matcher.stats['candidates']:,} candidate pairs ({matcher.stats['candidates'] / total_pairs:.2%}), "
+          f"{matcher.stats['scored']:,} confirmed with Levenshtein.ratio, "
+          f"{sum(len(found) for found in matches):,} matches")
+    print(f"Pairwise (extrapolated from {len(sample)} applications): {pairwise_seconds:.1f}s")
+    print(f"Speedup: {pairwise_seconds / (index_seconds + match_seconds):.0f}x")
+    print(f"Sample verification: {len(sample) - len(mismatches)}/{len(sample)} applications with identical matches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Generates synthetic Resources folders (core-structure.yaml, hives.yaml, Teams/*.yaml) at a
+multiple of a template configuration, for benchmarking run.py at 10/100/1000x scale.
+
+Every DeploymentGroup, Environment Group, team and hive team of the template is copied `scale`
+times with a numeric suffix, and team references are renamed consistently.
+
+Usage:
+    python benchmark/generate_fixtures.py --scale 100 --output benchmark/fixtures/x100
+"""
+import argparse
+import copy
+import os
+from pathlib import Path
+
+import yaml
+
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Resources')
+
+
+def _suffix(value, index):
+    return f"{value}_{index}" if value else value
+
+
+def _rename_teams(entry, index):
+    if entry.get('TeamName'):
+        entry['TeamName'] = _suffix(entry['TeamName'], index)
+    if entry.get('TeamNames'):
+        entry['TeamNames'] = [_suffix(team, index) for team in entry['TeamNames']]
+
+
+def _scale_core_structure(core, scale):
+    scaled = {key: value for key, value in core.items() if key not in ('DeploymentGroups', 'Environment Groups')}
+    scaled['DeploymentGroups'] = []
+    scaled['Environment Groups'] = []
+
+    for index in range(scale):
+        for group in core.get('DeploymentGroups') or []:
+            group = copy.deepcopy(group)
+            group['AppName'] = _suffix(group['AppName'], index)
+            _rename_teams(group, index)
+            if group.get('Deployment_set'):
+                group['Deployment_set'] = _suffix(group['Deployment_set'], index)
+            for component in group.get('Components') or []:
+                component['ComponentName'] = _suffix(component['ComponentName'], index)
+                _rename_teams(component, index)
+            for build in group.get('BuildDefinitions') or []:
+                build['BuildDefinitionName'] = _suffix(build.get('BuildDefinitionName'), index)
+                _rename_teams(build, index)
+            scaled['DeploymentGroups'].append(group)
+
+        for environment in core.get('Environment Groups') or []:
+            environment = copy.deepcopy(environment)
+            environment['Name'] = _suffix(environment['Name'], index)
+            _rename_teams(environment, index)
+            for service in environment.get('Services') or []:
+                service['Service'] = _suffix(service['Service'], index)
+                _rename_teams(service, index)
+                for key in ('Deployment_set', 'Deployment_tag'):
+                    if service.get(key):
+                        service[key] = _suffix(service[key], index)
+            scaled['Environment Groups'].append(environment)
+
+    return scaled
+
+
+def _scale_hives(hives, scale):
+    scaled = copy.deepcopy(hives)
+    for hive in scaled.get('Hives') or []:
+        hive['Teams'] = [{**copy.deepcopy(team), 'Name': _suffix(team['Name'], index)}
+                         for index in range(scale) for team in hive.get('Teams') or []]
+    return scaled
+
+
+def _scaled_teams(team, scale):
+    for index in range(scale):
+        scaled = copy.deepcopy(team)
+        scaled['TeamName'] = _suffix(team['TeamName'], index)
+        scaled['AzureDevopsAreaPath'] = _suffix(team.get('AzureDevopsAreaPath'), index)
+        for member in scaled.get('TeamMembers') or []:
+            name, _, domain = member['EmailAddress'].partition('@')
+            member['EmailAddress'] = f"{name}.{index}@{domain}"
+        yield scaled
+
+
+def generate_fixtures(scale, output, template=DEFAULT_TEMPLATE):
+    """
+    Writes a Resources folder `scale` times the size of the template folder to output.
+    """
+    teams_folder = os.path.join(output, 'Teams')
+    os.makedirs(teams_folder, exist_ok=True)
+
+    with open(os.path.join(template, 'core-structure.yaml'), 'r') as stream:
+        core = yaml.safe_load(stream)
+    with open(os.path.join(output, 'core-structure.yaml'), 'w') as stream:
+        yaml.safe_dump(_scale_core_structure(core, scale), stream, sort_keys=False)
+
+    with open(os.path.join(template, 'hives.yaml'), 'r') as stream:
+        hives = yaml.safe_load(stream)
+    with open(os.path.join(output, 'hives.yaml'), 'w') as stream:
+        yaml.safe_dump(_scale_hives(hives, scale), stream, sort_keys=False)
+
+    team_files = 0
+    for team_file in sorted(Path(template, 'Teams').glob('*.yaml')):
+        with open(team_file, 'r') as stream:
+            team = yaml.safe_load(stream)
+        for scaled in _scaled_teams(team, scale):
+            with open(os.path.join(teams_folder, f"{scaled['TeamName']}.yaml"), 'w') as stream:
+                yaml.safe_dump(scaled, stream, sort_keys=False)
+            team_files += 1
+
+    print(f"Generated x{scale} fixtures in {output}: {len(core.get('DeploymentGroups') or []) * scale} applications, "
+          f"{len(core.get('Environment Groups') or []) * scale} environments, {team_files} team files")
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scaled Resources fixtures")
+    parser.add_argument('--scale', type=int, required=True, help="Multiplier applied to the template (e.g. 10, 100, 1000)")
+    parser.add_argument('--output', required=True, help="Folder the Resources are written to")
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE, help="Resources folder used as template")
+    args = parser.parse_args()
+    generate_fixtures(args.scale, args.output, args.template)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Local stand-in for the Phoenix API endpoints used by run.py, for benchmarking and load testing.
+
+Keeps applications, environments, components, rules, teams and deployments in memory and
+supports configurable latency, error injection (500), throttling (429) and pagination.
+
+Usage:
+    python benchmark/mock_phoenix.py --port 8080 --latency 50 --error-rate 0.01
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+DEFAULT_PAGE_SIZE = 100
+
+
+def _token():
+    encode = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('utf-8').rstrip('=')
+    return f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time()) + 3600})}.mock"
+
+
+_ID_SEGMENT = re.compile(r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+|[^/]+@[^/]+)$')
+
+
+def _endpoint(path):
+    return '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+class MockPhoenixState:
+    """
+    In-memory Phoenix tenant. All access goes through the lock as the server is threaded.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.applications = {}  # id -> application/environment
+        self.components = {}  # id -> component
+        self.rules = defaultdict(set)  # (application name, component name) -> rule fingerprints
+        self.teams = {}  # id -> team
+        self.team_members = defaultdict(dict)  # team id -> lower email -> member
+        self.team_rules = set()
+        self.deployments = set()
+        self.request_counts = defaultdict(int)
+        self.status_counts = defaultdict(int)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'total_requests': sum(self.request_counts.values()),
+                'requests': dict(self.request_counts),
+                'statuses': {str(status): count for status, count in self.status_counts.items()},
+                'applications': len(self.applications),
+                'components': len(self.components),
+                'rules': sum(len(rules) for rules in self.rules.values()),
+                'teams': len(self.teams),
+                'deployments': len(self.deployments)
+            }
+
+    def reset_counters(self):
+        with self.lock:
+            self.request_counts.clear()
+            self.status_counts.clear()
+
+    def find_application(self, name, app_type=None):
+        for app in self.applications.values():
+            if app['name'].lower() == name.lower() and (app_type is None or app['type'] == app_type):
+                return app
+        return None
+
+    def seed(self, applications=0, components_per_application=0, teams=0):
+        """
+        Pre-populates the tenant, e.g. to benchmark the startup listing of a large tenant.
+        """
+        for app_index in range(applications):
+            app = {'id': str(uuid.uuid4()), 'name': f"seed-app-{app_index}", 'type': 'APPLICATION',
+                   'criticality': 5, 'owner': {'email': 'owner@company.com'}, 'tags': []}
+            self.applications[app['id']] = app
+            for component_index in range(components_per_application):
+                component = {'id': str(uuid.uuid4()), 'name': f"seed-component-{app_index}-{component_index}",
+                             'applicationId': app['id'], 'criticality': 5, 'tags': []}
+                self.components[component['id']] = component
+        for team_index in range(teams):
+            team = {'id': str(uuid.uuid4()), 'name': f"seed-team-{team_index}", 'type': 'GENERAL'}
+            self.teams[team['id']] = team
+
+
+class MockPhoenixHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body are written separately, avoid the delayed ACK stall
+
+    state = None
+    latency = 0.0
+    error_rate = 0.0
+    throttle_rate = 0.0
+    page_size = DEFAULT_PAGE_SIZE
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body if body is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        with self.state.lock:
+            self.state.status_counts[status] += 1
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _page(self, items, query):
+        page_number = int(query.get('pageNumber', ['0'])[0])
+        page_size = int(query.get('pageSize', [self.page_size])[0])
+        total_pages = max(1, -(-len(items) // page_size))
+        start = page_number * page_size
+        return {'content': items[start:start + page_size], 'totalPages': total_pages,
+                'totalElements': len(items), 'number': page_number, 'size': page_size}
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        path = unquote(url.path).rstrip('/') or '/'
+        query = parse_qs(url.query)
+        body = self._body() if method in ('POST', 'PUT', 'PATCH') else {}
+
+        if path.startswith('/__'):
+            return self._control(method, path)
+
+        with self.state.lock:
+            self.state.request_counts[f"{method} {_endpoint(path)}"] += 1
+
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            return self._send(429, {'error': 'Too many requests'}, {'Retry-After': '1'})
+        if self.error_rate and random.random() < self.error_rate:
+            return self._send(500, {'error': 'Injected error'})
+
+        if path == '/v1/auth/access_token':
+            return self._send(200, {'token': _token()})
+
+        with self.state.lock:
+            status, response = self._route(method, path, query, body)
+        self._send(status, response)
+
+    def _control(self, method, path):
+        if path == '/__stats':
+            return self._send(200, self.state.stats())
+        if path == '/__reset' and method == 'POST':
+            self.state.reset_counters()
+            return self._send(200, {})
+        return self._send(404, {})
+
+    def _route(self, method, path, query, body):
+        state = self.state
+        parts = path.strip('/').split('/')[1:]  # drop v1
+
+        if parts == ['applications']:
+            if method == 'GET':
+                return 200, self._page(list(state.applications.values()), query)
+            if method == 'POST':
+                if state.find_application(body['name'], body.get('type')):
+                    return 409, {'error': 'Application already exists'}
+                app = {'id': str(uuid.uuid4()), 'name': body['name'], 'type': body.get('type', 'APPLICATION'),
+                       'subType': body.get('subType'), 'criticality': body.get('criticality', 5),
+                       'owner': body.get('owner', {}), 'tags': self._with_ids(body.get('tags', []))}
+                state.applications[app['id']] = app
+                return 201, app
+
+        if parts == ['applications', 'repository'] and method == 'POST':
+            return 201, {}
+
+        if parts == ['applications', 'deploy'] and method == 'PATCH':
+            return self._deploy(body['applicationSelector'].get('name'), body)
+
+        if len(parts) >= 2 and parts[0] == 'applications':
+            app = state.applications.get(parts[1])
+            if not app:
+                return 404, {'error': 'Application not found'}
+            if len(parts) == 2 and method == 'PATCH':
+                app.update({key: value for key, value in body.items() if key in ('name', 'criticality', 'owner')})
+                return 200, app
+            if parts[2:] == ['tags']:
+                return self._update_tags(app, method, body)
+            if parts[2:] == ['deploy'] and method == 'PATCH':
+                return self._deploy(app['name'], body)
+
+        if parts == ['components']:
+            if method == 'GET':
+                return 200, self._page(list(state.components.values()), query)
+            if method == 'POST':
+                app = state.find_application(body['applicationSelector']['name'])
+                if not app:
+                    return 400, {'error': 'Application not found'}
+                for component in state.components.values():
+                    if component['applicationId'] == app['id'] and component['name'] == body['name']:
+                        return 409, {'error': 'Component already exists'}
+                component = {'id': str(uuid.uuid4()), 'name': body['name'], 'applicationId': app['id'],
+                             'criticality': body.get('criticality', 5), 'tags': self._with_ids(body.get('tags', []))}
+                state.components[component['id']] = component
+                return 201, component
+
+        if parts == ['components', 'rules'] and method == 'POST':
+            selector = body['selector']
+            key = (selector['applicationSelector']['name'].lower(), selector['componentSelector']['name'].lower())
+            fingerprints = [json.dumps(rule.get('filter'), sort_keys=True) for rule in body.get('rules', [])]
+            if any(fingerprint in state.rules[key] for fingerprint in fingerprints):
+                return 409, {'error': 'Rule already exists'}
+            state.rules[key].update(fingerprints)
+            return 201, {}
+
+        if len(parts) >= 2 and parts[0] == 'components':
+            component = state.components.get(parts[1])
+            if not component:
+                return 404, {'error': 'Component not found'}
+            if len(parts) == 2 and method == 'PATCH':
+                component['criticality'] = body.get('criticality', component['criticality'])
+                self._update_tags(component, 'PUT', body)
+                return 200, component
+            if parts[2:] == ['tags']:
+                return self._update_tags(component, method, body)
+            if parts[2:] == ['rules'] and method == 'GET':
+                app = state.applications.get(component['applicationId'], {})
+                fingerprints = state.rules[(app.get('name', '').lower(), component['name'].lower())]
+                return 200, {'content': [{'filter': json.loads(fingerprint)} for fingerprint in sorted(fingerprints)]}
+
+        if parts == ['teams']:
+            if method == 'GET':
+                return 200, self._page(list(state.teams.values()), query)
+            if method == 'POST':
+                if any(team['name'] == body['name'] for team in state.teams.values()):
+                    return 400, {'error': 'Team already exists'}
+                team = {'id': str(uuid.uuid4()), 'name': body['name'], 'type': body.get('type', 'GENERAL')}
+                state.teams[team['id']] = team
+                return 201, team
+
+        if len(parts) >= 3 and parts[0] == 'teams':
+            team_id = parts[1]
+            if team_id not in state.teams:
+                return 404, {'error': 'Team not found'}
+            members = state.team_members[team_id]
+            if parts[2:] == ['users']:
+                if method == 'GET':
+                    return 200, list(members.values())
+                if method == 'PUT':
+                    emails = [user['email'] for user in body.get('users', [])]
+                    new_emails = [email for email in emails if email.lower() not in members]
+                    if not new_emails:
+                        return 409, {'error': 'Users already assigned'}
+                    for email in new_emails:
+                        members[email.lower()] = {'email': email}
+                    return 200, {}
+            if parts[2] == 'users' and len(parts) == 4 and method == 'DELETE':
+                members.pop(parts[3].lower(), None)
+                return 200, {}
+            if parts[3:] == ['auto-link', 'tags'] and method == 'POST':
+                key = (team_id, parts[2], json.dumps(body, sort_keys=True))
+                if key in state.team_rules:
+                    return 409, {'error': 'Rule already exists'}
+                state.team_rules.add(key)
+                return 201, {}
+
+        return 404, {'error': f"No mock for {method} {path}"}
+
+    def _with_ids(self, tags):
+        return [{'id': str(uuid.uuid4()), **tag} for tag in tags]
+
+    def _update_tags(self, entity, method, body):
+        if method == 'PUT':
+            entity['tags'].extend(self._with_ids(body.get('tags', [])))
+            return 200, entity
+        if method == 'PATCH' and body.get('action') == 'delete':
+            removed = {tag.get('id') for tag in body.get('tags', [])}
+            entity['tags'] = [tag for tag in entity['tags'] if tag.get('id') not in removed]
+            return 200, entity
+        return 400, {'error': 'Unsupported tag operation'}
+
+    def _deploy(self, application_name, body):
+        key = (application_name.lower(), json.dumps(body.get('serviceSelector'), sort_keys=True))
+        if key in self.state.deployments:
+            return 409, {'error': 'Deployment already exists'}
+        self.state.deployments.add(key)
+        return 200, {}
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+def start_server(host='127.0.0.1', port=0, latency_ms=0, error_rate=0.0, throttle_rate=0.0,
+                 page_size=DEFAULT_PAGE_SIZE, state=None):
+    """
+    Starts the mock API on a background thread and returns the server, its url is
+    http://{host}:{server.server_port} and its state is server.state.
+    """
+    state = state or MockPhoenixState()
+    handler = type('ConfiguredMockPhoenixHandler', (MockPhoenixHandler,), {
+        'state': state,
+        'latency': latency_ms / 1000.0,
+        'error_rate': error_rate,
+        'throttle_rate': throttle_rate,
+        'page_size': page_size
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Phoenix API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help="Average latency per request in ms (+/- 50%% jitter)")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of requests answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="Fraction of requests answered with 429")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help="Default page size of listing endpoints")
+    parser.add_argument('--seed-applications', type=int, default=0, help="Number of pre-existing applications")
+    parser.add_argument('--seed-components', type=int, default=0, help="Number of pre-existing components per seeded application")
+    parser.add_argument('--seed-teams', type=int, default=0, help="Number of pre-existing teams")
+    args = parser.parse_args()
+
+    state = MockPhoenixState()
+    state.seed(args.seed_applications, args.seed_components, args.seed_teams)
+    server = start_server(args.host, args.port, args.latency, args.error_rate, args.throttle_rate, args.page_size, state)
+    print(f"Mock Phoenix API listening on http://{args.host}:{server.server_port} (stats on /__stats)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
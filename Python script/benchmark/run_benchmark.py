@@ -0,0 +1,135 @@
+"""
+End-to-end benchmark: starts the mock Phoenix API in-process, runs run.py against it and reports
+wall time, number of API requests and peak memory per phase.
+
+Usage:
+    python benchmark/generate_fixtures.py --scale 10 --output benchmark/fixtures/x10
+    python benchmark/run_benchmark.py --resources benchmark/fixtures/x10 --latency 20 --json results.json
+    python benchmark/run_benchmark.py --resources benchmark/fixtures/x10 -- --max-in-flight 8
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from mock_phoenix import DEFAULT_PAGE_SIZE, MockPhoenixState, start_server
+
+
+SCRIPT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIAGNOSTIC_TIME = re.compile(r'^\[Diagnostic\] \[(?P<phase>[^\]]+)\] Time Taken:? (?P<seconds>[\d.]+)')
+DIAGNOSTIC_REQUESTS = re.compile(r'^\[Diagnostic\] \[(?P<phase>[^\]]+)\] Requests: (?P<requests>\d+)')
+DIAGNOSTIC_MEMORY = re.compile(r'^\[Diagnostic\] \[(?P<phase>[^\]]+)\] Peak memory: (?P<megabytes>[\d.]+) MB')
+ALL_PHASES = ('teams', 'code', 'cloud', 'deployment', 'autolink_deploymentset', 'autocreate_teams_from_pteam')
+# autocreate works on the teams listed before the teams action ran, so it is only enabled on request
+DEFAULT_PHASES = ALL_PHASES[:-1]
+
+
+def run_benchmark(resources, phases=DEFAULT_PHASES, latency_ms=0, error_rate=0.0, throttle_rate=0.0,
+                  page_size=DEFAULT_PAGE_SIZE, seed_applications=0, seed_components=0, seed_teams=0, run_args=(), verbose=False):
+    """
+    Runs run.py once against a fresh mock API and returns the per phase results.
+
+    Args:
+    - resources: Resources folder passed to run.py.
+    - phases: Names of the run.py actions that are enabled, the others are passed as false.
+    - latency_ms, error_rate, throttle_rate, page_size: Behaviour of the mock API.
+    - seed_applications, seed_components, seed_teams: Entities that already exist before the run.
+    - run_args: Extra options appended to the run.py command line.
+    """
+    state = MockPhoenixState()
+    state.seed(seed_applications, seed_components, seed_teams)
+    server = start_server(latency_ms=latency_ms, error_rate=error_rate, throttle_rate=throttle_rate,
+                          page_size=page_size, state=state)
+    api_domain = f"http://127.0.0.1:{server.server_port}"
+
+    enabled = [str(phase in phases).lower() for phase in ALL_PHASES]
+    command = [sys.executable, '-u', 'run.py', 'benchmark-client', 'benchmark-secret', *enabled, api_domain,
+               '--resources', os.path.abspath(resources), *run_args]
+
+    results = {}
+    last_phase = None
+    requests_before = 0
+    start_time = time.time()
+    process = subprocess.Popen(command, cwd=SCRIPT_FOLDER, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, env={**os.environ, 'PYTHONPATH': SCRIPT_FOLDER})
+    try:
+        for line in process.stdout:
+            if verbose:
+                print(line, end='')
+            match = DIAGNOSTIC_TIME.match(line.strip())
+            if match:
+                # Cloud reports several partial timings, requests are counted since the previous report
+                total_requests = state.stats()['total_requests']
+                phase = results.setdefault(match['phase'], {'seconds': 0.0, 'requests': 0, 'peak_memory_mb': None})
+                phase['seconds'] = float(match['seconds'])
+                phase['requests'] += total_requests - requests_before
+                requests_before = total_requests
+                last_phase = match['phase']
+                continue
+            match = DIAGNOSTIC_REQUESTS.match(line.strip())
+            if match and match['phase'] in results:
+                # phases running in parallel report the requests they sent themselves
+                results[match['phase']]['requests'] = int(match['requests'])
+                continue
+            match = DIAGNOSTIC_MEMORY.match(line.strip())
+            if match and match['phase'] in results:
+                results[match['phase']]['peak_memory_mb'] = float(match['megabytes'])
+        process.wait()
+    finally:
+        server.shutdown()
+
+    stats = state.stats()
+    return {
+        'exit_code': process.returncode,
+        'wall_seconds': time.time() - start_time,
+        'total_requests': stats['total_requests'],
+        'statuses': stats['statuses'],
+        'phases': results,
+        'last_phase': last_phase,
+        'entities': {key: stats[key] for key in ('applications', 'components', 'rules', 'teams', 'deployments')}
+    }
+
+
+def print_results(results):
+    print(f"{'Phase':<32}{'Seconds':>10}{'Requests':>10}{'Peak MB':>10}")
+    for name, phase in results['phases'].items():
+        memory = f"{phase['peak_memory_mb']:.1f}" if phase['peak_memory_mb'] is not None else '-'
+        print(f"{name:<32}{phase['seconds']:>10.2f}{phase['requests']:>10}{memory:>10}")
+    print(f"{'Total':<32}{results['wall_seconds']:>10.2f}{results['total_requests']:>10}")
+    print(f"Statuses: {results['statuses']}")
+    print(f"Entities: {results['entities']}")
+    if results['exit_code'] != 0:
+        print(f"run.py exited with code {results['exit_code']} after phase {results['last_phase']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run.py against the local mock Phoenix API")
+    parser.add_argument('--resources', default=os.path.join(SCRIPT_FOLDER, 'Resources'), help="Resources folder used for the run")
+    parser.add_argument('--phases', default=','.join(DEFAULT_PHASES), help=f"Comma separated actions to run, out of {','.join(ALL_PHASES)}")
+    parser.add_argument('--latency', type=float, default=0, help="Average mock latency per request in ms")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of mock requests answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="Fraction of mock requests answered with 429")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help="Default page size of the mock listing endpoints")
+    parser.add_argument('--seed-applications', type=int, default=0)
+    parser.add_argument('--seed-components', type=int, default=0)
+    parser.add_argument('--seed-teams', type=int, default=0)
+    parser.add_argument('--json', default=None, help="File the results are written to as JSON")
+    parser.add_argument('--verbose', action='store_true', help="Print the output of run.py")
+    parser.add_argument('run_args', nargs='*', help="Extra options passed to run.py (after --)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.resources, args.phases.split(','), args.latency, args.error_rate, args.throttle_rate,
+                            args.page_size, args.seed_applications, args.seed_components, args.seed_teams,
+                            args.run_args, args.verbose)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump(results, stream, indent=2)
+    sys.exit(results['exit_code'])
+
+
+if __name__ == '__main__':
+    main()
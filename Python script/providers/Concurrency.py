@@ -0,0 +1,195 @@
+import contextlib
+import contextvars
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def with_context(fn):
+    """
+    Returns fn running in a copy of the calling thread's context (e.g. the current phase), for tasks handed to a thread pool.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+_output_buffer = contextvars.ContextVar('output_buffer', default=None) # buffer print() writes to, None writes to the stream
+_output_lock = threading.Lock()
+_output_users = 0
+
+
+class _ThreadOutput:
+    """
+    Stdout proxy that routes print() output of code running under buffered() (a worker task, a phase)
+    into a buffer, so the log lines of one task are written together instead of interleaved with other tasks.
+    The buffer follows the code into the threads it hands work to through with_context.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            buffer = _output_buffer.get()
+            return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    @contextlib.contextmanager
+    def buffered(self):
+        """
+        Buffers what is printed inside the block, written as one block to the enclosing buffer (or the stream) on exit.
+        """
+        buffer = io.StringIO()
+        token = _output_buffer.set(buffer)
+        try:
+            yield
+        finally:
+            _output_buffer.reset(token)
+            text = buffer.getvalue()
+            if text:
+                self.write(text)
+                self.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def acquire_output():
+    """
+    Installs the _ThreadOutput proxy on sys.stdout (once for every user) and returns it, release with release_output().
+    """
+    global _output_users
+    with _output_lock:
+        if not isinstance(sys.stdout, _ThreadOutput):
+            sys.stdout = _ThreadOutput(sys.stdout)
+        _output_users += 1
+        return sys.stdout
+
+
+def release_output():
+    global _output_users
+    with _output_lock:
+        _output_users -= 1
+        if _output_users == 0 and isinstance(sys.stdout, _ThreadOutput):
+            sys.stdout = sys.stdout.stream
+
+
+class BoundedExecutor:
+    """
+    Runs API writes on a thread pool with a bounded number of requests in flight, overall and per endpoint.
+
+    With max_in_flight of 1 (the default) tasks run inline on the calling thread, exactly like a plain call.
+    Tasks are grouped by the thread submitting them: drain() waits for the tasks of the calling thread
+    only, so phases running in parallel each wait for their own writes and get their own failures.
+
+    Args:
+    - max_in_flight: Maximum number of tasks running at the same time.
+    - max_per_endpoint: Maximum number of tasks running at the same time for one endpoint (None means no extra limit).
+    - endpoint_limits: Optional dict of endpoint -> limit overriding max_per_endpoint.
+    """
+
+    def __init__(self, max_in_flight=1, max_per_endpoint=None, endpoint_limits=None):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._output = None
+        self._futures = {}
+        self._failures = {}
+        self.configure(max_in_flight, max_per_endpoint, endpoint_limits)
+
+    def configure(self, max_in_flight=1, max_per_endpoint=None, endpoint_limits=None):
+        self.drain()
+        self.shutdown()
+        self.max_in_flight = max(1, max_in_flight or 1)
+        self.max_per_endpoint = max_per_endpoint
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self._endpoint_semaphores = {}
+
+    @property
+    def concurrent(self):
+        return self.max_in_flight > 1
+
+    def _endpoint_semaphore(self, endpoint):
+        limit = self.endpoint_limits.get(endpoint, self.max_per_endpoint)
+        if not limit:
+            return None
+        with self._lock:
+            if endpoint not in self._endpoint_semaphores:
+                self._endpoint_semaphores[endpoint] = threading.BoundedSemaphore(limit)
+            return self._endpoint_semaphores[endpoint]
+
+    def _start(self):
+        # phases running in parallel may submit their first task at the same time
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='phoenix-write')
+                self._output = acquire_output()
+
+    def submit(self, endpoint, fn, *args, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) against the given endpoint. Blocks while max_in_flight tasks are pending.
+        """
+        if not self.concurrent:
+            return fn(*args, **kwargs)
+
+        group = threading.get_ident()
+        if group in self._failures:
+            self.drain()
+
+        self._start()
+        self._in_flight.acquire()
+        try:
+            future = self._pool.submit(with_context(self._run), group, endpoint, fn, args, kwargs)
+        except BaseException:
+            self._in_flight.release()
+            raise
+        future.add_done_callback(lambda _: self._in_flight.release())
+        with self._lock:
+            self._futures.setdefault(group, []).append(future)
+        return future
+
+    def _run(self, group, endpoint, fn, args, kwargs):
+        if group in self._failures:
+            return None
+
+        semaphore = self._endpoint_semaphore(endpoint)
+        if semaphore:
+            semaphore.acquire()
+        try:
+            with self._output.buffered():
+                return fn(*args, **kwargs)
+        except BaseException as e:
+            # exit(1) inside a task stops the remaining tasks of its group, drain() re-raises it
+            with self._lock:
+                self._failures.setdefault(group, e)
+            raise
+        finally:
+            if semaphore:
+                semaphore.release()
+
+    def drain(self):
+        """
+        Waits for every task submitted by the calling thread and re-raises the first failure among them
+        (including SystemExit from exit()).
+        """
+        group = threading.get_ident()
+        with self._lock:
+            futures = self._futures.pop(group, [])
+        if futures:
+            wait(futures)
+        with self._lock:
+            failure = self._failures.pop(group, None)
+        if failure is not None:
+            raise failure
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._output is not None:
+            release_output()
+        self._output = None
@@ -0,0 +1,103 @@
+import glob
+import hashlib
+import os
+import pickle
+
+
+CACHE_VERSION = 2 # bump when the layout of the cached configuration changes
+CACHE_PREFIX = "config-"
+# the cached models are built by this code, a change to it invalidates the cache like a change to the resources
+SOURCE_FILES = ('YamlHelper.py', 'Models.py', 'Utils.py')
+# built from input the resource files don't hold (the company email domain may be typed at a prompt), never cached
+UNCACHED_KEYS = ('hives',)
+
+
+def resource_files(resource_folder):
+    """
+    Returns the resource files the configuration is built from: core-structure.yaml, hives.yaml and every Teams/*.yaml.
+    """
+    files = [os.path.join(resource_folder, "core-structure.yaml"), os.path.join(resource_folder, "hives.yaml")]
+    files += sorted(glob.glob(os.path.join(resource_folder, "Teams", "*.yaml")))
+    return files
+
+
+def config_key(resource_folder):
+    """
+    Returns the sha256 of the resource files (names and content) and of the code turning them into models.
+    """
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode('utf-8'))
+    providers_folder = os.path.dirname(os.path.abspath(__file__))
+    sources = [os.path.join(providers_folder, name) for name in SOURCE_FILES]
+    for path in sources + resource_files(resource_folder):
+        digest.update(os.path.basename(path).encode('utf-8') + b'\0')
+        try:
+            with open(path, 'rb') as stream:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b'<missing>')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ConfigCache:
+    """
+    Keeps the configuration parsed from the resource folder (repos, environments, applications, teams,
+    all access accounts) on disk as a pickle, keyed by the content hash of the resource files,
+    so a run with unchanged resources skips parsing the YAML and building the models.
+
+    The hives (UNCACHED_KEYS) are left out: their emails are built with a company email domain that may
+    be entered at a prompt instead of read from hives.yaml, so they are read again by every run.
+
+    Only the entry of the latest key is kept, a change to any resource file simply misses the cache.
+
+    Args:
+    - cache_dir: Folder the cache file is written to, created when needed.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{CACHE_PREFIX}{key}.pickle")
+
+    def load(self, key):
+        """
+        Returns the cached configuration for key, or None when there is none or it can't be read.
+        """
+        try:
+            with open(self._path(key), 'rb') as stream:
+                return pickle.load(stream)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"Ignoring unreadable configuration cache {self._path(key)}: {e}")
+            return None
+
+    def save(self, key, config):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_file = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(temp_file, 'wb') as stream:
+                pickle.dump({name: value for name, value in config.items() if name not in UNCACHED_KEYS}, stream,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self._path(key))
+        except OSError as e:
+            print(f"Could not write the configuration cache to {self.cache_dir}: {e}")
+            return
+        self.clear(keep=key)
+
+    def clear(self, keep=None):
+        """
+        Deletes the cached configurations, except the one for keep. Returns the number of files deleted.
+        """
+        removed = 0
+        for path in glob.glob(os.path.join(self.cache_dir, f"{CACHE_PREFIX}*.pickle")):
+            if keep and path == self._path(keep):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
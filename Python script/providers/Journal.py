@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from providers.Scheduler import current_phase
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applied (
+    scope TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    applied_at REAL NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (scope, kind, key)
+)
+"""
+
+
+def _plain(value):
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def payload_hash(payload):
+    """
+    Returns the sha256 of the canonical JSON of a desired payload (models are hashed through their fields).
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=_plain)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class AppliedJournal:
+    """
+    Local record of the entities a run applied successfully (applications, components, services,
+    rules, team rules and deployments), each with the hash of the payload it was applied with.
+
+    Before sending an entity the run asks is_current(): an entity whose payload hash matches the
+    journal was already applied and is skipped, a new or changed entity is sent and record()ed once
+    the API accepted it. Records are staged under the phase making them (Scheduler.current_phase) and only
+    written by commit(phase), called when that phase completed, so a failed run keeps the records of
+    its completed phases only, even when other phases were running next to the failed one. prune() forgets
+    entities the configuration no longer has, so they are sent again if they come back.
+
+    Args:
+    - path: SQLite file the journal is kept in, created when needed.
+    - scope: Separates journals sharing a file, e.g. the Phoenix API domain.
+    - full: Send every entity whatever the journal says (the journal is still updated).
+    """
+
+    def __init__(self, path, scope, full=False):
+        self.path = path
+        self.scope = scope
+        self.full = full
+        self.run_started = time.time()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._staged = {} # phase -> {(kind, key): hash}
+        self._seen = {} # phase -> {(kind, key)}
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        rows = self._connection.execute("SELECT kind, key, hash FROM applied WHERE scope = ?", (scope,))
+        self._applied = {(kind, key): value for kind, key, value in rows}
+
+    def is_current(self, kind, key, payload):
+        """
+        Marks the entity as part of the desired state and returns True when it was applied with the same payload before.
+        """
+        digest = payload_hash(payload)
+        with self._lock:
+            self._seen.setdefault(current_phase.get(), set()).add((kind, key))
+            current = not self.full and self._applied.get((kind, key)) == digest
+            self.stats[(kind, 'unchanged' if current else 'sent')] += 1
+            return current
+
+    def unchanged(self, kind, key, payload):
+        """
+        Like is_current, without marking the entity as seen or counting it.
+        """
+        return not self.full and self._applied.get((kind, key)) == payload_hash(payload)
+
+    def record(self, kind, key, payload):
+        """
+        Stages the entity as applied with payload, written by the commit() of the current phase.
+        """
+        self.record_hash(kind, key, payload_hash(payload))
+
+    def record_hash(self, kind, key, digest):
+        """
+        Like record, with the payload hash already computed (e.g. the records of a plan applied by --apply).
+        """
+        phase = current_phase.get()
+        with self._lock:
+            self._seen.setdefault(phase, set()).add((kind, key))
+            self._staged.setdefault(phase, {})[(kind, key)] = digest
+
+    def staged_records(self):
+        """
+        Returns the records staged by every phase and not committed, as [kind, key, hash] lists.
+        """
+        with self._lock:
+            return sorted([kind, key, digest] for staged in self._staged.values() for (kind, key), digest in staged.items())
+
+    def keep(self, kind, key):
+        """
+        Marks an entity the run left alone as still part of the desired state, so prune() keeps it.
+        """
+        with self._lock:
+            self._seen.setdefault(current_phase.get(), set()).add((kind, key))
+
+    def commit(self, *phases):
+        """
+        Writes the records staged by the given phases, or by every phase when none is given.
+        """
+        with self._lock:
+            phases = phases or list(self._staged.keys() | self._seen.keys())
+            staged, seen = {}, set()
+            for phase in phases:
+                staged.update(self._staged.pop(phase, {}))
+                seen.update(self._seen.pop(phase, set()))
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO applied (scope, kind, key, hash, applied_at, seen_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (scope, kind, key) DO UPDATE SET hash = excluded.hash, applied_at = excluded.applied_at, "
+                "seen_at = excluded.seen_at",
+                [(self.scope, kind, key, digest, now, now) for (kind, key), digest in staged.items()])
+            self._connection.executemany(
+                "UPDATE applied SET seen_at = ? WHERE scope = ? AND kind = ? AND key = ?",
+                [(now, self.scope, kind, key) for kind, key in seen - staged.keys()])
+        with self._lock:
+            self._applied.update(staged)
+            self.stats['recorded'] += len(staged)
+
+    def prune(self):
+        """
+        Forgets the entities not seen by this run. Only valid after a run over the whole configuration.
+        """
+        self.commit()
+        with self._connection:
+            removed = self._connection.execute("DELETE FROM applied WHERE scope = ? AND seen_at < ?",
+                                               (self.scope, self.run_started)).rowcount
+        self.stats['removed'] += removed
+        return removed
+
+    def close(self):
+        self._connection.close()
+
+    def print_stats(self):
+        kinds = sorted({kind for kind in self.stats if isinstance(kind, tuple)})
+        if not kinds and not self.stats['recorded']:
+            return
+        unchanged = ", ".join(f"{kind}: {self.stats[(kind, 'unchanged')]}/{self.stats[(kind, 'unchanged')] + self.stats[(kind, 'sent')]}"
+                              for kind in sorted({kind for kind, _ in kinds}))
+        print(f"[Diagnostic] [Journal] unchanged (skipped/checked) {unchanged}; "
+              f"recorded {self.stats['recorded']}, forgotten {self.stats['removed']}{' (full resync)' if self.full else ''}")
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from providers.Scheduler import current_phase
+
+
+# upper bounds (seconds) of the latency histogram buckets, an implicit +Inf bucket follows
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "phoenix"
+
+
+class _Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q-quantile (None for the +Inf bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'buckets': {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)}
+        }
+
+
+class Metrics:
+    """
+    Request metrics of the Phoenix client, exported at the end of the run.
+
+    Records per method and endpoint template (e.g. "POST /v1/components/rules") a latency histogram,
+    the number of calls and the status code breakdown, the time spent waiting (rate limiter/throttling
+    and retry backoff) and the duration of each run phase with the number of requests it sent (counted
+    through Scheduler.current_phase, so phases running in parallel are told apart). Every attempt is
+    recorded, so a retried request counts once per response.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.latency = {}
+        self.statuses = defaultdict(int)
+        self.wait_seconds = defaultdict(float)
+        self.phases = {}
+        self.phase_requests = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record_request(self, method, endpoint, status, seconds):
+        """
+        Records one attempt; status is the response status code or the exception name when no response was received.
+        """
+        key = (method, endpoint)
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+            self.statuses[(method, endpoint, str(status))] += 1
+            self.phase_requests[current_phase.get()] += 1
+
+    def record_wait(self, reason, seconds):
+        """
+        Records time a caller was held back, reason being "throttled" or "retry_backoff".
+        """
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.wait_seconds[reason] += seconds
+
+    def record_phase(self, phase, seconds, peak_memory_mb=None):
+        """
+        Records the duration of a phase, with the requests it sent when it ran in the phase scheduler (None otherwise).
+        """
+        with self._lock:
+            self.phases[phase] = {'seconds': seconds, 'peak_memory_mb': peak_memory_mb, 'requests': self.phase_requests.get(phase)}
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = []
+            for (method, endpoint), histogram in sorted(self.latency.items()):
+                endpoints.append({
+                    'method': method,
+                    'endpoint': endpoint,
+                    'latency': histogram.to_dict(),
+                    'statuses': {status: count for (m, e, status), count in self.statuses.items()
+                                 if (m, e) == (method, endpoint)}
+                })
+            return {
+                'endpoints': endpoints,
+                'wait_seconds': dict(self.wait_seconds),
+                'phases': dict(self.phases)
+            }
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2))
+        print(f"Metrics written to {path}")
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            name = f"{METRIC_PREFIX}_api_request_duration_seconds"
+            lines += [f"# HELP {name} Latency of Phoenix API requests.", f"# TYPE {name} histogram"]
+            for (method, endpoint), histogram in sorted(self.latency.items()):
+                labels = f'method="{method}",endpoint="{_escape(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+            name = f"{METRIC_PREFIX}_api_requests_total"
+            lines += [f"# HELP {name} Phoenix API responses by status code.", f"# TYPE {name} counter"]
+            for (method, endpoint, status), count in sorted(self.statuses.items()):
+                lines.append(f'{name}{{method="{method}",endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+
+            name = f"{METRIC_PREFIX}_api_wait_seconds_total"
+            lines += [f"# HELP {name} Time requests were held back by throttling or retry backoff.", f"# TYPE {name} counter"]
+            for reason, seconds in sorted(self.wait_seconds.items()):
+                lines.append(f'{name}{{reason="{reason}"}} {seconds}')
+
+            name = f"{METRIC_PREFIX}_phase_duration_seconds"
+            lines += [f"# HELP {name} Duration of each run phase.", f"# TYPE {name} gauge"]
+            for phase, values in self.phases.items():
+                lines.append(f'{name}{{phase="{_escape(phase)}"}} {values["seconds"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # node_exporter may read the textfile at any time, so it is replaced atomically
+        _write_atomic(path, self.to_prometheus())
+        print(f"Prometheus metrics written to {path}")
+
+    def print_stats(self, limit=10):
+        """
+        Prints the endpoints that took the most time in total.
+        """
+        with self._lock:
+            slowest = sorted(self.latency.items(), key=lambda item: -item[1].sum)[:limit]
+            waits = dict(self.wait_seconds)
+        print("[Diagnostic] [Endpoints] calls, total, avg, p95, max")
+        for (method, endpoint), histogram in slowest:
+            p95 = histogram.quantile(0.95)
+            p95 = f"<={p95}s" if p95 is not None else f">{self.buckets[-1]}s"
+            print(f"  {method} {endpoint}: {histogram.count}, {histogram.sum:.2f}s, "
+                  f"{histogram.sum / histogram.count:.3f}s, {p95}, {histogram.max:.3f}s")
+        if waits:
+            print("[Diagnostic] [Waiting] " + ", ".join(f"{reason}: {seconds:.2f}s" for reason, seconds in sorted(waits.items())))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path, content):
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    with open(temp_file, 'w') as stream:
+        stream.write(content)
+    os.replace(temp_file, path)
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field, fields
+
+
+# optional rule filters of components and services, mostly unset, kept in a per-entity dict only when set
+COMPONENT_FILTERS = ('SearchName', 'Tags', 'Cidr', 'Fqdn', 'Netbios', 'OsNames', 'Hostnames', 'ProviderAccountId',
+                     'ProviderAccountName', 'ResourceGroup', 'AssetType')
+SERVICE_FILTERS = ('SearchName', 'Tag', 'Cidr', 'Fqdn', 'Netbios', 'OsNames', 'Hostnames', 'ProviderAccountId',
+                   'ProviderAccountName', 'ResourceGroup', 'AssetType')
+
+
+class Record:
+    """
+    Dictionary style access to the fields of a slotted configuration entity, so entity['ComponentName'],
+    entity.get('Cidr') and 'TeamName' in entity keep working while the entity itself is a compact object.
+
+    Keys listed in SPARSE are stored in the `extra` dict only when set and read as None otherwise, like
+    the None defaults of the former dictionaries. Other keys without a field (e.g. keys of a team file
+    the model doesn't know) live in `extra` as well and raise KeyError when missing.
+    """
+    __slots__ = ()
+    SPARSE = ()
+    FIELD_NAMES = frozenset() # set for every model at the end of the module
+
+    def __getitem__(self, key):
+        if key in self.FIELD_NAMES:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        if key in self.SPARSE:
+            return None
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELD_NAMES:
+            setattr(self, key, value)
+        elif value is None and key in self.SPARSE:
+            if self.extra:
+                self.extra.pop(key, None)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.FIELD_NAMES or key in self.SPARSE or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        values = {item.name: getattr(self, item.name) for item in fields(self) if item.name != 'extra'}
+        values.update({key: None for key in self.SPARSE})
+        values.update(self.extra or {})
+        return values
+
+
+def sparse(source, keys):
+    """
+    Returns the keys of source that are set (not None) as a dict, or None when none of them is.
+    """
+    values = {key: source[key] for key in keys if source.get(key) is not None}
+    return values or None
+
+
+@dataclass(slots=True)
+class Repo(Record):
+    RepositoryName: str
+    Domain: str
+    Tier: int
+    Subdomain: str
+    Team: str
+    BuildDefinitionName: str
+    extra: dict = None
+
+
+@dataclass(slots=True)
+class Service(Record):
+    SPARSE = SERVICE_FILTERS
+
+    Service: str
+    Type: str
+    Tier: int
+    TeamName: str
+    Deployment_set: str = None
+    Deployment_tag: str = None
+    MultiConditionRule: dict = None
+    RepositoryName: list = field(default_factory=list)
+    extra: dict = None
+
+
+@dataclass(slots=True)
+class Environment(Record):
+    Name: str
+    Type: str
+    Criticality: int
+    CloudAccounts: list
+    Status: str
+    Responsable: str
+    TeamName: str = None
+    Services: list = field(default_factory=list)
+    extra: dict = None
+
+
+@dataclass(slots=True)
+class Component(Record):
+    SPARSE = COMPONENT_FILTERS
+
+    ComponentName: str
+    Status: str
+    Type: str
+    TeamNames: list
+    RepositoryName: list
+    Criticality: int
+    MultiConditionRule: dict = None
+    Domain: str = None
+    SubDomain: str = None
+    AutomaticSecurityReview: bool = None
+    extra: dict = None
+
+
+@dataclass(slots=True)
+class Application(Record):
+    AppName: str
+    Status: str
+    TeamNames: list
+    ReleaseDefinitions: list
+    Responsable: str
+    Criticality: int
+    Deployment_set: str = None
+    Components: list = field(default_factory=list)
+    extra: dict = None
+
+
+@dataclass(slots=True)
+class Team(Record):
+    """
+    A team file of the Teams folder. TeamName and TeamMembers are fields, any other key of the file is kept in extra.
+    """
+    TeamName: str
+    TeamMembers: list = field(default_factory=list)
+    extra: dict = None
+
+    @classmethod
+    def from_yaml(cls, values):
+        values = dict(values)
+        return cls(values.pop('TeamName'), values.pop('TeamMembers', None) or [], values or None)
+
+
+for _model in (Repo, Service, Environment, Component, Application, Team):
+    _model.FIELD_NAMES = frozenset(item.name for item in fields(_model)) - {'extra'}
@@ -0,0 +1,129 @@
+import math
+from collections import Counter, defaultdict
+
+import Levenshtein
+
+try:
+    from rapidfuzz import process as rapidfuzz_process
+    from rapidfuzz.distance import Indel
+except ImportError:  # optional, candidates are scored one by one with Levenshtein
+    rapidfuzz_process = None
+
+
+DEFAULT_QGRAM = 3
+
+
+def qgram_tokens(name, q=DEFAULT_QGRAM):
+    """
+    Returns the q-grams of a name as a set of (q-gram, occurrence) tokens, so repeated q-grams are counted like a multiset.
+    """
+    seen = Counter()
+    tokens = []
+    for start in range(max(0, len(name) - q + 1)):
+        gram = name[start:start + q]
+        seen[gram] += 1
+        tokens.append((gram, seen[gram]))
+    return tokens
+
+
+class NameMatcher:
+    """
+    Finds the names similar to a query name, with the same outcome as comparing the query to every name with
+    `query.lower() == name.lower() or Levenshtein.ratio(query, name) > threshold`, without the cross product.
+
+    Levenshtein.ratio is 1 - d / (len(a) + len(b)), d being the insert/delete distance, so a match needs
+    d < (1 - threshold) * (len(a) + len(b)). Candidates are pruned before scoring by:
+    - length: d >= |len(a) - len(b)|, so only names within the allowed length difference are considered;
+    - q-grams: every insert/delete destroys at most q q-grams, so a match shares at least
+      max(len(a), len(b)) - q + 1 - q * d q-grams, and therefore at least one of the query's rarest
+      q-grams beyond that count (prefix filter). The q-gram postings are split by name length, so
+      only names of a compatible length sharing one of those rarest q-grams are candidates.
+    The remaining candidates are scored in one batch (rapidfuzz, when installed) and every match is
+    confirmed with Levenshtein.ratio itself. Names too short for the q-gram bound fall back to the length filter.
+
+    Args:
+    - names: The names queries are matched against (e.g. every service name).
+    - threshold: Minimum similarity ratio (exclusive).
+    - q: Length of the q-grams used for blocking.
+    """
+
+    def __init__(self, names, threshold, q=DEFAULT_QGRAM):
+        self.names = list(names)
+        self.threshold = threshold
+        self.q = q
+        self._by_lower = defaultdict(list)
+        self._by_length = defaultdict(list)
+        # (length, q-gram token) -> indexes of the names of that length containing the token
+        self._postings = defaultdict(list)
+        for index, name in enumerate(self.names):
+            if name is None:
+                continue
+            self._by_lower[name.lower()].append(index)
+            self._by_length[len(name)].append(index)
+            for token in qgram_tokens(name, q):
+                self._postings[(len(name), token)].append(index)
+        self.stats = Counter()
+
+    def max_distance(self, total_length):
+        # largest insert/delete distance that may still match, rounded up so pruning never drops a match
+        return math.floor((1 - self.threshold) * total_length + 1e-9)
+
+    def _length_window(self, length):
+        lengths = []
+        for other in self._by_length:
+            if abs(length - other) <= self.max_distance(length + other):
+                lengths.append(other)
+        return lengths
+
+    def _min_shared(self, length, other):
+        return max(length, other) - self.q + 1 - self.q * self.max_distance(length + other)
+
+    def candidates(self, query):
+        """
+        Returns the indexes of the names that can match query, after length and q-gram pruning.
+        """
+        length = len(query)
+        tokens = qgram_tokens(query, self.q)
+        candidates = []
+        for other in self._length_window(length):
+            required = self._min_shared(length, other)
+            if required <= 0:
+                # too short for the q-gram bound, every name of this length is a candidate
+                candidates.extend(self._by_length[other])
+                continue
+            # prefix filter: a name sharing `required` tokens shares one of the len(tokens) - required + 1 rarest ones
+            postings = sorted((self._postings.get((other, token), ()) for token in tokens), key=len)
+            candidates.extend(set().union(*postings[:max(0, len(tokens) - required + 1)]))
+        candidates.sort()
+        return candidates
+
+    def _score(self, query, candidates):
+        # returns the candidates within the allowed distance, as a batch when rapidfuzz is available
+        if rapidfuzz_process is None or len(candidates) < 2:
+            return candidates
+        cutoff = self.max_distance(len(query) + max(len(self.names[index]) for index in candidates))
+        scored = rapidfuzz_process.extract(query, [self.names[index] for index in candidates], scorer=Indel.distance,
+                                           score_cutoff=cutoff, limit=None)
+        return sorted(candidates[position] for _, distance, position in scored
+                      if distance <= self.max_distance(len(query) + len(self.names[candidates[position]])))
+
+    def matches(self, query):
+        """
+        Returns the (index, ratio) of every name matching query, in name order. Names equal to the
+        query ignoring case match without being scored, their ratio is None.
+        """
+        if query is None:
+            return []
+        exact = set(self._by_lower.get(query.lower(), ()))
+        candidates = [index for index in self.candidates(query) if index not in exact]
+        self.stats['queries'] += 1
+        self.stats['candidates'] += len(candidates)
+
+        results = [(index, None) for index in exact]
+        for index in self._score(query, candidates):
+            ratio = Levenshtein.ratio(query, self.names[index])
+            self.stats['scored'] += 1
+            if ratio > self.threshold:
+                results.append((index, ratio))
+        results.sort(key=lambda result: result[0])
+        return results
@@ -1,17 +1,517 @@
 import base64
+import hashlib
 import requests
 import json
 import time
-import Levenshtein
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from multipledispatch import dispatch
 from providers.Utils import group_repos_by_subdomain, calculate_criticality
+from providers.PhoenixClient import PhoenixClient
+from providers.Concurrency import BoundedExecutor, with_context
+from providers.TokenManager import TokenManager
+from providers.RemoteSnapshot import RemoteSnapshot
+from providers.NameMatcher import NameMatcher
+from providers.Journal import AppliedJournal, payload_hash
+from providers.RemoteCache import RemoteStateCache, CACHED_LISTINGS
+from providers.RuleIndex import RuleIndex, rules_of
+from providers.Plan import PlanRecorder, save_plan, load_plan, print_plan_summary, describe_operation, resolve_refs, already_applied_statuses
 
 
 SIMILARITY_THRESHOLD = 0.9 # Levenshtein ratio for comparing app name with service name. (1 means being equal)
 APIdomain = "https://api.YOURDOMAIN.securityphoenix.cloud" #change this with your specific domain
 DEBUG = False #debug settings to trigger debug output 
 
-def get_auth_token(clientID, clientSecret, retries=3):
+RULES_ENDPOINT = "/v1/components/rules"
+PAGE_SIZE = None # items per page requested from listing endpoints, None uses the API default
+PAGE_WORKERS = 4 # number of listing pages fetched concurrently
+RULE_BATCH_SIZE = 20 # maximum number of rules sent in one /v1/components/rules request
+TEAM_USER_BATCH_SIZE = 50 # maximum number of users assigned to a team in one PUT request
+TEAM_DELETE_WORKERS = 4 # number of team member removals sent concurrently
+
+client = PhoenixClient(APIdomain) # shared pooled session used by every Phoenix API call
+rule_executor = BoundedExecutor() # runs component rule writes, sequential unless configure_concurrency is called
+token_manager = None # created by get_access_token
+journal = None # applied-state journal, set by configure_journal
+remote_cache = None # on-disk cache of the remote listings, set by configure_remote_cache
+rule_index = None # RuleIndex of the rules existing on the targeted components, set by index_component_rules
+new_rule_targets = set() # (application, component) names, lowercased, of the components and services created by this run
+scope = None # RunScope limiting the teams whose members are reconciled, set by configure_scope
+
+def configure_client(api_domain=None, pool_size=None, rate_limit=None, max_attempts=None, retry_base_delay=None, retry_max_delay=None):
+    """
+    Points the shared client at the given Phoenix domain and sets its connection pool size, rate limit and retry policy.
+
+    Args:
+    - api_domain: Phoenix API domain, overrides APIdomain when provided.
+    - pool_size: Maximum number of keep-alive connections.
+    - rate_limit: Maximum requests per second (0 for no limit).
+    - max_attempts: Total attempts per request (1 disables retries).
+    - retry_base_delay: Backoff of the first retry in seconds, doubled on every attempt.
+    - retry_max_delay: Upper bound of a single backoff in seconds.
+    """
+    global APIdomain
+    if api_domain:
+        APIdomain = api_domain
+    client.configure(base_url=APIdomain, pool_size=pool_size, rate_limit=rate_limit)
+    client.retry_policy.configure(max_attempts, retry_base_delay, retry_max_delay)
+
+def configure_concurrency(max_in_flight=1, max_in_flight_per_endpoint=None):
+    """
+    Sets how many component rule writes may be in flight at once. 1 keeps the sequential behaviour.
+
+    Args:
+    - max_in_flight: Maximum number of concurrent rule requests.
+    - max_in_flight_per_endpoint: Maximum number of concurrent requests per endpoint.
+    """
+    rule_executor.configure(max_in_flight, max_in_flight_per_endpoint)
+
+def configure_rule_batching(batch_size):
+    """
+    Sets the maximum number of rules for the same application/component sent in one request (1 disables batching).
+    """
+    global RULE_BATCH_SIZE
+    RULE_BATCH_SIZE = max(1, batch_size)
+
+def configure_team_membership(batch_size=None, delete_workers=None):
+    """
+    Sets the maximum number of users assigned to a team in one request (1 disables batching) and how many removals run concurrently.
+    """
+    global TEAM_USER_BATCH_SIZE, TEAM_DELETE_WORKERS
+    if batch_size:
+        TEAM_USER_BATCH_SIZE = max(1, batch_size)
+    if delete_workers:
+        TEAM_DELETE_WORKERS = max(1, delete_workers)
+
+def configure_journal(state_file, full=False):
+    """
+    Opens the applied-state journal: entities applied by a previous run with the same payload are skipped.
+
+    Args:
+    - state_file: SQLite file recording the applied entities.
+    - full: Send every entity regardless of the journal (the journal is still updated).
+    """
+    global journal
+    journal = AppliedJournal(state_file, APIdomain, full)
+    return journal
+
+def configure_remote_cache(cache_file, ttl, refresh=False):
+    """
+    Reads the application, component and team listings from an on-disk cache while they are younger than ttl,
+    the writes sent from now on keep the cached listings up to date.
+
+    Args:
+    - cache_file: SQLite file the listings are cached in.
+    - ttl: Age in seconds after which a listing is fetched again.
+    - refresh: Forget the cached listings, so they are all fetched again.
+    """
+    global remote_cache
+    remote_cache = RemoteStateCache(cache_file, APIdomain, ttl)
+    if refresh:
+        remote_cache.clear()
+    client.add_write_listener(remote_cache.observe_write)
+    return remote_cache
+
+def configure_scope(run_scope):
+    """
+    Limits the team membership reconciliation (and the member lists fetched for it) to the teams of run_scope.
+    """
+    global scope
+    scope = run_scope
+
+def is_applied(kind, key, payload):
+    """
+    Returns True when the journal says the entity was already applied with this payload.
+    """
+    return journal is not None and journal.is_current(kind, key, payload)
+
+def record_applied(kind, key, payload):
+    if journal is not None:
+        journal.record(kind, key, payload)
+
+def keep_applied(kind, key):
+    if journal is not None:
+        journal.keep(kind, key)
+
+def rule_key(selector, rule):
+    # rule names aren't unique (e.g. one repository rule per repo), the filter tells them apart
+    return (f"{selector['applicationSelector']['name']}/{selector['componentSelector']['name']}/{rule['name']}"
+            f"#{payload_hash(rule['filter'])[:16]}")
+
+def deployment_key(deployment):
+    return f"{deployment['applicationSelector']['name']}/{json.dumps(deployment['serviceSelector'], sort_keys=True)}"
+
+def configure_pagination(page_size=None, page_workers=None):
+    """
+    Sets the page size requested from listing endpoints and how many pages are fetched concurrently.
+    """
+    global PAGE_SIZE, PAGE_WORKERS
+    if page_size:
+        PAGE_SIZE = page_size
+    if page_workers:
+        PAGE_WORKERS = page_workers
+
+def get_page(endpoint, page_number, headers):
+    """
+    Fetches a single page of a paginated listing endpoint and returns the decoded response.
+    """
+    params = {'pageNumber': page_number}
+    if PAGE_SIZE:
+        params['pageSize'] = PAGE_SIZE
+    response = client.get(construct_api_url(endpoint), headers=headers, params=params)
+    response.raise_for_status()
+    return response.json()
+
+def get_all_pages(endpoint, headers):
+    """
+    Fetches every page of a paginated listing endpoint. Page 0 gives totalPages, the remaining
+    pages are fetched concurrently (bounded by PAGE_WORKERS) and merged back in page order.
+
+    The application, component and team listings are read from the remote cache when configured and fresh.
+
+    Returns:
+    - The concatenated 'content' of all pages.
+    """
+    cached = endpoint in CACHED_LISTINGS and remote_cache is not None
+    if cached:
+        items = remote_cache.load(endpoint)
+        if items is not None:
+            return items
+
+    first_page = get_page(endpoint, 0, headers)
+    items = list(first_page.get('content', []))
+    total_pages = first_page.get('totalPages', 1) or 1
+
+    if total_pages > 1:
+        workers = max(1, min(PAGE_WORKERS, total_pages - 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='phoenix-page') as pool:
+            pages = pool.map(with_context(lambda page_number: get_page(endpoint, page_number, headers)), range(1, total_pages))
+            for page in pages:
+                items.extend(page.get('content', []))
+
+    if cached:
+        remote_cache.store(endpoint, items)
+    return items
+
+def wait_for_rule_writes():
+    """
+    Blocks until every scheduled rule write has finished, re-raising the first fatal error.
+    """
+    rule_executor.drain()
+
+def start_plan():
+    """
+    Switches the module to plan mode: from now on reads still go to the API, but every write
+    is recorded as a plan operation instead of being sent.
+    """
+    global client
+    if not isinstance(client, PlanRecorder):
+        client = PlanRecorder(client)
+
+def write_plan(path):
+    """
+    Writes the operations recorded since start_plan to path and prints the plan summary.
+    """
+    wait_for_rule_writes()
+    # what the journal would record once these operations are sent, written by --apply when the whole plan succeeds
+    records = journal.staged_records() if journal is not None else []
+    plan = save_plan(path, client.operations, APIdomain, records)
+    print_plan_summary(plan)
+    return plan
+
+def apply_plan(path, headers):
+    """
+    Executes the operations of a saved plan in order, without reading the configuration or the remote state again.
+    Rule operations go through the rule executor (a rejected batch is sent again in halves, down to single rules).
+    Ids of entities created by the plan are resolved from the responses of the operations creating them.
+    When every operation succeeded, the journal records of the plan are staged in the journal (if configured).
+
+    Returns:
+    - The number of failed operations.
+    """
+    try:
+        plan = load_plan(path)
+    except (OSError, ValueError) as e:
+        print(f"Error reading plan {path}: {e}")
+        exit(1)
+
+    if plan['api_domain'].rstrip('/') != APIdomain.rstrip('/'):
+        print(f"Error: plan {path} was computed against {plan['api_domain']}, not {APIdomain}")
+        exit(1)
+
+    print_plan_summary(plan)
+    created_ids = {}
+    failures = 0
+    submitted_rules = []
+    for operation in plan['operations']:
+        try:
+            endpoint = resolve_refs(operation['endpoint'], created_ids)
+            payload = resolve_refs(operation['payload'], created_ids)
+        except KeyError as e:
+            print(f"Error: skipping {describe_operation(operation)}, operation {e} it depends on did not create its entity")
+            failures += 1
+            continue
+
+        if operation['kind'] == 'team member' and operation['method'] == 'PUT':
+            # a batch the API rejects is re-sent one user at a time, like during a normal run
+            failures += assign_team_users(endpoint.split('/')[3], [user['email'] for user in payload['users']], headers, exit_on_error=False)
+            continue
+
+        if endpoint == RULES_ENDPOINT:
+            pending_rules = [pending_rule(rule, f" + Rule {rule['name']} created.", f" > Rule {rule['name']} already exists.", exit_on_error=False)
+                             for rule in payload['rules']]
+            submitted_rules.extend(pending_rules)
+            rule_executor.submit(RULES_ENDPOINT, post_component_rules, payload['selector'], pending_rules, headers)
+            continue
+
+        response = None
+        try:
+            response = client.request(operation['method'], construct_api_url(endpoint), headers=headers, json=payload)
+            response.raise_for_status()
+            print(f" + {describe_operation(operation)}")
+            if operation['action'] == 'create' and response.content:
+                body = response.json()
+                if isinstance(body, dict) and body.get('id'):
+                    created_ids[operation['id']] = body['id']
+        except requests.exceptions.RequestException as e:
+            if response is not None and response.status_code in already_applied_statuses(endpoint):
+                print(f" > {describe_operation(operation)} already applied ({response.status_code})")
+                continue
+            print(f"Error: {describe_operation(operation)} failed: {e}")
+            if response is not None:
+                print(f"Response content: {response.content}")
+            failures += 1
+
+    wait_for_rule_writes()
+    # rule writes run on the rule executor, their failures are flagged on the pending rules
+    failures += sum(pending['failed'] for pending in submitted_rules)
+    if journal is not None and not failures:
+        for kind, key, digest in plan.get('records', []):
+            try:
+                # e.g. team rules are journaled under the id of the team the plan creates
+                journal.record_hash(kind, resolve_refs(key, created_ids), digest)
+            except KeyError:
+                continue
+    return failures
+
+def pending_rule(rule, created_message, exists_message, exit_on_error=True, bad_request_message=None):
+    """
+    Wraps a component rule with the messages logged once it has been sent.
+
+    Args:
+    - rule: The rule (name and filter).
+    - created_message: Printed when the rule is created.
+    - exists_message: Printed when the rule already exists (409).
+    - exit_on_error: Whether any other error stops the run, otherwise the rule is flagged as failed.
+    - bad_request_message: When provided, a 400 prints this message instead of stopping the run.
+    """
+    return {
+        'rule': rule,
+        'created_message': created_message,
+        'exists_message': exists_message,
+        'exit_on_error': exit_on_error,
+        'bad_request_message': bad_request_message,
+        'failed': False
+    }
+
+def component_rule(filterName, filterValue, ruleName):
+    return pending_rule({"name": ruleName, "filter": {filterName: filterValue}},
+                        f"Rule for { filterValue } created.", f" > Rule for {filterValue} already exists.")
+
+def rule_selector(applicationName, componentName):
+    return {
+        "applicationSelector": {"name": applicationName, "caseSensitive": False},
+        "componentSelector": {"name": componentName, "caseSensitive": False}
+    }
+
+def post_component_rule(selector, pending, headers):
+    """
+    Sends a single component rule to /v1/components/rules and logs the outcome.
+    A 409 means the rule already exists and is not treated as an error.
+    """
+    payload = {"selector": selector, "rules": [pending['rule']]}
+    response = None
+    try:
+        api_url = construct_api_url(RULES_ENDPOINT)
+        response = client.post(api_url, headers=headers, json=payload)
+        response.raise_for_status()
+        print(pending['created_message'])
+        record_applied('rule', rule_key(selector, pending['rule']), pending['rule'])
+    except requests.exceptions.RequestException as e:
+        if response is not None and response.status_code == 409:
+            print(pending['exists_message'])
+            record_applied('rule', rule_key(selector, pending['rule']), pending['rule'])
+            return
+        print(f"Error: {e}")
+        if response is not None:
+            print(f"Response content: {response.content}")
+            if pending['bad_request_message'] and response.status_code == 400:
+                print(pending['bad_request_message'])
+                return
+        if pending['exit_on_error']:
+            exit(1)
+        pending['failed'] = True
+
+def post_component_rules(selector, pending_rules, headers):
+    """
+    Sends every rule sharing one selector in a single request. When the API rejects the batch
+    (e.g. 409 because one of the rules already exists) each half of it is sent again the same way,
+    down to single rules, so each rule still gets its own created / already exists outcome.
+    """
+    if len(pending_rules) == 1:
+        post_component_rule(selector, pending_rules[0], headers)
+        return
+
+    payload = {"selector": selector, "rules": [pending['rule'] for pending in pending_rules]}
+    response = None
+    try:
+        api_url = construct_api_url(RULES_ENDPOINT)
+        response = client.post(api_url, headers=headers, json=payload)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        reason = response.status_code if response is not None else e
+        print(f" > Batch of {len(pending_rules)} rules for {selector['componentSelector']['name']} not accepted ({reason}), sending it in two halves")
+        half = len(pending_rules) // 2
+        post_component_rules(selector, pending_rules[:half], headers)
+        post_component_rules(selector, pending_rules[half:], headers)
+        return
+
+    for pending in pending_rules:
+        print(pending['created_message'])
+        record_applied('rule', rule_key(selector, pending['rule']), pending['rule'])
+
+def mark_new_rule_target(applicationName, componentName):
+    """
+    Records a component or service created by this run: none of its rules exist yet, so they can be sent in batches.
+    """
+    new_rule_targets.add((applicationName.lower(), componentName.lower()))
+
+def rules_are_new(applicationName, componentName):
+    """
+    Returns True when the rules of the selector not skipped so far can't exist remotely: the component was
+    created by this run, or the rule index holds its existing rules.
+    """
+    if (applicationName.lower(), componentName.lower()) in new_rule_targets:
+        return True
+    return rule_index is not None and rule_index.indexed(applicationName, componentName)
+
+def rule_exists(selector, pending):
+    """
+    Returns True when the rule index holds the rule, which is then reported as already existing without being sent.
+    """
+    applicationName = selector['applicationSelector']['name']
+    componentName = selector['componentSelector']['name']
+    if rule_index is None or not rule_index.indexed(applicationName, componentName):
+        return False
+    if not rule_index.contains(applicationName, componentName, pending['rule']):
+        return False
+    print(pending['exists_message'])
+    record_applied('rule', rule_key(selector, pending['rule']), pending['rule'])
+    return True
+
+def component_rule_targets(applications, environments, repos):
+    """
+    Returns the (application or environment name, component or service name) selectors the rules of the run target,
+    leaving out components and services the journal records as unchanged and cloud asset rules it records as applied.
+    """
+    targets = {}
+    for application in applications:
+        for component in application['Components']:
+            if journal is None or not journal.unchanged('component', f"{application['AppName']}/{component['ComponentName']}", component):
+                targets.setdefault((application['AppName'].lower(), component['ComponentName'].lower()), (application['AppName'], component['ComponentName']))
+    for environment in environments:
+        for service in environment['Services'] or []:
+            if journal is None or not journal.unchanged('service', f"{environment['Name']}/{service['Service']}", service):
+                targets.setdefault((environment['Name'].lower(), service['Service'].lower()), (environment['Name'], service['Service']))
+    for repo in repos:
+        pending = cloud_asset_pending_rule(repo['Subdomain'], f"*{repo['RepositoryName']}(*", "Production")
+        selector = rule_selector("Production", repo['Subdomain'])
+        if journal is None or not journal.unchanged('rule', rule_key(selector, pending['rule']), pending['rule']):
+            targets.setdefault(("production", repo['Subdomain'].lower()), ("Production", repo['Subdomain']))
+    return list(targets.values())
+
+def get_component_rules(component_id, headers):
+    response = client.get(construct_api_url(f"/v1/components/{component_id}/rules"), headers=headers)
+    response.raise_for_status()
+    return rules_of(response.json())
+
+def index_component_rules(targets, snapshot, headers):
+    """
+    Fetches the rules of the targeted components that exist remotely, concurrently (bounded by PAGE_WORKERS),
+    into the rule index: from now on rules found in the index are skipped instead of posted and answered with 409.
+    Used with --rule-index only. There is no bulk listing of component rules, this sends one GET per component to
+    /v1/components/{id}/rules, an endpoint assumed to exist that isn't part of the documented API: when the first
+    component's rules can't be fetched, no index is used and every rule is posted.
+
+    Args:
+    - targets: (application or environment name, component or service name) pairs, see component_rule_targets.
+    - snapshot: RemoteSnapshot the component ids are looked up in.
+    - headers: Request headers.
+    """
+    global rule_index
+    components = []
+    for applicationName, componentName in targets:
+        application = (snapshot.find_application(applicationName)
+                       or snapshot.find_application(applicationName, "APPLICATION", case_sensitive=False)
+                       or snapshot.find_application(applicationName, "ENVIRONMENT", case_sensitive=False))
+        component = snapshot.find_component(componentName, application.get('id')) if application else None
+        if component and component.get('id'):
+            components.append((applicationName, componentName, component['id']))
+
+    index = RuleIndex()
+    if not components:
+        rule_index = index
+        return index
+
+    print(f"Getting the existing rules of {len(components)} components, one request per component")
+    # the first component tells whether the API lists component rules at all
+    applicationName, componentName, component_id = components[0]
+    try:
+        index.add_rules(applicationName, componentName, get_component_rules(component_id, headers))
+    except requests.exceptions.RequestException as e:
+        print(f"Warning: --rule-index ignored, the existing component rules can't be listed ({e}), every rule is sent")
+        return None
+
+    def fetch(target):
+        try:
+            index.add_rules(target[0], target[1], get_component_rules(target[2], headers))
+        except requests.exceptions.RequestException as e:
+            print(f"Could not get the rules of {target[0]}/{target[1]}, its rules are sent: {e}")
+
+    workers = max(1, min(PAGE_WORKERS, len(components) - 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='phoenix-rules') as pool:
+        list(pool.map(with_context(fetch), components[1:]))
+    rule_index = index
+    return index
+
+def submit_component_rules(applicationName, componentName, pending_rules, headers):
+    """
+    Groups the rules targeting one application/component selector into requests of at most
+    RULE_BATCH_SIZE rules and schedules them on the rule executor. Only rules known to be new are
+    batched (see rules_are_new): any other rule may already exist, and its 409 would reject the
+    whole batch, so it is sent in a request of its own.
+
+    Args:
+    - applicationName: Name of the application or environment.
+    - componentName: Name of the component or service.
+    - pending_rules: Rules built with pending_rule / component_rule, None entries, rules the journal
+      records as applied and rules the rule index holds are ignored.
+    - headers: Request headers.
+    """
+    selector = rule_selector(applicationName, componentName)
+    pending_rules = [pending for pending in pending_rules
+                     if pending and not is_applied('rule', rule_key(selector, pending['rule']), pending['rule'])
+                     and not rule_exists(selector, pending)]
+
+    batch_size = RULE_BATCH_SIZE if rules_are_new(applicationName, componentName) else 1
+    for start in range(0, len(pending_rules), batch_size):
+        batch = pending_rules[start:start + batch_size]
+        if DEBUG:
+            payload = {"selector": selector, "rules": [pending['rule'] for pending in batch]}
+            print(f"Payload for {componentName}: {json.dumps(payload, indent=2)}")
+        rule_executor.submit(RULES_ENDPOINT, post_component_rules, selector, batch, headers)
+
+def get_auth_token(clientID, clientSecret):
     credentials = f"{clientID}:{clientSecret}".encode('utf-8')
     base64_credentials = base64.b64encode(credentials).decode('utf-8')
     
@@ -22,18 +522,40 @@ def get_auth_token(clientID, clientSecret, retries=3):
     
     print(f"Making request to {token_url} to obtain token.")
     
-    for attempt in range(retries):
-        try:
-            response = requests.get(token_url, headers=headers)
-            response.raise_for_status()
-            return response.json().get('token')
-        except requests.exceptions.RequestException as e:
-            print(f"Error obtaining token (Attempt {attempt+1}/{retries}): {e}")
-            time.sleep(2)  # Wait for 2 seconds before retrying
+    # transient failures are retried by the client's retry policy
+    try:
+        response = client.get(token_url, headers=headers)
+        response.raise_for_status()
+        token = response.json().get('token')
+        client.set_access_token(token)
+        return token
+    except requests.exceptions.RequestException as e:
+        print(f"Error obtaining token: {e}")
     
-    print(f"Failed to obtain token after {retries} attempts.")
+    print(f"Failed to obtain token after {client.retry_policy.max_attempts} attempts.")
     exit(1)
 
+def get_access_token(clientID, clientSecret, token_cache_file=None):
+    """
+    Returns an access token kept by a shared TokenManager: the token is cached with its expiry,
+    optionally persisted to token_cache_file (mode 0600) for reuse by later runs, and refreshed
+    in the background shortly before it expires. Every client request uses the current token.
+
+    Args:
+    - clientID: Phoenix API client id.
+    - clientSecret: Phoenix API client secret.
+    - token_cache_file: Optional file the token is persisted to.
+    """
+    global token_manager
+    if token_manager is None:
+        cache_key = hashlib.sha256(f"{APIdomain}|{clientID}".encode('utf-8')).hexdigest()
+        token_manager = TokenManager(lambda: get_auth_token(clientID, clientSecret), cache_key, token_cache_file)
+        client.use_token_manager(token_manager)
+
+    token = token_manager.get_token()
+    token_manager.start_background_refresh()
+    return token
+
 def construct_api_url(endpoint):
     return f"{APIdomain}{endpoint}"
 
@@ -64,7 +586,7 @@ def create_environment(environment, headers):
     try:
         api_url = construct_api_url("/v1/applications")
         print(f"Payload for environment creation: {json.dumps(payload, indent=2)}")
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + Environment added: {environment['Name']}")
     except requests.exceptions.RequestException as e:
@@ -73,12 +595,12 @@ def create_environment(environment, headers):
         raise
 
 # Function to add services and process rules for the environment
-def add_environment_services(repos, subdomains, environments, application_environments, phoenix_components, subdomain_owners, teams, access_token):
+def add_environment_services(repos, subdomains, environments, snapshot, subdomain_owners, teams, access_token):
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
 
     for environment in environments:
         env_name = environment['Name']
-        env_id = get_environment_id(application_environments, env_name)
+        env_id = get_environment_id(snapshot, env_name)
 
         print(f"[Services] for {env_name}")
 
@@ -90,12 +612,18 @@ def add_environment_services(repos, subdomains, environments, application_enviro
                     print(f"Warning: Service {service['Service']} has no TeamName, skipping service.")
                     continue
 
-                if not environment_service_exist(env_id, phoenix_components, service['Service']):
+                service_key = f"{env_name}/{service['Service']}"
+                if not environment_service_exist(env_id, snapshot, service['Service']):
                     try:
                         add_service(env_name, service['Service'], service['Tier'], team_name, headers)
+                        record_applied('service', service_key, service)
                     except NotImplementedError as e:
                         print(f"Error adding service {service['Service']} for environment {env_name}: {e}")
+                elif not is_applied('service', service_key, service):
+                    # services have no update call, an existing one is journaled with its current values
+                    record_applied('service', service_key, service)
                 
+                # rules are checked against the journal one by one
                 add_service_rule_batch(environment, service, headers)
 
 # AddContainerRule Function
@@ -115,9 +643,10 @@ def add_container_rule(image, subdomain, environment_name, access_token):
     }
 
 def add_service_rule_batch(environment, service, headers):
-    payload = None
     serviceName = service['Service']
     environmentName = environment['Name']
+    # every rule of the service targets the same selector and is sent in as few requests as possible
+    rules = []
 
     # Handle INFRA services with CIDR association (IP-based)
     if service.get('Cidr') and service['Type'] == 'Infra':
@@ -136,46 +665,18 @@ def add_service_rule_batch(environment, service, headers):
             else:
                 finalCidr = cidr
 
-            payload = {
-                "selector": {
-                    "applicationSelector": {
-                        "name": environmentName,
-                        "caseSensitive": False
-                    },
-                    "componentSelector": {
-                        "name": serviceName,
-                        "caseSensitive": False
-                    }
-                },
-                "rules": [
-                    {
-                        "name": f"CIDR rule for {serviceName} - {index}",
-                        "filter": {
-                            "assetType": "INFRA",  # Should be a single string, not an array
-                            "cidr": finalCidr
-                        }
-                    }
-                ]
+            rule = {
+                "name": f"CIDR rule for {serviceName} - {index}",
+                "filter": {
+                    "assetType": "INFRA",  # Should be a single string, not an array
+                    "cidr": finalCidr
+                }
             }
 
-            if DEBUG:
-                print(f"Payload being sent for CIDR {finalCidr}: {json.dumps(payload, indent=2)}")
-
-            # Send the request to add the rule
-            try:
-                api_url = construct_api_url("/v1/components/rules")
-                response = requests.post(api_url, headers=headers, json=payload)
-                response.raise_for_status()  # This will raise HTTPError for 4xx and 5xx responses
-                print(f"+ CIDR Rule {index} for {finalCidr} added to {serviceName}.")
-            except requests.exceptions.HTTPError as e:
-                print(f"Error: {e}")
-                print(f"Response content: {response.content}")  # Log response content for debugging
-                if response.status_code == 400:
-                    print("Bad Request: Check if all required fields are provided and valid in the payload.")
-                elif response.status_code == 409:
-                    print(f" > CIDR Rule for {finalCidr} already exists.")
-                else:
-                    exit(1)
+            rules.append(pending_rule(rule,
+                                      f"+ CIDR Rule {index} for {finalCidr} added to {serviceName}.",
+                                      f" > CIDR Rule for {finalCidr} already exists.",
+                                      bad_request_message="Bad Request: Check if all required fields are provided and valid in the payload."))
 
     # Handle Tag-based association
     if service.get('Tag'):
@@ -183,31 +684,34 @@ def add_service_rule_batch(environment, service, headers):
 
         if len(tag_parts) < 2 or not tag_parts[0] or not tag_parts[1]:
             print(f"Error: Invalid tag format for {service['Service']}. Expected 'key:value', got {service['Tag']}")
+            submit_component_rules(environmentName, serviceName, rules, headers)
             return
         
-        create_component_rule(environment['Name'], service['Service'], 'tags', [{"key": tag_parts[0], "value": tag_parts[1]}], f'Rule for tags for {service['Service']}', headers)
+        rules.append(component_rule('tags', [{"key": tag_parts[0], "value": tag_parts[1]}], f'Rule for tags for {serviceName}'))
         
     if service.get('SearchName'):
-        create_component_rule(environmentName, serviceName, 'keyLike', service['SearchName'], f'Rule for keyLike for {serviceName}', headers)
+        rules.append(component_rule('keyLike', service['SearchName'], f'Rule for keyLike for {serviceName}'))
     if service.get('Fqdn'):
-        create_component_rule(environmentName, serviceName, 'fqdn', service['Fqdn'], f'Rule for fqdn for {serviceName}', headers)
+        rules.append(component_rule('fqdn', service['Fqdn'], f'Rule for fqdn for {serviceName}'))
     if service.get('Netbios'):
-        create_component_rule(environmentName, serviceName, 'netbios', service['Netbios'], f'Rule for netbios for {serviceName}', headers)
+        rules.append(component_rule('netbios', service['Netbios'], f'Rule for netbios for {serviceName}'))
     if service.get('OsNames'):
-        create_component_rule(environmentName, serviceName, 'osNames', service['OsNames'], f'Rule for osNames for {serviceName}', headers)
+        rules.append(component_rule('osNames', service['OsNames'], f'Rule for osNames for {serviceName}'))
     if service.get('Hostnames'):
-        create_component_rule(environmentName, serviceName, 'hostnames', service['Hostnames'], f'Rule for hostnames for {serviceName}', headers)
+        rules.append(component_rule('hostnames', service['Hostnames'], f'Rule for hostnames for {serviceName}'))
     if service.get('ProviderAccountId'):
-        create_component_rule(environmentName, serviceName, 'providerAccountId', service['ProviderAccountId'], f'Rule for providerAccountId for {serviceName}', headers)
+        rules.append(component_rule('providerAccountId', service['ProviderAccountId'], f'Rule for providerAccountId for {serviceName}'))
     if service.get('ProviderAccountName'):
-        create_component_rule(environmentName, serviceName, 'providerAccountName', service['ProviderAccountName'], f'Rule for providerAccountName for {serviceName}', headers)
+        rules.append(component_rule('providerAccountName', service['ProviderAccountName'], f'Rule for providerAccountName for {serviceName}'))
     if service.get('ResourceGroup'):
-        create_component_rule(environmentName, serviceName, 'resourceGroup', service['ResourceGroup'], f'Rule for resourceGroup for {serviceName}', headers)
+        rules.append(component_rule('resourceGroup', service['ResourceGroup'], f'Rule for resourceGroup for {serviceName}'))
     if service.get('AssetType'):
-        create_component_rule(environmentName, serviceName, 'assetType', service['AssetType'], f'Rule for assetType for {serviceName}', headers)
+        rules.append(component_rule('assetType', service['AssetType'], f'Rule for assetType for {serviceName}'))
 
     if service.get('MultiConditionRule'):
-        create_multicondition_service_rule(environmentName, serviceName, service.get('MultiConditionRule'), headers)
+        rules.append(multicondition_service_rule(serviceName, service.get('MultiConditionRule')))
+
+    submit_component_rules(environmentName, serviceName, rules, headers)
 
 
 # AddServiceRule Function
@@ -235,13 +739,13 @@ def add_service_rule(environment, service, tag_name, tag_value, access_token):
             print(f"Payload being sent to /v1rule: {json.dumps(payload, indent=2)}")
 
 
-def create_applications(applications, application_environments, phoenix_components, headers):
+def create_applications(applications, snapshot, headers):
     print('[Applications]')
     for application in applications:
-        if not any(env['name'] == application['AppName'] and env['type'] == "APPLICATION" for env in application_environments):
+        if not snapshot.application_exists(application['AppName'], "APPLICATION"):
             create_application(application, headers)
         else:
-            update_application(application, application_environments, phoenix_components, headers)
+            update_application(application, snapshot, headers)
 
 
 def create_application(app, headers):
@@ -262,12 +766,13 @@ def create_application(app, headers):
 
     try:
         api_url = construct_api_url("/v1/applications")
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + Application {app['AppName']} added")
-        time.sleep(2)
+        record_applied('application', app['AppName'], application_state(app))
     except requests.exceptions.RequestException as e:
         if response.status_code == 409:
+            # the existing application's values are unknown, it isn't journaled so the next run compares and updates it
             print(f" > Application {app['AppName']} already exists")
         else:
             print(f"Error: {e}")
@@ -310,12 +815,14 @@ def create_custom_component(applicationName, component, headers):
     api_url = construct_api_url("/v1/components")
 
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"{component['ComponentName']} component added.")
-        time.sleep(2)
+        mark_new_rule_target(applicationName, component['ComponentName'])
+        record_applied('component', f"{applicationName}/{component['ComponentName']}", component)
     except requests.exceptions.RequestException as e:
         if response.status_code == 409:
+            # not journaled, the next run compares the existing component and updates it
             print(f" > Component {component['ComponentName']} already exists")
         else:
             print(f"Error: {e}")
@@ -324,23 +831,36 @@ def create_custom_component(applicationName, component, headers):
 
     create_component_rules(applicationName, component, headers)
 
-def update_application(application, existing_apps_envs, existing_components, headers):
-    existing_app = next(filter(lambda app: app['name'] == application['AppName'] and app['type'] == "APPLICATION", existing_apps_envs), None)
+def application_state(application):
+    """
+    Returns the application fields the applications phase applies, components are journaled on their own.
+    """
+    return {key: application[key] for key in ('AppName', 'Criticality', 'Responsable', 'TeamNames')}
+
+def update_application(application, snapshot, headers):
+    existing_app = snapshot.find_application(application['AppName'], "APPLICATION")
     if not existing_app:
         print(f"Unexpected call to the update application, as the application does not exist")
     
-    update_application_teams(existing_app, application, headers)
+    # entities the journal records as applied with the same values are not compared with the remote state again,
+    # their rules are checked against the journal one by one
+    if not is_applied('application', application['AppName'], application_state(application)):
+        update_application_teams(existing_app, application, headers)
 
-    update_application_crit_owner(application, existing_app, headers)
+        update_application_crit_owner(application, existing_app, headers)
+        record_applied('application', application['AppName'], application_state(application))
 
     for component in application['Components']:
-        existing_component = next(filter(lambda comp: comp['name'] == component['ComponentName'], existing_components), None)
+        existing_component = snapshot.find_component(component['ComponentName'])
         # if new component, create it, otherwise update repos
         if not existing_component:
             create_custom_component(application['AppName'], component, headers)
             continue
 
-        update_component(application, component, existing_component, headers)
+        component_key = f"{application['AppName']}/{component['ComponentName']}"
+        if not is_applied('component', component_key, component):
+            update_component(application, component, existing_component, headers)
+            record_applied('component', component_key, component)
         create_component_rules(application['AppName'], component, headers)
 
 def update_component(application, component, existing_component, headers):
@@ -381,6 +901,13 @@ def update_component(application, component, existing_component, headers):
 
     tags = list(filter(lambda tag : tag['value'], tags_to_add))
 
+    existing_tags = {(tag.get('key'), tag.get('value')) for tag in existing_component.get('tags')}
+    if (not tags_to_remove and all((tag['key'], tag['value']) in existing_tags for tag in tags)
+            and component.get('Criticality', 5) == existing_component.get('criticality', 5)):
+        if DEBUG:
+            print(f"No change detected to update for component {component['ComponentName']}")
+        return
+
     payload = {
         "name": component['ComponentName'],
         "criticality": component.get('Criticality', 5),  # Default to criticality 5
@@ -393,10 +920,9 @@ def update_component(application, component, existing_component, headers):
     api_url = construct_api_url(f"/v1/components/{existing_component.get('id')}")
 
     try:
-        response = requests.patch(api_url, headers=headers, json=payload)
+        response = client.patch(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"{component['ComponentName']} component updated.")
-        time.sleep(2)
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
         print(f"Response content: {response.content}")
@@ -425,7 +951,7 @@ def update_application_crit_owner(application, existing_application, headers):
 
     try:
         api_url = construct_api_url(f"/v1/applications/{existing_application.get('id')}")
-        response = requests.patch(api_url, headers=headers, json=payload)
+        response = client.patch(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"Updated application {application['AppName']}.")
     except requests.exceptions.RequestException as e:
@@ -434,75 +960,51 @@ def update_application_crit_owner(application, existing_application, headers):
         exit(1)
 
 def create_component_rules(applicationName, component, headers):
+    # every rule of the component targets the same selector and is sent in as few requests as possible
+    rules = []
     if component.get('SearchName'):
-        create_component_rule(applicationName, component['ComponentName'], 'keyLike', component['SearchName'], f'Rule for keyLike for {component['ComponentName']}', headers)
+        rules.append(component_rule('keyLike', component['SearchName'], f'Rule for keyLike for {component['ComponentName']}'))
     if component.get('Tags'):
         tags_to_add = []
         for tag in component.get('Tags'):
             tags_to_add.append({'value': tag})
-        create_component_rule(applicationName, component['ComponentName'], 'tags', tags_to_add, f'Rule for tags for {component['ComponentName']}', headers)
+        rules.append(component_rule('tags', tags_to_add, f'Rule for tags for {component['ComponentName']}'))
     if component.get('Cidr'):
-        create_component_rule(applicationName, component['ComponentName'], 'cidr', component['Cidr'], f'Rule for cidr for {component['ComponentName']}', headers)
+        rules.append(component_rule('cidr', component['Cidr'], f'Rule for cidr for {component['ComponentName']}'))
     if component.get('Fqdn'):
-        create_component_rule(applicationName, component['ComponentName'], 'fqdn', component['Fqdn'], f'Rule for fqdn for {component['ComponentName']}', headers)
+        rules.append(component_rule('fqdn', component['Fqdn'], f'Rule for fqdn for {component['ComponentName']}'))
     if component.get('Netbios'):
-        create_component_rule(applicationName, component['ComponentName'], 'netbios', component['Netbios'], f'Rule for netbios for {component['ComponentName']}', headers)
+        rules.append(component_rule('netbios', component['Netbios'], f'Rule for netbios for {component['ComponentName']}'))
     if component.get('OsNames'):
-        create_component_rule(applicationName, component['ComponentName'], 'osNames', component['OsNames'], f'Rule for osNames for {component['ComponentName']}', headers)
+        rules.append(component_rule('osNames', component['OsNames'], f'Rule for osNames for {component['ComponentName']}'))
     if component.get('Hostnames'):
-        create_component_rule(applicationName, component['ComponentName'], 'hostnames', component['Hostnames'], f'Rule for hostnames for {component['ComponentName']}', headers)
+        rules.append(component_rule('hostnames', component['Hostnames'], f'Rule for hostnames for {component['ComponentName']}'))
     if component.get('ProviderAccountId'):
-        create_component_rule(applicationName, component['ComponentName'], 'providerAccountId', component['ProviderAccountId'], f'Rule for providerAccountId for {component['ComponentName']}', headers)
+        rules.append(component_rule('providerAccountId', component['ProviderAccountId'], f'Rule for providerAccountId for {component['ComponentName']}'))
     if component.get('ProviderAccountName'):
-        create_component_rule(applicationName, component['ComponentName'], 'providerAccountName', component['ProviderAccountName'], f'Rule for providerAccountName for {component['ComponentName']}', headers)
+        rules.append(component_rule('providerAccountName', component['ProviderAccountName'], f'Rule for providerAccountName for {component['ComponentName']}'))
     if component.get('ResourceGroup'):
-        create_component_rule(applicationName, component['ComponentName'], 'resourceGroup', component['ResourceGroup'], f'Rule for resourceGroup for {component['ComponentName']}', headers)
+        rules.append(component_rule('resourceGroup', component['ResourceGroup'], f'Rule for resourceGroup for {component['ComponentName']}'))
     if component.get('AssetType'):
-        create_component_rule(applicationName, component['ComponentName'], 'assetType', component['AssetType'], f'Rule for assetType for {component['ComponentName']}', headers)
+        rules.append(component_rule('assetType', component['AssetType'], f'Rule for assetType for {component['ComponentName']}'))
     
 
     if component.get('MultiConditionRule'):
-        create_multicondition_component_rule(applicationName, component['ComponentName'], component.get('MultiConditionRule'), headers)
+        rules.append(multicondition_component_rule(component['ComponentName'], component.get('MultiConditionRule')))
 
     repository_names = component.get('RepositoryName', [])
     if isinstance(repository_names, str):
         repository_names = [repository_names]
     for repo_name in repository_names:
-        create_component_rule(applicationName, component['ComponentName'], 'repository', [repo_name], f'Rule for repository for {component['ComponentName']}', headers)
+        rules.append(component_rule('repository', [repo_name], f'Rule for repository for {component['ComponentName']}'))
+
+    submit_component_rules(applicationName, component['ComponentName'], rules, headers)
 
-            
 # Handle Repository Rule Creation for Components
 def create_component_rule(applicationName, componentName, filterName, filterValue, ruleName, headers):
-    rule = {
-        "name": ruleName,
-        "filter": {filterName: filterValue}
-    }
+    submit_component_rules(applicationName, componentName, [component_rule(filterName, filterValue, ruleName)], headers)
 
-    payload = {
-        "selector": {
-            "applicationSelector": {"name": applicationName, "caseSensitive": False},
-            "componentSelector": {"name": componentName, "caseSensitive": False}
-        },
-        "rules": [rule]
-    }
-
-    if DEBUG:
-        print(f"Payload for {componentName}: {json.dumps(payload, indent=2)}")
-
-    try:
-        api_url = construct_api_url("/v1/components/rules")
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        print(f"Rule for { filterValue } created.")
-    except requests.exceptions.RequestException as e:
-        if response.status_code == 409:
-            print(f" > Rule for {filterValue} already exists.")
-        else:
-            print(f"Error: {e}")
-            print(f"Response content: {response.content}")
-            exit(1)
-
-def create_multicondition_component_rule(applicationName, componentName, multicondition, headers):
+def multicondition_component_rule(componentName, multicondition):
     rule = {'name': 'Multicondition Rule'}
     rule['filter'] = {}
     if multicondition.get('SearchName'):
@@ -536,33 +1038,15 @@ def create_multicondition_component_rule(applicationName, componentName, multico
         rule['filter']['assetType'] = multicondition.get('AssetType')
 
     if not rule['filter']:
-        return
+        return None
 
-    payload = {
-        "selector": {
-            "applicationSelector": {"name": applicationName, "caseSensitive": False},
-            "componentSelector": {"name": componentName, "caseSensitive": False}
-        },
-        "rules": [rule]
-    }
+    return pending_rule(rule, f"Multicondition Rule for {componentName} created.",
+                        f" > Multicondition Rule for {componentName} already exists.")
 
-    if DEBUG:
-        print(f"Payload for multicondition {componentName}: {json.dumps(payload, indent=2)}")
-
-    try:
-        api_url = construct_api_url("/v1/components/rules")
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        print(f"Multicondition Rule for {componentName} created.")
-    except requests.exceptions.RequestException as e:
-        if response.status_code == 409:
-            print(f" > Multicondition Rule for {componentName} already exists.")
-        else:
-            print(f"Error: {e}")
-            print(f"Response content: {response.content}")
-            exit(1)
+def create_multicondition_component_rule(applicationName, componentName, multicondition, headers):
+    submit_component_rules(applicationName, componentName, [multicondition_component_rule(componentName, multicondition)], headers)
 
-def create_multicondition_service_rule(environmentName, serviceName, multicondition, headers):
+def multicondition_service_rule(serviceName, multicondition):
     rule = {'name': f'Multicondition Rule for {serviceName}'}
     rule['filter'] = {}
     if multicondition.get('SearchName'):
@@ -577,7 +1061,7 @@ def create_multicondition_service_rule(environmentName, serviceName, multicondit
         tag_parts = multicondition.get('Tag').split(':')
         if len(tag_parts) < 2 or not tag_parts[0] or not tag_parts[1]:
             print(f"Error: Invalid tag format for {serviceName}. Expected 'key:value', got {multicondition['Tag']}")
-            return
+            return None
         rule['filter']['tags'].append({"key": tag_parts[0], "value": tag_parts[1]})
     if multicondition.get('Cidr'):
         rule['filter']['cidr'] = multicondition.get('Cidr')
@@ -599,32 +1083,13 @@ def create_multicondition_service_rule(environmentName, serviceName, multicondit
         rule['filter']['assetType'] = multicondition.get('AssetType')
 
     if not rule['filter']:
-        return
-
-    payload = {
-        "selector": {
-            "applicationSelector": {"name": environmentName, "caseSensitive": False},
-            "componentSelector": {"name": serviceName, "caseSensitive": False}
-        },
-        "rules": [rule]
-    }
-
-    if DEBUG:
-        print(f"Payload for multicondition {serviceName}: {json.dumps(payload, indent=2)}")
+        return None
 
-    try:
-        api_url = construct_api_url("/v1/components/rules")
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        print(f"Multicondition Rule for {serviceName} created.")
-    except requests.exceptions.RequestException as e:
-        if response.status_code == 409:
-            print(f" > Multicondition Rule for {serviceName} already exists.")
-        else:
-            print(f"Error: {e}")
-            print(f"Response content: {response.content}")
-            exit(1)
+    return pending_rule(rule, f"Multicondition Rule for {serviceName} created.",
+                        f" > Multicondition Rule for {serviceName} already exists.")
 
+def create_multicondition_service_rule(environmentName, serviceName, multicondition, headers):
+    submit_component_rules(environmentName, serviceName, [multicondition_service_rule(serviceName, multicondition)], headers)
 
 def get_repositories_from_component(component):
     if not component['RepositoryName']:
@@ -673,7 +1138,7 @@ def create_repo(repo, access_token):
 
     try:
         # Make POST request to create the repository
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + {repo['RepositoryName']} added.")
     
@@ -688,10 +1153,14 @@ def create_repo(repo, access_token):
 def add_cloud_asset_rules(repos, access_token):
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
     
-    # Loop through each repository and modify domain if needed
+    # Loop through each repository, rules of repositories sharing a subdomain target the same component and are sent together
+    rules_by_subdomain = {}
     for repo in repos:
         search_term = f"*{repo['RepositoryName']}(*"
-        cloud_asset_rule(repo['Subdomain'], search_term, "Production", access_token)
+        rules_by_subdomain.setdefault(repo['Subdomain'], []).append(cloud_asset_pending_rule(repo['Subdomain'], search_term, "Production"))
+
+    for subdomain, rules in rules_by_subdomain.items():
+        submit_component_rules("Production", subdomain, rules, headers)
 
     # Adding rules for PowerPlatform with different environments
     #cloud_asset_rule("PowerPlatform", "powerplatform_prod", "Production", access_token)
@@ -699,48 +1168,23 @@ def add_cloud_asset_rules(repos, access_token):
     #cloud_asset_rule("PowerPlatform", "powerplatform_staging", "Staging", access_token)
     #cloud_asset_rule("PowerPlatform", "powerplatform_dev", "Development", access_token)
 
+def cloud_asset_pending_rule(name, search_term, environment_name):
+    rule = {
+        "name": name,
+        "filter": {
+            "keyLike": search_term
+        }
+    }
+
+    # Cloud asset rules are best effort, errors are logged without stopping the run
+    return pending_rule(rule, f"> Cloud Asset Rule added for {name} in {environment_name}",
+                        f" > Cloud Asset Rule for {name} already exists", exit_on_error=False)
+
 # CloudAssetRule Function
 def cloud_asset_rule(name, search_term, environment_name, access_token):
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
-    
-    # Create the payload
-    payload = {
-        "selector": {
-            "applicationSelector": {
-                "name": environment_name,
-                "caseSensitive": False
-            },
-            "componentSelector": {
-                "name": name,
-                "caseSensitive": False
-            }
-        },
-        "rules": [
-            {
-                "name": name,
-                "filter": {
-                    "keyLike": search_term
-                }
-            }
-        ]
-    }
 
-    api_url = construct_api_url("/v1/components/rules")
-    if DEBUG:
-        print(f"Payload being sent to /v1rule: {json.dumps(payload, indent=2)}")
-
-    try:
-        # Make POST request to add the cloud asset rule
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        print(f"> Cloud Asset Rule added for {name} in {environment_name}")
-    
-    except requests.exceptions.RequestException as e:
-        if response.status_code == 409:
-            print(f" > Cloud Asset Rule for {name} already exists")
-        else:
-            print(f"Error: {e}")
-            print(f"Error details: {response.content}")
+    submit_component_rules(environment_name, name, [cloud_asset_pending_rule(name, search_term, environment_name)], headers)
 
 def create_teams(teams, pteams, access_token):
     """
@@ -780,7 +1224,7 @@ def create_teams(teams, pteams, access_token):
 
             try:
                 # Make the POST request to add the team
-                response = requests.post(api_url, headers=headers, json=payload)
+                response = client.post(api_url, headers=headers, json=payload)
                 response.raise_for_status()
                 team['id'] = response.json()['id']
                 new_pteams.append(response.json())
@@ -835,16 +1279,11 @@ def populate_phoenix_teams(access_token):
     - List of teams if the request is successful, otherwise exits with an error message.
     """
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
-    api_url = construct_api_url("/v1/teams")
 
     try:
         print("Getting list of Phoenix Teams")
-        # Make the GET request to retrieve the list of teams
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        
-        # Return the content of the response (team list)
-        return response.json().get('content', [])
+        # Retrieve every page of the team list
+        return get_all_pages("/v1/teams", headers)
     
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
@@ -874,6 +1313,8 @@ def create_team_rules(teams, pteams, access_token):
                 if team.get('RecreateTeamAssociations'):
                     print(f" > recreating pteam association for {team['TeamName']}")
                     create_team_rule("pteam", team['TeamName'], pteam['id'], access_token)
+                else:
+                    keep_applied('team rule', f"{pteam['id']}/pteam={team['TeamName']}")
                 found = True
                 break
         
@@ -905,11 +1346,14 @@ def create_team_rule(tag_name, tag_value, team_id, access_token):
         ]
     }
 
+    if is_applied('team rule', f"{team_id}/{tag_name}={tag_value}", payload):
+        return
+
     api_url = construct_api_url(f"/v1/teams/{team_id}/components/auto-link/tags")
     
     try:
         # Make the POST request to create the team rule
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + {tag_name} Component rule added for: {tag_value}")
     
@@ -924,7 +1368,7 @@ def create_team_rule(tag_name, tag_value, team_id, access_token):
     
     try:
         # Make the POST request to create the team rule
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + {tag_name} App/Env rule added for: {tag_value}")
     
@@ -935,11 +1379,35 @@ def create_team_rule(tag_name, tag_value, team_id, access_token):
             print(f"Error: {e}")
             exit(1)
 
+    record_applied('team rule', f"{team_id}/{tag_name}={tag_value}", payload)
+
+
+def fetch_team_members(pteams, headers):
+    """
+    Fetches the member lists of the given Phoenix teams concurrently (bounded by PAGE_WORKERS).
+
+    Returns:
+    - Dict of team id -> list of members.
+    """
+    if not pteams:
+        return {}
+    workers = max(1, min(PAGE_WORKERS, len(pteams)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='phoenix-members') as pool:
+        members = pool.map(with_context(lambda pteam: get_phoenix_team_members(pteam['id'], headers)), pteams)
+        return {pteam['id']: team_members for pteam, team_members in zip(pteams, members)}
+
+def unique_emails(emails):
+    # keeps the first spelling of every email, compared case-insensitively
+    unique = {}
+    for email in emails:
+        unique.setdefault(email.lower(), email)
+    return list(unique.values())
 
 @dispatch(list,list,list,list,list,str)
 def assign_users_to_team(p_teams, new_pteams, teams, all_team_access, hive_staff, access_token):
     """
     This function assigns users to teams by checking if users are already part of the team, and adds or removes them accordingly.
+    The member lists of the teams are fetched concurrently and compared as lowercase email sets.
     
     Args:
     - p_teams: List of Phoenix teams.
@@ -950,42 +1418,61 @@ def assign_users_to_team(p_teams, new_pteams, teams, all_team_access, hive_staff
     """
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
     all_pteams = p_teams + new_pteams
-    for pteam in all_pteams:
-        # Fetch current team members from the Phoenix platform
-        team_members = get_phoenix_team_members(pteam['id'], headers)
-
-        for team in teams:
-            if team['TeamName'] == pteam['name']:
-                print(f"[Team] {pteam['name']}")
-
-                # Assign users from AllTeamAccess that are not part of the current team members
-                for user_email in all_team_access:
-                    found = any(member['email'].lower() == user_email.lower() for member in team_members)
-                    if not found:
-                        api_call_assign_users_to_team(pteam['id'], user_email, headers)
-
-                # Assign team members from the team if they are not part of the current team members
-                for team_member in team['TeamMembers']:
-                    found = any(member['email'].lower() == team_member['EmailAddress'].lower() for member in team_members)
-                    if not found:
-                        api_call_assign_users_to_team(pteam['id'], team_member['EmailAddress'], headers)
-
-                # Remove users who no longer exist in the team members
-                for member in team_members:
-                    found = does_member_exist(member['email'], team, hive_staff, all_team_access)
-                    if not found:
-                        delete_team_member(member['email'], pteam['id'], headers)
+
+    teams_by_name = defaultdict(list)
+    for team in teams:
+        teams_by_name[team['TeamName']].append(team)
+    hive_teams = {}
+    for hive_team in hive_staff:
+        hive_teams.setdefault(hive_team['Team'].lower(), hive_team)
+
+    # members any team may keep: users with access to all teams and the staff of every hive
+    all_team_access_emails = {email.lower() for email in all_team_access}
+    hive_staff_emails = {staff['Lead'].lower() for staff in hive_staff if staff['Lead']}
+    hive_staff_emails.update(product_owner.lower() for staff in hive_staff for product_owner in staff['Product'] if product_owner)
+
+    # only teams that are configured or belong to a hive are reconciled, within the scope of the run
+    managed_pteams = [pteam for pteam in all_pteams if (pteam['name'] in teams_by_name or pteam['name'].lower() in hive_teams)
+                      and (scope is None or scope.selects_team(pteam['name']))]
+    members_by_team = fetch_team_members(managed_pteams, headers)
+
+    removals = []
+    for pteam in managed_pteams:
+        team_members = members_by_team[pteam['id']]
+        member_emails = {member['email'].lower() for member in team_members}
+        additions = []
+
+        for team in teams_by_name.get(pteam['name'], []):
+            print(f"[Team] {pteam['name']}")
+            configured_emails = {team_member['EmailAddress'].lower() for team_member in team['TeamMembers']}
+
+            # Assign users from AllTeamAccess and the team members that are not part of the current team members
+            wanted = unique_emails(all_team_access + [team_member['EmailAddress'] for team_member in team['TeamMembers']])
+            additions += [user_email for user_email in wanted if user_email.lower() not in member_emails]
+
+            # Remove users who no longer exist in the team members
+            for member in team_members:
+                email = member['email'].lower()
+                if email not in configured_emails and email not in all_team_access_emails and email not in hive_staff_emails:
+                    removals.append((member['email'], pteam['id']))
 
         # Assign Hive team lead and product owners to the team
-        hive_team = next((hs for hs in hive_staff if hs['Team'].lower() == pteam['name'].lower()), None)
+        hive_team = hive_teams.get(pteam['name'].lower())
 
         if hive_team:
-            print(f"> Adding team lead {hive_team['Lead']} to team {pteam['name']}")
-            api_call_assign_users_to_team(pteam['id'], hive_team['Lead'], headers)
+            if hive_team['Lead'] and hive_team['Lead'].lower() not in member_emails:
+                print(f"> Adding team lead {hive_team['Lead']} to team {pteam['name']}")
+                additions.append(hive_team['Lead'])
 
             for product_owner in hive_team['Product']:
-                print(f"> Adding Product Owner {product_owner} to team {pteam['name']}")
-                api_call_assign_users_to_team(pteam['id'], product_owner, headers)
+                if product_owner and product_owner.lower() not in member_emails:
+                    print(f"> Adding Product Owner {product_owner} to team {pteam['name']}")
+                    additions.append(product_owner)
+
+        # every addition of the team goes out in as few PUT requests as possible
+        assign_team_users(pteam['id'], unique_emails(email for email in additions if email), headers)
+
+    remove_team_members(list(dict.fromkeys(removals)), headers)
 
 
 # ConstructAPIUrl Function
@@ -1027,7 +1514,7 @@ def api_call_assign_users_to_team(team_id, email, access_token):
     
     try:
         # Make the PUT request to assign the user to the team
-        response = requests.put(api_url, headers=headers, json=payload)
+        response = client.put(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + User {email} added to team {team_id}")
     
@@ -1058,7 +1545,7 @@ def delete_team_member(email, team_id, access_token):
     
     try:
         # Make the DELETE request to remove the user from the team
-        response = requests.delete(api_url, headers=headers)
+        response = client.delete(api_url, headers=headers)
         response.raise_for_status()
         print(f"- Removed {email} from team {team_id}")
     
@@ -1068,7 +1555,7 @@ def delete_team_member(email, team_id, access_token):
 def get_phoenix_components(access_token):
     """
     Fetches the list of Phoenix components by making GET requests to the /v1/components endpoint.
-    Handles pagination to retrieve all components.
+    Handles pagination to retrieve all components, pages after the first are fetched concurrently.
 
     Args:
     - access_token: API authentication token.
@@ -1081,29 +1568,8 @@ def get_phoenix_components(access_token):
 
     print("Getting list of Phoenix Components")
 
-    # Initial API call to get the first page of components
-    api_url = construct_api_url("/v1/components")
-    
     try:
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        # Add the components from the first page
-        components.extend(data['content'])
-
-        total_pages = data.get('totalPages', 1)
-
-        # Loop through the remaining pages (if any)
-        for page in range(1, total_pages):
-            api_url = construct_api_url(f"/v1/components/?pageNumber={page}")
-            response = requests.get(api_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            # Append components from each page
-            components.extend(data['content'])
-
+        components = get_all_pages("/v1/components", headers)
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
 
@@ -1114,36 +1580,36 @@ def get_phoenix_team_members(team_id, access_token):
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
     api_url = construct_api_url(f"/v1/teams/{team_id}/users")
     
-    response = requests.get(api_url, headers=headers)
+    response = client.get(api_url, headers=headers)
     response.raise_for_status()
     return response.json()
 
 
-def remove_old_tags(phoenix_components, repos, override_list):
+def remove_old_tags(snapshot, repos, override_list):
     """
     Removes old tags from Phoenix components by comparing the repository information.
 
     Args:
-    - phoenix_components: List of Phoenix components fetched from the API.
+    - snapshot: RemoteSnapshot of the Phoenix components fetched from the API.
     - repos: List of repositories.
     - override_list: List of overrides for repository names and subdomains.
     """
     print("Removing old tags")
+    # the last override of a repository wins, as when the list was applied in order
+    overrides = {repo_override['Key']: repo_override['Value'] for repo_override in override_list}
 
     for repo in repos:
         
         # Apply overrides from the override list
-        for repo_override in override_list:
-            if repo['RepositoryName'] == repo_override['Key']:
-                repo['Subdomain'] = repo_override['Value']
+        if repo['RepositoryName'] in overrides:
+            repo['Subdomain'] = overrides[repo['RepositoryName']]
         
         # Check and remove old tags in phoenix_components
-        for component in phoenix_components:
-            if repo['RepositoryName'] == component['name']:
-                print(f"Repo: {repo['RepositoryName']}")
-                #get_tag_value("domain", component['tags'], repo['Domain'])
-                #get_tag_value("subdomain", component['tags'], repo['Subdomain'])
-                get_tag_value("pteam", component['tags'], repo['Team'])
+        for component in snapshot.components_named(repo['RepositoryName']):
+            print(f"Repo: {repo['RepositoryName']}")
+            #get_tag_value("domain", component['tags'], repo['Domain'])
+            #get_tag_value("subdomain", component['tags'], repo['Subdomain'])
+            get_tag_value("pteam", component['tags'], repo['Team'])
 
 def get_tag_value(tag_name, source_tags, expected_value):
     """
@@ -1190,7 +1656,7 @@ def remove_tag(tag_id, tag_key, tag_value,access_token):
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
 
     try:
-        response = requests.patch(api_url, headers=headers, json=payload)
+        response = client.patch(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"Tag {tag_key} with value {tag_value} removed successfully.")
     except requests.exceptions.RequestException as e:
@@ -1224,7 +1690,7 @@ def remove_tag_from_application(tag_id, tag_key, tag_value, application_id, head
 
 
     try:
-        response = requests.patch(api_url, headers=headers, json=payload)
+        response = client.patch(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"Tag {tag_key} with value {tag_value} removed successfully.")
     except requests.exceptions.RequestException as e:
@@ -1258,7 +1724,7 @@ def remove_tag_from_component(tag_id, tag_key, tag_value, component_id, headers)
 
 
     try:
-        response = requests.patch(api_url, headers=headers, json=payload)
+        response = client.patch(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"Tag {tag_key} with value {tag_value} removed successfully.")
     except requests.exceptions.RequestException as e:
@@ -1289,7 +1755,7 @@ def add_tag_to_application(tag_key, tag_value, application_id, headers):
 
 
     try:
-        response = requests.put(api_url, headers=headers, json=payload)
+        response = client.put(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f"Tag {tag_key} with value {tag_value} added successfully.")
     except requests.exceptions.RequestException as e:
@@ -1304,7 +1770,7 @@ def api_call_assign_users_to_team(team_id, user_email, access_token):
 
     api_url = construct_api_url(f"/v1/teams/{team_id}/users")
     
-    response = requests.put(api_url, headers=headers, json=payload)
+    response = client.put(api_url, headers=headers, json=payload)
     response.raise_for_status()
     print(f" + User {user_email} added to team {team_id}")
 
@@ -1313,7 +1779,7 @@ def delete_team_member(user_email, team_id, access_token):
     headers = {'Authorization': f"Bearer {access_token}", 'Content-Type': 'application/json'}
     api_url = construct_api_url(f"/v1/teams/{team_id}/users/{user_email}")
 
-    response = requests.delete(api_url, headers=headers)
+    response = client.delete(api_url, headers=headers)
     response.raise_for_status()
     print(f"- Removed {user_email} from team {team_id}")
 
@@ -1336,18 +1802,7 @@ def populate_applications_and_environments(headers):
 
     try:
         print("Getting list of Phoenix Applications and Environments")
-        api_url = construct_api_url("/v1/applications")
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-
-        data = response.json()
-        components = data.get('content', [])
-        total_pages = data.get('totalPages', 1)
-
-        for i in range(1, total_pages):
-            api_url = construct_api_url(f"/v1/applications?pageNumber={i}")
-            response = requests.get(api_url, headers=headers)
-            components += response.json().get('content', [])
+        components = get_all_pages("/v1/applications", headers)
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
         exit(1)
@@ -1373,10 +1828,14 @@ def add_service(applicationSelectorName, service, tier, headers):
             print(f"Payload being sent to /v1components: {json.dumps(payload, indent=2)}")
 
     api_url = construct_api_url("/v1/components")
-    response = requests.post(api_url, headers=headers, json=payload)
+    response = client.post(api_url, headers=headers, json=payload)
+    if response.status_code == 409:
+        # created since the component listing was read, e.g. a listing read from the remote cache
+        print(f" > Service {service} already exists")
+        return
     response.raise_for_status()
+    mark_new_rule_target(applicationSelectorName, service)
     print(f" + Added Service: {service}")
-    time.sleep(2)
 
 # Dispatch version for when all arguments, including team, are provided
 @dispatch(str, str, int, str, dict)
@@ -1394,10 +1853,14 @@ def add_service(applicationSelectorName, service, tier, team, headers):
     }
 
     api_url = construct_api_url("/v1/components")
-    response = requests.post(api_url, headers=headers, json=payload)
+    response = client.post(api_url, headers=headers, json=payload)
+    if response.status_code == 409:
+        # created since the component listing was read, e.g. a listing read from the remote cache
+        print(f" > Service {service} already exists")
+        return
     response.raise_for_status()
+    mark_new_rule_target(applicationSelectorName, service)
     print(f" + Added Service: {service}")
-    time.sleep(2)
 
 @dispatch(str,dict,dict)
 def does_member_exist(email, team, headers):
@@ -1411,180 +1874,254 @@ def does_member_exist(email, team, headers):
         print(f"Error checking if member exists: {e}")
         return False
 
-def add_thirdparty_services(phoenix_components, application_environments, subdomain_owners, headers):
+def add_thirdparty_services(snapshot, subdomain_owners, headers):
     services = [
         "Salesforce", #example of 3rd party app to add components and findings to 3rd parties
     ]
 
     env_name = "Thirdparty"
-    env_id = get_environment_id(application_environments, env_name)
+    env_id = get_environment_id(snapshot, env_name)
 
     if not env_id:
         print('Environment Thirdparty not found')
         return
 
     for service in services:
-        if not environment_service_exist(env_id, phoenix_components, service):
+        if not environment_service_exist(env_id, snapshot, service):
             add_service(env_name, service, 5, "Thirdparty", subdomain_owners, headers)
 
-def get_environment_id(application_environments, env_name):
-    for environment in application_environments:
-        if environment["name"] == env_name:
-            return environment["id"]
-    return None
+def get_environment_id(snapshot, env_name):
+    return snapshot.application_id(env_name)
 
-def environment_service_exist(env_id, phoenix_components, service_name):
-    for component in phoenix_components:
-        if component['name'] == service_name and component['applicationId'] == env_id:
-            return True
-    return False
+def environment_service_exist(env_id, snapshot, service_name):
+    return snapshot.component_exists(env_id, service_name)
 
 def get_phoenix_team_members(team_id, headers):
     try:
         api_url = construct_api_url(f"/v1/teams/{team_id}/users")
-        response = requests.get(api_url, headers=headers)
+        response = client.get(api_url, headers=headers)
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
         return []
 
-def api_call_assign_users_to_team(team_id, email, headers):
-    payload = {"users": [{"email": email}], "autoCreateUsers": True}
+def api_call_assign_users_to_team(team_id, email, headers, exit_on_error=True):
+    """
+    Assigns a single user to a team. 400 (user hasn't logged in yet) and 409 (already assigned) are reported, not errors.
 
+    Returns:
+    - False when the request failed for any other reason (the run stops instead when exit_on_error is set).
+    """
+    payload = {"users": [{"email": email}], "autoCreateUsers": True}
+    response = None
     try:
         api_url = construct_api_url(f"/v1/teams/{team_id}/users")
-        response = requests.put(api_url, headers=headers, json=payload)
+        response = client.put(api_url, headers=headers, json=payload)
         response.raise_for_status()
         print(f" + User {email} added to team")
     except requests.exceptions.RequestException as e:
-        if response.status_code == 400:
+        if response is not None and response.status_code == 400:
             print(f" ? Team Member assignment {email} user hasn't logged in yet")
-        elif response.status_code == 409:
+        elif response is not None and response.status_code == 409:
             print(f" - Team Member already assigned {email}")
         else:
             print(f"Error: {e}")
-            exit(1)
+            if exit_on_error:
+                exit(1)
+            return False
+    return True
+
+def assign_team_users(team_id, emails, headers, exit_on_error=True):
+    """
+    Assigns users to a team in PUT requests of at most TEAM_USER_BATCH_SIZE users. When the API
+    rejects a batch (400 when one of the users hasn't logged in yet, 409 when one is already
+    assigned) its users are re-sent one by one, so each user still gets its own outcome.
+
+    Returns:
+    - The number of users whose assignment failed (the run stops instead when exit_on_error is set).
+    """
+    failures = 0
+    for start in range(0, len(emails), TEAM_USER_BATCH_SIZE):
+        batch = emails[start:start + TEAM_USER_BATCH_SIZE]
+        if len(batch) == 1:
+            failures += not api_call_assign_users_to_team(team_id, batch[0], headers, exit_on_error)
+            continue
+
+        payload = {"users": [{"email": email} for email in batch], "autoCreateUsers": True}
+        response = None
+        try:
+            api_url = construct_api_url(f"/v1/teams/{team_id}/users")
+            response = client.put(api_url, headers=headers, json=payload)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            reason = response.status_code if response is not None else e
+            print(f" > Batch of {len(batch)} team members not accepted ({reason}), assigning users individually")
+            for email in batch:
+                failures += not api_call_assign_users_to_team(team_id, email, headers, exit_on_error)
+            continue
+
+        for email in batch:
+            print(f" + User {email} added to team")
+    return failures
 
 def delete_team_member(email, team_id, headers):
     try:
         api_url = construct_api_url(f"/v1/teams/{team_id}/users/{email}")
-        response = requests.delete(api_url, headers=headers)
+        response = client.delete(api_url, headers=headers)
         response.raise_for_status()
         print(f"- Removed {email} from team")
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
 
-def create_deployments(applications, environments, phoenix_apps_envs, headers):
+def remove_team_members(removals, headers):
+    """
+    Removes members from teams concurrently, at most TEAM_DELETE_WORKERS requests at a time.
+
+    Args:
+    - removals: List of (email, team_id) to remove.
+    - headers: Request headers.
+    """
+    if not removals:
+        return
+    workers = max(1, min(TEAM_DELETE_WORKERS, len(removals)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='phoenix-members') as pool:
+        list(pool.map(with_context(lambda removal: delete_team_member(removal[0], removal[1], headers)), removals))
+
+def index_services_by_deployment(environments):
+    """
+    Indexes the services of every environment by their Deployment_set and Deployment_tag values.
+
+    Returns:
+    - Dict of value -> list of (service, matched_by) in environment/service order, matched_by being
+      'Deployment_set' or 'Deployment_tag'.
+    """
+    services_by_deployment = defaultdict(list)
+    for env in environments:
+        for service in env.get('Services') or []:
+            if service.get('Deployment_set'):
+                services_by_deployment[service['Deployment_set']].append((service, 'Deployment_set'))
+            if service.get('Deployment_tag'):
+                services_by_deployment[service['Deployment_tag']].append((service, 'Deployment_tag'))
+    return services_by_deployment
+
+def create_deployments(applications, environments, snapshot, headers):
     application_services = []
+    services_by_deployment = index_services_by_deployment(environments)
 
     for app in applications:
         if not app.get('Deployment_set', None):
             continue
         deployment_set = app.get('Deployment_set')
-        for env in environments:
-            if not env.get('Services'):
-                continue
-            for service in env.get('Services'):
-                if service.get('Deployment_set') and service.get('Deployment_set') == deployment_set:
-                    application_services.append({
-                        "applicationSelector": {
-                            #"id": app.get("id"),
-                            "name": app.get("AppName"),
-                            #"caseSensitive": true
-                        },
-                        "serviceSelector": {
-                            #"id": service.get("id"),
-                            "name": service.get("Service"),
-                            #"tags": [
-                            #    {
-                            #        "value": deployment_set
-                            #    }
-                            #]
-                        }
-                    })
-                if service.get('Deployment_tag') and service.get('Deployment_tag') == deployment_set:
-                    application_services.append({
-                        "applicationSelector": {
-                            "name": app.get("AppName"),
-                        },
-                        "serviceSelector": {
-                            "tags": [
-                                {
-                                    "value": service.get('Deployment_tag')
-                                }
-                            ]
-                        }
-                    })
-    
+        for service, matched_by in services_by_deployment.get(deployment_set, []):
+            if matched_by == 'Deployment_set':
+                application_services.append({
+                    "applicationSelector": {
+                        #"id": app.get("id"),
+                        "name": app.get("AppName"),
+                        #"caseSensitive": true
+                    },
+                    "serviceSelector": {
+                        #"id": service.get("id"),
+                        "name": service.get("Service"),
+                        #"tags": [
+                        #    {
+                        #        "value": deployment_set
+                        #    }
+                        #]
+                    }
+                })
+            else:
+                application_services.append({
+                    "applicationSelector": {
+                        "name": app.get("AppName"),
+                    },
+                    "serviceSelector": {
+                        "tags": [
+                            {
+                                "value": service.get('Deployment_tag')
+                            }
+                        ]
+                    }
+                })
+
+    application_services = [deployment for deployment in application_services
+                            if not is_applied('deployment', deployment_key(deployment), deployment)]
     print(f'Number of deployments to add {len(application_services)}')
 
     for deployment in application_services:
         app_name = deployment['applicationSelector']['name']
-        app_id = next((x.get('id') for x in phoenix_apps_envs if x.get('type') == "APPLICATION" and x.get("name").lower() == app_name.lower()), None)
+        app = snapshot.find_application(app_name, "APPLICATION", case_sensitive=False)
+        app_id = app.get('id') if app else None
         if not app_id:
             print(f'App not found for name {app_name}')
             continue
         use_service_name = 'name' in deployment['serviceSelector']
+        desired = deployment
         try:
             deployment = {"serviceSelector": deployment["serviceSelector"]}
             api_url = construct_api_url(f"/v1/applications/{app_id}/deploy")
-            response = requests.patch(api_url, headers=headers, json=deployment)
+            response = client.patch(api_url, headers=headers, json=deployment)
             response.raise_for_status()
             print(f" + Deployment for application {app_name} and \
                    { 'service name: ' + deployment['serviceSelector']['name'] if use_service_name \
                     else 'Service deployment tag: ' + str(deployment['serviceSelector']['tags'][0])}")
+            record_applied('deployment', deployment_key(desired), desired)
         except requests.exceptions.RequestException as e:
             if response.status_code == 409:
                 print(f" + Deployment for application {app_name} and \
                    { 'service name: ' + deployment['serviceSelector']['name'] if use_service_name \
                     else 'Service deployment tag: ' + str(deployment['serviceSelector']['tags'])} already exists.")
+                record_applied('deployment', deployment_key(desired), desired)
             else:
                 print(f"Error: {e}")
                 print(response.text)
 
-def check_app_name_matches_service_name(app_name, service_name):
-    if app_name.lower() == service_name.lower():
-        return True
-    similarity_ratio = Levenshtein.ratio(app_name, service_name)
-    if similarity_ratio > SIMILARITY_THRESHOLD:
-        print(f'Similarity ratio {similarity_ratio} between {app_name} and {service_name} is within threshold, adding deployment')
-        return True
-    else:
-        if DEBUG:
-            print(f'Similarity ratio {similarity_ratio} between {app_name} and {service_name} is NOT within threshold, NOT adding deployment')
-
-    return False
-
 def create_autolink_deployments(applications, environments, headers):
     deployments = []
+    service_names = [service.get("Service") for env in environments for service in env.get('Services') or []]
+    # the matcher compares each application to the service names that can be within SIMILARITY_THRESHOLD only,
+    # with the same outcome as comparing every pair (equal ignoring case, or Levenshtein.ratio above the threshold)
+    unique_names = list(dict.fromkeys(service_names))
+    matcher = NameMatcher(unique_names, SIMILARITY_THRESHOLD)
+    positions = defaultdict(list)
+    for position, service_name in enumerate(service_names):
+        positions[service_name].append(position)
 
     for app in applications:
         app_name = app.get("AppName")
-        for env in environments:
-            if not env.get('Services'):
-                continue
-            for service in env.get('Services'):
-                service_name = service.get("Service")
-                if check_app_name_matches_service_name(app_name, service_name):
-                    deployments.append({
-                        "applicationSelector": {
-                            "name": app_name,
-                        },
-                        "serviceSelector": {
-                            "name": service_name
-                        }
-                    })
+        matched = {}
+        for index, ratio in matcher.matches(app_name):
+            for position in positions[unique_names[index]]:
+                matched[position] = ratio
+        for position in sorted(matched):
+            service_name = service_names[position]
+            if matched[position] is not None:
+                print(f'Similarity ratio {matched[position]} between {app_name} and {service_name} is within threshold, adding deployment')
+            deployments.append({
+                "applicationSelector": {
+                    "name": app_name,
+                },
+                "serviceSelector": {
+                    "name": service_name
+                }
+            })
+    if DEBUG:
+        print(f"Scored {matcher.stats['scored']} of {len(applications) * len(service_names)} application/service pairs")
+    deployments = [deployment for deployment in deployments
+                   if not is_applied('deployment', deployment_key(deployment), deployment)]
     print(f'Number of deployments to add {len(deployments)}')
 
     for deployment in deployments:
         try:
             api_url = construct_api_url(f"/v1/applications/deploy")
-            response = requests.patch(api_url, headers=headers, json=deployment)
+            response = client.patch(api_url, headers=headers, json=deployment)
             response.raise_for_status()
             print(f" + Deployment for application {deployment['applicationSelector']['name']} to {deployment['serviceSelector']['name']}")
+            record_applied('deployment', deployment_key(deployment), deployment)
         except requests.exceptions.RequestException as e:
             if response.status_code == 409:
                 print(f" - Deployment for application {deployment['applicationSelector']['name']} to {deployment['serviceSelector']['name']} already exists.")
+                record_applied('deployment', deployment_key(deployment), deployment)
             else:
                 print(f"Error: {e}")
                 exit(1)
\ No newline at end of file
@@ -0,0 +1,207 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from providers.Metrics import Metrics
+from providers.RateLimiter import RateLimiter, THROTTLE_STATUS_CODES, parse_retry_after
+from providers.RetryPolicy import RetryPolicy, endpoint_template
+
+
+DEFAULT_POOL_SIZE = 10 # number of keep-alive connections kept open to the Phoenix API
+
+
+class PhoenixClient:
+    """
+    Shared HTTP client for the Phoenix API.
+
+    Owns a single pooled keep-alive requests.Session so every provider call reuses
+    open TCP/TLS connections instead of doing a fresh handshake per request, a
+    shared RateLimiter that paces requests and backs off when the API throttles,
+    the RetryPolicy applied to every request and the Metrics recorded for every request.
+
+    Args:
+    - base_url: The Phoenix API domain, used for endpoint-relative urls (e.g. "/v1/teams").
+    - pool_size: Maximum number of connections kept open per host.
+    - rate_limit: Maximum requests per second, None for no limit.
+    """
+
+    def __init__(self, base_url="", pool_size=DEFAULT_POOL_SIZE, rate_limit=None):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.session = self._build_session(pool_size)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.retry_policy = RetryPolicy()
+        self.metrics = Metrics()
+        self.token_manager = None
+        self.write_listeners = []
+
+    def _build_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Content-Type': 'application/json'})
+        return session
+
+    def configure(self, base_url=None, pool_size=None, rate_limit=None):
+        """
+        Updates the base url, pool size and/or rate limit. Changing the pool size rebuilds the session.
+        """
+        if base_url:
+            self.base_url = base_url.rstrip('/')
+        if rate_limit is not None:
+            self.rate_limiter.configure(rate_limit)
+        if pool_size and pool_size != self.pool_size:
+            headers = dict(self.session.headers)
+            self.session.close()
+            self.pool_size = pool_size
+            self.session = self._build_session(pool_size)
+            self.session.headers.update(headers)
+
+    def set_access_token(self, access_token):
+        """
+        Sets the default bearer token sent with every request that doesn't supply its own Authorization header.
+        """
+        self.session.headers['Authorization'] = f"Bearer {access_token}"
+
+    def use_token_manager(self, token_manager):
+        """
+        Makes every bearer authenticated request use the token manager's current token,
+        whatever token string the caller built its headers from.
+        """
+        self.token_manager = token_manager
+        token_manager.add_listener(self.set_access_token)
+
+    def add_write_listener(self, listener):
+        """
+        Registers a callable invoked with (method, url, json payload, response) once a write request got its final response.
+        """
+        self.write_listeners.append(listener)
+
+    def _notify_write(self, method, url, payload, response):
+        if method != 'GET':
+            for listener in self.write_listeners:
+                listener(method, url, payload, response)
+
+    def _current_token_headers(self, headers):
+        if self.token_manager is None or not headers:
+            return headers
+        authorization = headers.get('Authorization', '')
+        if not authorization.startswith('Bearer ') or not self.token_manager.token:
+            return headers
+        return {**headers, 'Authorization': f"Bearer {self.token_manager.token}"}
+
+    def _uses_bearer_token(self, headers):
+        authorization = (headers or {}).get('Authorization', self.session.headers.get('Authorization', ''))
+        return authorization.startswith('Bearer ')
+
+    def url(self, endpoint):
+        if endpoint.startswith('http://') or endpoint.startswith('https://'):
+            return endpoint
+        return f"{self.base_url}{endpoint}"
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends the request once the rate limiter allows it, retrying according to the retry policy.
+
+        Throttled responses (429/503) pause every caller for the Retry-After delay before the retry.
+        Other retryable failures (connection errors, 5xx) wait an exponential backoff with jitter.
+        A 401 on a bearer authenticated request refreshes the token once and re-sends the request.
+        The last response is returned (or the last connection error raised) when retries run out.
+        """
+        url = self.url(url)
+        endpoint = endpoint_template(url)
+        token_refreshed = False
+        attempt = 0
+        while True:
+            attempt += 1
+            kwargs['headers'] = self._current_token_headers(kwargs.get('headers'))
+            self.metrics.record_wait('throttled', self.rate_limiter.acquire())
+            sent_at = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.metrics.record_request(method, endpoint, type(e).__name__, time.perf_counter() - sent_at)
+                if not self.retry_policy.should_retry(attempt, method, endpoint, error=e):
+                    raise
+                delay = self.retry_policy.backoff(attempt)
+                print(f" ~ {method} {url} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                self.retry_policy.record_retry(method, endpoint)
+                self.metrics.record_wait('retry_backoff', delay)
+                time.sleep(delay)
+                continue
+            self.metrics.record_request(method, endpoint, response.status_code, time.perf_counter() - sent_at)
+
+            if (response.status_code == 401 and not token_refreshed and self.token_manager is not None
+                    and self._uses_bearer_token(kwargs.get('headers'))):
+                print(f" ~ {method} {url} returned 401, refreshing access token")
+                self.token_manager.refresh()
+                token_refreshed = True
+                attempt -= 1
+                continue
+
+            throttled = response.status_code in THROTTLE_STATUS_CODES
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) if throttled else None
+            if throttled:
+                self.rate_limiter.backoff(retry_after)
+            else:
+                self.rate_limiter.record_success()
+
+            if not self.retry_policy.should_retry(attempt, method, endpoint, status_code=response.status_code):
+                self._notify_write(method, url, kwargs.get('json'), response)
+                return response
+
+            self.retry_policy.record_retry(method, endpoint)
+            if throttled:
+                # the rate limiter already pauses every caller for the Retry-After delay
+                print(f" ~ {method} {url} throttled with {response.status_code}, backing off {retry_after if retry_after is not None else 'default'}s")
+            else:
+                delay = self.retry_policy.backoff(attempt)
+                print(f" ~ {method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+                self.metrics.record_wait('retry_backoff', delay)
+                time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def connection_stats(self):
+        """
+        Returns the number of requests sent, connections opened and how many requests reused an open connection.
+        """
+        requests_sent = 0
+        connections_opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+
+        reused = max(requests_sent - connections_opened, 0)
+        return {
+            'requests': requests_sent,
+            'connections_opened': connections_opened,
+            'connections_reused': reused,
+            'reuse_ratio': reused / requests_sent if requests_sent else 0.0
+        }
+
+    def print_connection_stats(self):
+        stats = self.connection_stats()
+        print(f"[Diagnostic] [HTTP] Requests: {stats['requests']}, connections opened: {stats['connections_opened']}, "
+              f"reused: {stats['connections_reused']} ({stats['reuse_ratio']:.1%})")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,204 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import requests
+
+from providers.RetryPolicy import endpoint_template
+
+
+PLAN_VERSION = 1
+PLANNED_REF = re.compile(r'planned-op-(\d+)') # stands in for the id of an entity created by an earlier operation
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# (method, endpoint template) -> (action, kind) shown in the plan summary
+OPERATION_KINDS = {
+    ('POST', '/v1/applications'): ('create', 'application'),
+    ('PATCH', '/v1/applications/{id}'): ('update', 'application'),
+    ('PUT', '/v1/applications/{id}/tags'): ('create', 'application tag'),
+    ('PATCH', '/v1/applications/{id}/tags'): ('delete', 'application tag'),
+    ('POST', '/v1/components'): ('create', 'component'),
+    ('PATCH', '/v1/components/{id}'): ('update', 'component'),
+    ('PATCH', '/v1/components/{id}/tags'): ('delete', 'component tag'),
+    ('PATCH', '/v1/components/tags'): ('delete', 'component tag'),
+    ('POST', '/v1/components/rules'): ('create', 'rule'),
+    ('POST', '/v1/teams'): ('create', 'team'),
+    ('POST', '/v1/teams/{id}/components/auto-link/tags'): ('create', 'team rule'),
+    ('POST', '/v1/teams/{id}/applications/auto-link/tags'): ('create', 'team rule'),
+    ('PUT', '/v1/teams/{id}/users'): ('create', 'team member'),
+    ('DELETE', '/v1/teams/{id}/users/{id}'): ('delete', 'team member'),
+    ('PATCH', '/v1/applications/{id}/deploy'): ('create', 'deployment'),
+    ('PATCH', '/v1/applications/deploy'): ('create', 'deployment')
+}
+ACTIONS = {'POST': 'create', 'PUT': 'update', 'PATCH': 'update', 'DELETE': 'delete'}
+
+# responses that mean the operation is already in place rather than failed
+ALREADY_APPLIED_STATUSES = {
+    '/v1/teams': (400, 409),
+    '/v1/teams/{id}/users': (400, 409) # 400: the user hasn't logged in yet
+}
+
+
+def operation_kind(method, endpoint, payload=None):
+    template = endpoint_template(PLANNED_REF.sub('0', endpoint))
+    action, kind = OPERATION_KINDS.get((method, template), (ACTIONS.get(method, method.lower()), template))
+    if kind == 'application' and action == 'create' and (payload or {}).get('type') == 'ENVIRONMENT':
+        kind = 'environment'
+    return action, kind
+
+
+def already_applied_statuses(endpoint):
+    return ALREADY_APPLIED_STATUSES.get(endpoint_template(PLANNED_REF.sub('0', endpoint)), (409,))
+
+
+def describe_operation(operation):
+    """
+    Returns a one line description of an operation, e.g. "create component payments-api".
+    """
+    payload = operation.get('payload') or {}
+    if operation['kind'] == 'rule':
+        selector = payload.get('selector', {})
+        target = selector.get('componentSelector', {}).get('name')
+        names = ', '.join(rule.get('name', '') for rule in payload.get('rules', []))
+        return f"{operation['action']} {len(payload.get('rules', []))} rule(s) for {target}: {names}"
+    if operation['kind'] == 'deployment':
+        service = payload.get('serviceSelector', {})
+        application = payload.get('applicationSelector', {}).get('name', operation['endpoint'])
+        return f"{operation['action']} deployment {application} -> {service.get('name') or service.get('tags')}"
+    name = payload.get('name') or ', '.join(str(tag.get('value')) for tag in payload.get('tags', [])) \
+        or ', '.join(user.get('email', '') for user in payload.get('users', [])) or operation['endpoint']
+    return f"{operation['action']} {operation['kind']} {name}"
+
+
+def _planned_response(status_code, url, body):
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(body).encode('utf-8')
+    return response
+
+
+class PlanRecorder:
+    """
+    Stands in for the PhoenixClient while a plan is computed: reads are sent to the API, every
+    write is recorded as a plan operation instead and answered with a synthetic success.
+
+    An entity created by a recorded operation gets the id "planned-op-<n>", so later operations
+    on it (team rules, team members) can be recorded and resolved to the real id when applied.
+    Reads of planned entities return an empty list.
+
+    Args:
+    - client: The PhoenixClient reads are delegated to.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def request(self, method, url, **kwargs):
+        url = self.client.url(url)
+        if method not in WRITE_METHODS:
+            if PLANNED_REF.search(url):
+                return _planned_response(200, url, [])
+            return self.client.request(method, url, **kwargs)
+
+        endpoint = urlparse(url).path
+        payload = kwargs.get('json')
+        action, kind = operation_kind(method, endpoint, payload)
+        with self._lock:
+            operation_id = len(self.operations)
+            self.operations.append({
+                'id': operation_id,
+                'action': action,
+                'kind': kind,
+                'method': method,
+                'endpoint': endpoint,
+                'payload': payload
+            })
+        body = {**payload, 'id': f"planned-op-{operation_id}"} if isinstance(payload, dict) else {}
+        return _planned_response(201 if method == 'POST' else 200, url, body)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+def plan_summary(operations):
+    """
+    Returns the number of operations per action and kind, e.g. {"create": {"rule": 12}}.
+    """
+    counts = Counter((operation['action'], operation['kind']) for operation in operations)
+    summary = {}
+    for (action, kind), count in sorted(counts.items()):
+        summary.setdefault(action, {})[kind] = count
+    return summary
+
+
+def print_plan_summary(plan):
+    summary = plan['summary']
+    if not plan['operations']:
+        print("[Plan] No changes, remote state matches the configuration")
+        return
+    print(f"[Plan] {len(plan['operations'])} operations")
+    for action, kinds in summary.items():
+        print(f"  {action}: " + ", ".join(f"{count} {kind}" for kind, count in kinds.items()))
+
+
+def save_plan(path, operations, api_domain, records=()):
+    """
+    Writes the plan to path. records are the journal records ([kind, key, hash]) the plan stands for,
+    written to the journal once --apply executed every operation.
+    """
+    plan = {
+        'version': PLAN_VERSION,
+        'api_domain': api_domain,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'summary': plan_summary(operations),
+        'operations': sorted(operations, key=lambda operation: operation['id']),
+        'records': list(records)
+    }
+    with open(path, 'w') as stream:
+        json.dump(plan, stream, indent=2)
+    print(f"Plan written to {path}")
+    return plan
+
+
+def load_plan(path):
+    with open(path, 'r') as stream:
+        plan = json.load(stream)
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version {plan.get('version')} in {path}")
+    return plan
+
+
+def resolve_refs(value, ids):
+    """
+    Replaces planned ids in a string, list or dict with the ids returned when their operation was applied.
+    Raises KeyError when an operation it depends on did not return an id.
+    """
+    if isinstance(value, str):
+        return PLANNED_REF.sub(lambda match: ids[int(match.group(1))], value)
+    if isinstance(value, list):
+        return [resolve_refs(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_refs(item, ids) for key, item in value.items()}
+    return value
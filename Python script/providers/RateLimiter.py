@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+THROTTLE_STATUS_CODES = (429, 503) # responses that mean the API wants us to slow down
+DEFAULT_BACKOFF = 1.0 # seconds to pause when a throttled response has no Retry-After header
+MAX_BACKOFF = 60.0
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header value (delay in seconds or an HTTP date) into seconds to wait.
+    Returns None when the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket shared by every request of the Phoenix client.
+
+    The bucket refills at `rate` requests per second (None or 0 means no limit). When the API throttles
+    (HTTP 429/503) every caller pauses for the Retry-After delay and the rate is halved, then it climbs
+    back by roughly one request per second per second of successful calls until it reaches `rate` again.
+
+    Args:
+    - rate: Maximum requests per second, None or 0 for unlimited.
+    - burst: Number of requests that may be sent back to back, defaults to the rate.
+    - min_rate: Lowest rate the limiter backs off to.
+    """
+
+    def __init__(self, rate=None, burst=None, min_rate=1.0):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=1000)
+        self.min_rate = min_rate
+        self.throttled_seconds = 0.0
+        self.throttle_count = 0
+        self.configure(rate, burst)
+
+    def configure(self, rate=None, burst=None):
+        with self._lock:
+            self.rate = rate or None
+            self.burst = burst or max(1.0, self.rate or 1.0)
+            self._current_rate = self.rate
+            self._recovery_rate = None
+            self._tokens = self.burst
+            self._updated = time.monotonic()
+            self._paused_until = 0.0
+
+    @property
+    def current_rate(self):
+        return self._current_rate
+
+    def _refill(self, now):
+        if self._current_rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._current_rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Blocks until the caller may send a request. Returns the number of seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._paused_until - now)
+            if self._current_rate:
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self._current_rate)
+            self._recent.append(now + wait)
+
+        if wait > 0:
+            time.sleep(wait)
+            with self._lock:
+                self.throttled_seconds += wait
+        return wait
+
+    def backoff(self, retry_after=None):
+        """
+        Pauses every caller for retry_after seconds (or the default backoff) and lowers the rate.
+        """
+        delay = min(MAX_BACKOFF, retry_after if retry_after is not None else DEFAULT_BACKOFF)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttle_count += 1
+            self._paused_until = max(self._paused_until, now + delay)
+
+            if self._current_rate:
+                observed = self._current_rate
+            else:
+                observed = sum(1 for sent in self._recent if sent >= now - 1.0)
+            self._current_rate = max(self.min_rate, observed / 2)
+            self._recovery_rate = self.rate or max(self.min_rate, observed) * 2
+            self._tokens = min(self._tokens, 0.0)
+
+    def record_success(self):
+        """
+        Additive increase after a successful call, until the configured rate is reached again.
+        """
+        if self._recovery_rate is None:
+            return
+        with self._lock:
+            if self._recovery_rate is None or not self._current_rate:
+                return
+            self._current_rate += 1.0 / self._current_rate
+            if self._current_rate >= self._recovery_rate:
+                self._current_rate = self.rate
+                self._recovery_rate = None
+
+    def stats(self):
+        return {
+            'rate': self.rate,
+            'current_rate': self._current_rate,
+            'throttle_count': self.throttle_count,
+            'throttled_seconds': self.throttled_seconds
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"[Diagnostic] [Rate limit] Throttled responses: {stats['throttle_count']}, "
+              f"time waiting: {stats['throttled_seconds']:.2f}s, current rate: {stats['current_rate'] or 'unlimited'}")
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+from providers.RetryPolicy import endpoint_template
+
+
+CACHE_VERSION = 1 # bump when the layout of the cached listings changes
+CACHED_LISTINGS = ('/v1/applications', '/v1/components', '/v1/teams') # listing endpoints kept in the cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    scope TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (scope, listing)
+);
+CREATE TABLE IF NOT EXISTS entities (
+    scope TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (scope, listing, id)
+);
+"""
+
+
+def _json_body(response):
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+class RemoteStateCache:
+    """
+    On-disk cache of the Phoenix listings read at the start of a run (applications and environments,
+    components, teams), so back to back runs skip the bulk download while the listings are younger
+    than the TTL.
+
+    Every entity is a row, so the writes this tool makes keep the cache current in place: an entity
+    created or updated is stored from the API response (or, for an update answered without the entity,
+    merged with the values sent). A write whose effect can't be known, such as a tag change answered
+    without the entity or a create answered with "already exists", invalidates its listing instead, so
+    the next run fetches it again. Changes made outside this tool are only picked up after the TTL.
+
+    Args:
+    - path: SQLite file the listings are kept in, created when needed.
+    - scope: Separates caches sharing a file, e.g. the Phoenix API domain.
+    - ttl: Age in seconds after which a listing is fetched again.
+    """
+
+    def __init__(self, path, scope, ttl):
+        self.path = path
+        self.scope = scope
+        self.ttl = ttl
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def load(self, listing):
+        """
+        Returns the cached entities of a listing in listing order, or None when it isn't cached or older than the TTL.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT version, fetched_at FROM listings WHERE scope = ? AND listing = ?",
+                                           (self.scope, listing)).fetchone()
+            if row is None or row[0] != CACHE_VERSION or time.time() - row[1] > self.ttl:
+                self.stats['misses'] += 1
+                return None
+            rows = self._connection.execute("SELECT content FROM entities WHERE scope = ? AND listing = ? ORDER BY position",
+                                            (self.scope, listing))
+            items = [json.loads(content) for content, in rows]
+        self.stats['hits'] += 1
+        print(f"Using cached {listing} ({len(items)} items, fetched {time.time() - row[1]:.0f}s ago)")
+        return items
+
+    def store(self, listing, items):
+        """
+        Replaces the cached entities of a listing with a complete fetch.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entities WHERE scope = ? AND listing = ?", (self.scope, listing))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entities (scope, listing, id, position, content) VALUES (?, ?, ?, ?, ?)",
+                [(self.scope, listing, str(item.get('id', position)), position, json.dumps(item))
+                 for position, item in enumerate(items)])
+            self._connection.execute("INSERT OR REPLACE INTO listings (scope, listing, version, fetched_at) VALUES (?, ?, ?, ?)",
+                                     (self.scope, listing, CACHE_VERSION, time.time()))
+
+    def invalidate(self, listing):
+        with self._lock, self._connection:
+            removed = self._connection.execute("DELETE FROM listings WHERE scope = ? AND listing = ?", (self.scope, listing)).rowcount
+            self._connection.execute("DELETE FROM entities WHERE scope = ? AND listing = ?", (self.scope, listing))
+        if removed:
+            self.stats['invalidated'] += 1
+
+    def clear(self):
+        """
+        Forgets every cached listing of the scope.
+        """
+        for listing in CACHED_LISTINGS:
+            self.invalidate(listing)
+
+    def _cached(self, listing):
+        return self._connection.execute("SELECT 1 FROM listings WHERE scope = ? AND listing = ?", (self.scope, listing)).fetchone()
+
+    def upsert(self, listing, entity):
+        """
+        Stores a created or updated entity in its cached listing, new entities are appended at the end.
+        """
+        with self._lock, self._connection:
+            if not self._cached(listing):
+                return
+            row = self._connection.execute("SELECT position FROM entities WHERE scope = ? AND listing = ? AND id = ?",
+                                           (self.scope, listing, str(entity['id']))).fetchone()
+            if row is None:
+                row = self._connection.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM entities WHERE scope = ? AND listing = ?",
+                                               (self.scope, listing)).fetchone()
+            self._connection.execute("INSERT OR REPLACE INTO entities (scope, listing, id, position, content) VALUES (?, ?, ?, ?, ?)",
+                                     (self.scope, listing, str(entity['id']), row[0], json.dumps(entity)))
+        self.stats['updated'] += 1
+
+    def merge(self, listing, entity_id, values):
+        """
+        Applies the values of an update answered without the entity to the cached entity.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT content FROM entities WHERE scope = ? AND listing = ? AND id = ?",
+                                           (self.scope, listing, entity_id)).fetchone()
+        if row is None:
+            return
+        self.upsert(listing, {**json.loads(row[0]), **values})
+
+    def observe_write(self, method, url, payload, response):
+        """
+        Keeps the cached listings in line with a write sent by this tool, registered with PhoenixClient.add_write_listener.
+        """
+        template = endpoint_template(url)
+        listing = '/'.join(template.split('/')[:3])
+        if listing not in CACHED_LISTINGS or method == 'GET':
+            return
+        body = _json_body(response) if response.ok else None
+
+        if template == listing and method == 'POST':
+            # created, or already there (409, 400 for teams) and missing from the cache
+            if body and body.get('id'):
+                self.upsert(listing, body)
+            elif response.ok or response.status_code == 409 or (listing == '/v1/teams' and response.status_code == 400):
+                self.invalidate(listing)
+        elif template == f"{listing}/{{id}}" and response.ok:
+            if body and body.get('id'):
+                self.upsert(listing, body)
+            elif method == 'PATCH' and isinstance(payload, dict) and 'tags' not in payload:
+                self.merge(listing, urlparse(url).path.rstrip('/').split('/')[3], payload)
+            else:
+                self.invalidate(listing)
+        elif template == f"{listing}/{{id}}/tags" and response.ok:
+            # tags get their ids from the API, only the entity in the response tells them
+            if body and body.get('id'):
+                self.upsert(listing, body)
+            else:
+                self.invalidate(listing)
+
+    def close(self):
+        self._connection.close()
+
+    def print_stats(self):
+        if not any(self.stats.values()):
+            return
+        print(f"[Diagnostic] [Remote cache] {self.stats['hits']} listings read from the cache, {self.stats['misses']} fetched, "
+              f"{self.stats['updated']} entities updated in place, {self.stats['invalidated']} listings invalidated")
@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+
+class RemoteSnapshot:
+    """
+    Indexed view of the Phoenix applications/environments and components fetched at the start of a run.
+
+    The lists are indexed once so existence checks and lookups are dictionary lookups instead of a
+    scan of every application or component per configured entity. When several entities share a
+    key, lookups return the first one in listing order, like a scan would.
+
+    Args:
+    - applications_environments: Entities returned by /v1/applications (type APPLICATION or ENVIRONMENT).
+    - components: Entities returned by /v1/components.
+    """
+
+    def __init__(self, applications_environments=None, components=None):
+        self.applications_environments = []
+        self.components = []
+        self._applications_by_id = {}
+        self._applications_by_name = {}
+        self._applications_by_name_type = {}
+        self._applications_by_lower_name_type = {}
+        self._components_by_id = {}
+        self._components_by_name = {}
+        self._components_by_application_name = {}
+        self._by_tag = defaultdict(list)
+        for application in applications_environments or []:
+            self.add_application(application)
+        for component in components or []:
+            self.add_component(component)
+
+    def add_application(self, application):
+        """
+        Adds an application or environment to the snapshot and its indexes.
+        """
+        self.applications_environments.append(application)
+        name = application.get('name')
+        app_type = application.get('type')
+        if application.get('id'):
+            self._applications_by_id.setdefault(application['id'], application)
+        self._applications_by_name.setdefault(name, application)
+        self._applications_by_name_type.setdefault((name, app_type), application)
+        if name:
+            self._applications_by_lower_name_type.setdefault((name.lower(), app_type), application)
+        self._index_tags(application)
+
+    def add_component(self, component):
+        """
+        Adds a component or service to the snapshot and its indexes.
+        """
+        self.components.append(component)
+        name = component.get('name')
+        if component.get('id'):
+            self._components_by_id.setdefault(component['id'], component)
+        self._components_by_name.setdefault(name, []).append(component)
+        self._components_by_application_name.setdefault((component.get('applicationId'), name), component)
+        self._index_tags(component)
+
+    def _index_tags(self, entity):
+        for tag in entity.get('tags') or []:
+            self._by_tag[(tag.get('key'), tag.get('value'))].append(entity)
+
+    def find_application(self, name, app_type=None, case_sensitive=True):
+        """
+        Returns the application or environment with the given name (and type when provided), or None.
+        """
+        if app_type is None:
+            return self._applications_by_name.get(name)
+        if not case_sensitive:
+            return self._applications_by_lower_name_type.get((name.lower(), app_type))
+        return self._applications_by_name_type.get((name, app_type))
+
+    def application_exists(self, name, app_type):
+        return (name, app_type) in self._applications_by_name_type
+
+    def application_id(self, name, app_type=None):
+        application = self.find_application(name, app_type)
+        return application['id'] if application else None
+
+    def get_application(self, application_id):
+        return self._applications_by_id.get(application_id)
+
+    def find_component(self, name, application_id=None):
+        """
+        Returns the component with the given name, within the given application/environment when provided, or None.
+        """
+        if application_id is None:
+            return next(iter(self._components_by_name.get(name, [])), None)
+        return self._components_by_application_name.get((application_id, name))
+
+    def components_named(self, name):
+        """
+        Returns every component with the given name, whatever application/environment it belongs to.
+        """
+        return list(self._components_by_name.get(name, []))
+
+    def component_exists(self, application_id, name):
+        return (application_id, name) in self._components_by_application_name
+
+    def get_component(self, component_id):
+        return self._components_by_id.get(component_id)
+
+    def with_tag(self, key, value):
+        """
+        Returns every application, environment and component tagged key=value.
+        """
+        return list(self._by_tag.get((key, value), []))
@@ -0,0 +1,115 @@
+import random
+import re
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 0.5 # seconds, doubled on every attempt
+DEFAULT_MAX_DELAY = 30.0 # seconds, upper bound of a single backoff
+
+# POST endpoints that answer 409 when the entity already exists, so re-sending a POST whose
+# response was lost cannot create a duplicate
+IDEMPOTENT_POST_ENDPOINTS = {
+    "/v1/components/rules",
+    "/v1/components",
+    "/v1/applications",
+    "/v1/applications/repository",
+    "/v1/teams/{id}/components/auto-link/tags",
+    "/v1/teams/{id}/applications/auto-link/tags"
+}
+
+_ID_SEGMENT = re.compile(r'^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+|[0-9a-fA-F]{16,}|[^/]+@[^/]+)$')
+
+
+def endpoint_template(url):
+    """
+    Returns the endpoint of a url with ids and emails replaced, e.g. "/v1/teams/{id}/users".
+    """
+    path = urlparse(url).path.rstrip('/') or '/'
+    return '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+def is_retryable_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+def request_not_sent(error):
+    """
+    True when the connection could not be established, so the server never saw the request.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class RetryPolicy:
+    """
+    Retry policy applied to every Phoenix request: exponential backoff with full jitter.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried. GET, PUT, PATCH and DELETE are
+    always retried; a POST is only retried when the server cannot have processed it (connection
+    never established, 429) or when its endpoint answers 409 for duplicates.
+
+    Args:
+    - max_attempts: Total number of attempts per request, 1 disables retries.
+    - base_delay: Backoff of the first retry in seconds, doubled on every attempt.
+    - max_delay: Upper bound of a single backoff in seconds.
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def configure(self, max_attempts=None, base_delay=None, max_delay=None):
+        if max_attempts is not None:
+            self.max_attempts = max(1, max_attempts)
+        if base_delay is not None:
+            self.base_delay = base_delay
+        if max_delay is not None:
+            self.max_delay = max_delay
+
+    def is_safe(self, method, endpoint, error=None, status_code=None):
+        if method != 'POST':
+            return True
+        if endpoint in IDEMPOTENT_POST_ENDPOINTS or status_code == 429:
+            return True
+        return error is not None and request_not_sent(error)
+
+    def should_retry(self, attempt, method, endpoint, error=None, status_code=None):
+        """
+        Decides whether a failed attempt (1 based) is retried, given the raised error or the response status.
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if status_code is not None and not is_retryable_status(status_code):
+            return False
+        return self.is_safe(method, endpoint, error, status_code)
+
+    def backoff(self, attempt):
+        """
+        Returns the delay before the next attempt: full jitter over base_delay * 2^(attempt-1).
+        Retry-After isn't used here, throttled responses (429/503) are paused by the client's rate limiter.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def record_retry(self, method, endpoint):
+        with self._lock:
+            self.retry_counts[f"{method} {endpoint}"] += 1
+
+    def print_stats(self):
+        if not self.retry_counts:
+            print("[Diagnostic] [Retries] No requests retried")
+            return
+        print("[Diagnostic] [Retries]")
+        for endpoint, count in sorted(self.retry_counts.items(), key=lambda item: -item[1]):
+            print(f"  {endpoint}: {count}")
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import threading
+from collections import Counter
+
+
+def rule_fingerprint(application_name, component_name, rule_filter):
+    """
+    Returns the sha256 of a rule's selector names (case-insensitive, like the selectors sent) and canonical filter JSON.
+    """
+    canonical = json.dumps([application_name.lower(), component_name.lower(), rule_filter], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def rules_of(response_body):
+    """
+    Returns the rules of a component rules response, a list of rules or a page of them.
+    """
+    if isinstance(response_body, dict):
+        response_body = response_body.get('content', response_body.get('rules', []))
+    return [rule for rule in response_body or [] if isinstance(rule, dict) and 'filter' in rule]
+
+
+class RuleIndex:
+    """
+    Fingerprints of the rules that already exist on the components targeted by the run, fetched once
+    before the rules are written (one request per component, see Phoenix.index_component_rules), so
+    rules that exist are skipped instead of being posted and answered with a 409.
+
+    Only components whose rules were fetched are indexed, a rule of any other component (e.g. one
+    created by this run) is sent as before.
+    """
+
+    def __init__(self):
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._fingerprints = set()
+        self._indexed = set()
+
+    def add_rules(self, application_name, component_name, rules):
+        fingerprints = {rule_fingerprint(application_name, component_name, rule['filter']) for rule in rules}
+        with self._lock:
+            self._indexed.add((application_name.lower(), component_name.lower()))
+            self._fingerprints.update(fingerprints)
+            self.stats['components'] += 1
+            self.stats['rules'] += len(fingerprints)
+
+    def indexed(self, application_name, component_name):
+        return (application_name.lower(), component_name.lower()) in self._indexed
+
+    def contains(self, application_name, component_name, rule):
+        """
+        Returns True when the rule exists on the component, counting the rules skipped and sent.
+        """
+        exists = rule_fingerprint(application_name, component_name, rule['filter']) in self._fingerprints
+        with self._lock:
+            self.stats['skipped' if exists else 'sent'] += 1
+        return exists
+
+    def print_stats(self):
+        print(f"[Diagnostic] [Rules] existing rules of {self.stats['components']} components indexed ({self.stats['rules']} rules), "
+              f"{self.stats['skipped']} rules already present skipped, {self.stats['sent']} sent")
@@ -0,0 +1,149 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import ContextVar
+
+from providers.Concurrency import acquire_output, release_output
+
+
+TIMELINE_WIDTH = 60 # characters of the longest bar in the printed timeline
+current_phase = ContextVar('current_phase', default=None) # name of the phase the calling code runs in, None outside phases
+
+
+class Phase:
+    """
+    A phase of the run: a callable and the names of the phases it has to wait for.
+    """
+    __slots__ = ('name', 'action', 'after', 'started_at', 'finished_at', 'thread')
+
+    def __init__(self, name, action, after):
+        self.name = name
+        self.action = action
+        self.after = after
+        self.started_at = None
+        self.finished_at = None
+        self.thread = None
+
+    @property
+    def seconds(self):
+        return self.finished_at - self.started_at
+
+
+class PhaseScheduler:
+    """
+    Runs the phases of a run as a dependency graph: a phase starts as soon as every phase it
+    depends on has finished, so independent phases overlap, bounded by workers.
+
+    While a phase runs, current_phase holds its name (thread pools hand it on through
+    Concurrency.with_context), so work done for a phase can be told apart from the phases next to it.
+
+    A phase can only depend on phases added before it, so the graph has no cycles. Dependencies on
+    phases that weren't added (e.g. switched off on the command line) are ignored. When a phase
+    fails (including exit() inside it) no other phase is started, the running ones are waited for
+    and the failure is re-raised. With more than one worker, what a phase prints is buffered and written
+    as one block when the phase ends, so the log lines of phases running together aren't mixed.
+
+    Args:
+    - workers: Maximum number of phases running at the same time (1 runs them one after another in the order added).
+    """
+
+    def __init__(self, workers=1):
+        self.workers = max(1, workers)
+        self.phases = {}
+        self.started_at = None
+        self._output = None
+
+    def add(self, name, action, after=()):
+        """
+        Adds a phase running action() once the phases named in after have finished.
+        """
+        if name in self.phases:
+            raise ValueError(f"Phase {name} added twice")
+        self.phases[name] = Phase(name, action, [dependency for dependency in after if dependency in self.phases])
+
+    def _run_phase(self, phase):
+        phase.thread = threading.current_thread().name
+        phase.started_at = time.time()
+        token = current_phase.set(phase.name)
+        try:
+            if self._output is None:
+                phase.action()
+            else:
+                with self._output.buffered():
+                    phase.action()
+        finally:
+            current_phase.reset(token)
+            phase.finished_at = time.time()
+
+    def run(self, on_finished=None):
+        """
+        Runs every phase, calling on_finished(phase) on the scheduling thread as each one completes.
+        """
+        self.started_at = time.time()
+        pending = list(self.phases.values())
+        if self.workers > 1:
+            self._output = acquire_output()
+        try:
+            failure = self._run_phases(pending, on_finished)
+        finally:
+            if self._output is not None:
+                release_output()
+                self._output = None
+        if failure is not None:
+            raise failure
+
+    def _run_phases(self, pending, on_finished):
+        finished = set()
+        running = {}
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='phase') as pool:
+            while pending or running:
+                if failure is None:
+                    for phase in [phase for phase in pending if all(dependency in finished for dependency in phase.after)]:
+                        if len(running) >= self.workers:
+                            break
+                        pending.remove(phase)
+                        running[pool.submit(self._run_phase, phase)] = phase
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    phase = running.pop(future)
+                    try:
+                        future.result()
+                    except BaseException as e:
+                        failure = failure or e
+                        continue
+                    finished.add(phase.name)
+                    if on_finished:
+                        on_finished(phase)
+        return failure
+
+    def critical_path(self):
+        """
+        Returns the chain of dependent phases with the largest total duration, the lower bound of the run's duration.
+        """
+        longest = {}
+        for phase in self.phases.values():  # dependencies are always added first
+            if phase.finished_at is None:
+                continue
+            previous = max((longest[dependency] for dependency in phase.after if dependency in longest),
+                           key=lambda path: path[0], default=(0, []))
+            longest[phase.name] = (previous[0] + phase.seconds, previous[1] + [phase.name])
+        return max(longest.values(), key=lambda path: path[0], default=(0, []))
+
+    def print_timeline(self):
+        completed = [phase for phase in self.phases.values() if phase.finished_at is not None]
+        if not completed:
+            return
+        total = max(phase.finished_at for phase in completed) - self.started_at
+        scale = TIMELINE_WIDTH / total if total > 0 else 0
+        width = max(len(phase.name) for phase in completed)
+        print(f"[Diagnostic] [Timeline] {len(completed)} phases in {total:.1f}s, up to {self.workers} at a time")
+        for phase in sorted(completed, key=lambda phase: phase.started_at):
+            offset = phase.started_at - self.started_at
+            bar = ' ' * int(offset * scale) + '#' * max(1, int(phase.seconds * scale))
+            print(f"  {phase.name:<{width}} |{bar:<{TIMELINE_WIDTH + 1}}| {offset:6.1f}s +{phase.seconds:.1f}s")
+        seconds, path = self.critical_path()
+        serial = sum(phase.seconds for phase in completed)
+        print(f"[Diagnostic] [Critical path] {' -> '.join(path)}: {seconds:.1f}s (phases one after another: {serial:.1f}s)")
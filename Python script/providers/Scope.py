@@ -0,0 +1,129 @@
+from dataclasses import replace
+from fnmatch import fnmatchcase
+
+
+def matches(patterns, value):
+    """
+    Returns True when value matches one of the glob patterns (case-insensitive), patterns being lowercase.
+    """
+    return bool(value) and any(fnmatchcase(value.lower(), pattern) for pattern in patterns)
+
+
+class RunScope:
+    """
+    Restricts a run to the entities matching the --app, --environment, --team and --domain glob
+    patterns (case-insensitive, e.g. 'payments-*'). Several patterns of one filter are alternatives,
+    different filters must all match.
+
+    Each filter selects the kinds of entities it applies to and prunes them:
+    - --app: applications by AppName.
+    - --environment: environments by Name.
+    - --team: teams by TeamName, applications and components by TeamNames, services by TeamName
+      and repositories by Team.
+    - --domain: components by Domain and repositories by Domain.
+    Kinds none of the given filters applies to are left out of the run (e.g. --app syncs no
+    environments), a scope without filters keeps everything.
+
+    Args:
+    - apps: AppName patterns.
+    - environments: Environment Name patterns.
+    - teams: Team name patterns.
+    - domains: Domain patterns.
+    """
+
+    def __init__(self, apps=None, environments=None, teams=None, domains=None):
+        self.apps = [pattern.lower() for pattern in apps or []]
+        self.environments = [pattern.lower() for pattern in environments or []]
+        self.teams = [pattern.lower() for pattern in teams or []]
+        self.domains = [pattern.lower() for pattern in domains or []]
+
+    @property
+    def active(self):
+        return bool(self.apps or self.environments or self.teams or self.domains)
+
+    def includes_team(self, team_name):
+        return not self.teams or matches(self.teams, team_name)
+
+    def _includes_any_team(self, team_names):
+        return not self.teams or any(matches(self.teams, team_name) for team_name in team_names or [])
+
+    def includes_service(self, environment_name, team_name):
+        """
+        Returns True when a service of the given environment and team is in scope.
+        """
+        if not self.active:
+            return True
+        if not (self.environments or self.teams):
+            return False
+        return (not self.environments or matches(self.environments, environment_name)) and self.includes_team(team_name)
+
+    def select_applications(self, applications):
+        """
+        Returns the applications in scope, each with the components in scope only.
+        """
+        if not self.active:
+            return applications
+        if not (self.apps or self.teams or self.domains):
+            return []
+
+        selected = []
+        for application in applications:
+            if self.apps and not matches(self.apps, application['AppName']):
+                continue
+            owned = self.teams and self._includes_any_team(application['TeamNames'])
+            components = [component for component in application['Components']
+                          if (owned or self._includes_any_team(component['TeamNames']))
+                          and (not self.domains or matches(self.domains, component.get('Domain')))]
+            # an application of a team in scope is kept even without components in scope, unless domains narrow it
+            if components or not (self.teams or self.domains) or (owned and not self.domains):
+                selected.append(replace(application, Components=components))
+        return selected
+
+    def select_environments(self, environments):
+        """
+        Returns the environments in scope, each with the services in scope only.
+        """
+        if not self.active:
+            return environments
+        if not (self.environments or self.teams):
+            return []
+
+        selected = []
+        for environment in environments:
+            if self.environments and not matches(self.environments, environment['Name']):
+                continue
+            services = [service for service in environment['Services'] or [] if self.includes_team(service.get('TeamName'))]
+            if services or not self.teams:
+                selected.append(replace(environment, Services=services))
+        return selected
+
+    def deployment_environments(self, environments):
+        """
+        Returns the environments whose services the applications in scope can be deployed to: services are only
+        looked up by the deployment actions, so they aren't pruned by team and don't need an --environment filter.
+        """
+        if not self.environments:
+            return environments
+        return [environment for environment in environments if matches(self.environments, environment['Name'])]
+
+    def selects_team(self, team_name):
+        """
+        Returns True when the team itself is in scope: only --team applies to teams, other filters leave them out.
+        """
+        return not self.active or (bool(self.teams) and matches(self.teams, team_name))
+
+    def select_teams(self, teams):
+        return [team for team in teams if self.selects_team(team['TeamName'])]
+
+    def select_repos(self, repos):
+        if not self.active:
+            return repos
+        if not (self.teams or self.domains):
+            return []
+        return [repo for repo in repos
+                if self.includes_team(repo['Team']) and (not self.domains or matches(self.domains, repo['Domain']))]
+
+    def describe(self):
+        filters = [(name, patterns) for name, patterns in
+                   (('app', self.apps), ('environment', self.environments), ('team', self.teams), ('domain', self.domains)) if patterns]
+        return ", ".join(f"--{name} {' '.join(patterns)}" for name, patterns in filters)
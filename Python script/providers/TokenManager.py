@@ -0,0 +1,156 @@
+import base64
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_TOKEN_TTL = 3600 # seconds a token is assumed valid when it carries no expiry claim
+REFRESH_MARGIN = 300 # refresh the token this many seconds before it expires
+RETRY_DELAY = 30 # seconds before retrying a failed background refresh
+
+
+def get_token_expiry(token, default_ttl=DEFAULT_TOKEN_TTL):
+    """
+    Returns the expiry (epoch seconds) of a token, read from the JWT 'exp' claim when present.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_ttl
+
+
+class TokenManager:
+    """
+    Caches the Phoenix access token together with its expiry and refreshes it before it expires.
+
+    The token can optionally be persisted to a file (mode 0600) so repeated runs and parallel
+    workers using the same credentials reuse a still valid token instead of requesting a new one.
+
+    Args:
+    - fetch_token: Callable returning a new token string.
+    - cache_key: Identifies the credentials/domain the token belongs to inside the cache file.
+    - cache_file: Optional path of the file the token is persisted to.
+    - refresh_margin: Seconds before expiry at which the token is refreshed.
+    """
+
+    def __init__(self, fetch_token, cache_key="", cache_file=None, refresh_margin=REFRESH_MARGIN):
+        self.fetch_token = fetch_token
+        self.cache_key = cache_key
+        self.cache_file = cache_file
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0.0
+        self.refresh_count = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add_listener(self, listener):
+        """
+        Registers a callable invoked with the new token every time it changes.
+        """
+        self._listeners.append(listener)
+        if self.token:
+            listener(self.token)
+
+    def _is_fresh(self, expires_at):
+        return expires_at - self.refresh_margin > time.time()
+
+    def get_token(self):
+        """
+        Returns a valid token, from memory, the cache file or a new request, in that order.
+        """
+        with self._lock:
+            if self.token and self._is_fresh(self.expires_at):
+                return self.token
+            cached = self._load()
+            if cached:
+                print("Reusing cached Phoenix access token")
+                self._set(*cached)
+                return self.token
+            self._refresh_locked()
+            return self.token
+
+    def refresh(self):
+        """
+        Forces a new token, e.g. after the API answered 401.
+        """
+        with self._lock:
+            self._refresh_locked()
+            return self.token
+
+    def _refresh_locked(self):
+        token = self.fetch_token()
+        self.refresh_count += 1
+        self._set(token, get_token_expiry(token))
+        self._save()
+
+    def _set(self, token, expires_at):
+        self.token = token
+        self.expires_at = expires_at
+        for listener in self._listeners:
+            listener(token)
+
+    def start_background_refresh(self):
+        """
+        Schedules a refresh shortly before the current token expires, and keeps doing so for every new token.
+        """
+        self.stop()
+        delay = max(0.0, self.expires_at - self.refresh_margin - time.time())
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+            print("Phoenix access token refreshed")
+            self.start_background_refresh()
+        except BaseException as e:
+            # get_auth_token exits on failure, which must not end the refresh cycle
+            print(f"Error refreshing access token, retrying in {RETRY_DELAY}s: {e}")
+            self._timer = threading.Timer(RETRY_DELAY, self._background_refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, 'r') as stream:
+                cached = json.load(stream).get(self.cache_key)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable token cache {self.cache_file}: {e}")
+            return None
+        if not cached or not self._is_fresh(cached.get('expires_at', 0)):
+            return None
+        return cached['token'], cached['expires_at']
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        entries = {}
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as stream:
+                    entries = json.load(stream)
+            except (OSError, ValueError):
+                entries = {}
+        entries[self.cache_key] = {'token': self.token, 'expires_at': self.expires_at}
+
+        # write to a private temporary file first so the token is never readable by other users
+        temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as stream:
+            json.dump(entries, stream)
+        os.chmod(temp_file, 0o600)
+        os.replace(temp_file, self.cache_file)
@@ -1,38 +1,43 @@
 from itertools import groupby
 
-# Function to populate unique domains from a list of repos
-def populate_domains(repos):
-    domains = []
+# Function to collect the domains, subdomains and subdomain owners of the repos in a single pass
+def summarize_repositories(repos):
+    """
+    Returns (domains, subdomains, subdomain_owners) of the repos, each in first seen order:
+    - domains: unique domain names.
+    - subdomains: one {'Name', 'Domain', 'Tier'} per subdomain, from its first repo.
+    - subdomain_owners: dict of subdomain -> unique team names owning its repos.
+    Dicts are used as ordered sets, so each repo costs a few lookups instead of list scans.
+    """
+    domains = {}
+    subdomains = {}
+    subdomain_owners = {}
     for repo in repos:
-        dom= repo['Domain']
-        if dom not in domains:
-            domains.append(dom)
-    return domains
-
-# Function to retrieve unique subdomains from repos
-def get_subdomains(repos):
-    subdomains = []
-    for repo in repos:
-        if not any(item['Name'] == repo['Subdomain'] for item in subdomains):
-            item = {
+        domains.setdefault(repo['Domain'], None)
+        if repo['Subdomain'] not in subdomains:
+            subdomains[repo['Subdomain']] = {
                 'Name': repo['Subdomain'],
                 'Domain': repo['Domain'],
                 'Tier': repo['Tier']
             }
-            subdomains.append(item)
-    return subdomains
+        subdomain_owners.setdefault(repo['Subdomain'], {})[repo['Team']] = None
+    return list(domains), list(subdomains.values()), {subdomain: list(owners) for subdomain, owners in subdomain_owners.items()}
 
-# Function to get the environment ID based on environment name
-def get_environment_id(application_environments, environment_name):
-    env = next((env for env in application_environments if env['name'] == environment_name and env['type'] == 'ENVIRONMENT'), None)
-    return env['id'] if env else None
+# Function to populate unique domains from a list of repos
+def populate_domains(repos):
+    return summarize_repositories(repos)[0]
+
+# Function to retrieve unique subdomains from repos
+def get_subdomains(repos):
+    return summarize_repositories(repos)[1]
+
+# Function to get the environment ID based on environment name, looked up in the RemoteSnapshot
+def get_environment_id(snapshot, environment_name):
+    return snapshot.application_id(environment_name, 'ENVIRONMENT')
 
 # Function to check if a service exists in a given environment
-def environment_service_exist(env_id, phoenix_components, servicename):
-    for component in phoenix_components:
-        if component['applicationId'] == env_id and component['name'] == servicename:
-            return True
-    return False
+def environment_service_exist(env_id, snapshot, servicename):
+    return snapshot.component_exists(env_id, servicename)
 
 
 # Function to calculate criticality based on tier value Tier 1 is the most critical tier 10 is the least critical, tier 6 is neutral tier 
@@ -1,7 +1,9 @@
 import os
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from providers.Utils import calculate_criticality
+from providers.Utils import calculate_criticality, summarize_repositories
+from providers.Models import Repo, Service, Environment, Component, Application, Team, sparse, COMPONENT_FILTERS, SERVICE_FILTERS
 from email_validator import validate_email, EmailNotValidError
 
 # Check if PyYAML module exists
@@ -12,6 +14,102 @@ except ImportError:
     print("Module does not exist. Installing...")
     os.system('pip install pyyaml')
 
+try:
+    from yaml import CSafeLoader as YamlLoader # libyaml based, several times faster than the pure Python loader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+_parsed_files = {} # path -> (modification time, size, parsed document)
+TEAM_FILE_WORKERS = 8 # number of Teams/*.yaml files read and parsed concurrently
+
+
+def load_yaml_file(path):
+    """
+    Parses a resource file once per run and returns the parsed document. The populate_* functions
+    reading the same file (e.g. core-structure.yaml) share the document, it is parsed again only
+    if the file changed on disk. The document must not be modified by its readers.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = _parsed_files.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    with open(path, 'r') as stream:
+        document = yaml.load(stream, Loader=YamlLoader)
+    _parsed_files[path] = (stat.st_mtime_ns, stat.st_size, document)
+    return document
+
+
+def _compose_node(loader, anchors):
+    # Builds the node of the next value from the parser events, like yaml.composer.Composer, which the C loader doesn't expose
+    event = loader.get_event()
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(None, None, f"found undefined alias {event.anchor}", event.start_mark)
+        return anchors[event.anchor]
+
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag if event.tag not in (None, '!') else loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        return node
+
+    if isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag if event.tag not in (None, '!') else loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose_node(loader, anchors))
+    else:
+        tag = event.tag if event.tag not in (None, '!') else loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _compose_node(loader, anchors)
+            node.value.append((key, _compose_node(loader, anchors)))
+    node.end_mark = loader.get_event().end_mark
+    return node
+
+
+def stream_yaml_sections(path, sections, values=()):
+    """
+    Reads the top level mapping of a YAML file event by event and yields (key, item) for every item
+    of the top level sequences named in sections, one item at a time. Only the item being yielded is
+    built, so memory is bounded by the largest item rather than the whole file. Keys named in values
+    (and sections that aren't sequences) are yielded once as (key, value); other top level values are
+    parsed and dropped.
+    """
+    with open(path, 'r') as stream:
+        loader = YamlLoader(stream)
+        try:
+            anchors = {}
+            loader.get_event() # StreamStartEvent
+            if loader.check_event(yaml.StreamEndEvent):
+                return
+            loader.get_event() # DocumentStartEvent
+            if not loader.check_event(yaml.MappingStartEvent):
+                raise yaml.YAMLError(f"{path}: expected a mapping at the top level")
+            loader.get_event()
+
+            while not loader.check_event(yaml.MappingEndEvent):
+                key = loader.construct_document(_compose_node(loader, anchors))
+                if key in sections and key not in values and loader.check_event(yaml.SequenceStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(yaml.SequenceEndEvent):
+                        yield key, loader.construct_document(_compose_node(loader, anchors))
+                    loader.get_event()
+                    continue
+
+                value = _compose_node(loader, anchors)
+                if key in sections or key in values:
+                    yield key, loader.construct_document(value)
+        finally:
+            loader.dispose()
+
 
 # Function to populate repositories
 def populate_repositories(resource_folder):
@@ -23,36 +121,44 @@ def populate_repositories(resource_folder):
 
     core_structure = os.path.join(resource_folder, "core-structure.yaml")
 
-    with open(core_structure, 'r') as stream:
-        repos_yaml = yaml.safe_load(stream)
+    repos_yaml = load_yaml_file(core_structure)
 
     for deployment_group in repos_yaml['DeploymentGroups']:
-        if 'BuildDefinitions' not in deployment_group:
+        repos.extend(repositories_from_group(deployment_group))
+
+    return repos
+
+
+# Function to build the repositories of the build definitions of one DeploymentGroup
+def repositories_from_group(deployment_group):
+    repos = []
+
+    if 'BuildDefinitions' not in deployment_group:
+        return repos
+
+    for row in deployment_group['BuildDefinitions']:
+        repositoryNames = row.get('RepositoryName', [])
+
+        # Check if repositoryNames is a string, if so convert to list
+        if isinstance(repositoryNames, str):
+            repositoryNames = [repositoryNames]
+
+        # Ensure repositoryNames is iterable
+        if not isinstance(repositoryNames, list):
+            print(f"Warning: RepositoryName is not in an expected format for row: {row}")
             continue
-        
-        for row in deployment_group['BuildDefinitions']:
-            repositoryNames = row.get('RepositoryName', [])
-            
-            # Check if repositoryNames is a string, if so convert to list
-            if isinstance(repositoryNames, str):
-                repositoryNames = [repositoryNames]
-            
-            # Ensure repositoryNames is iterable
-            if not isinstance(repositoryNames, list):
-                print(f"Warning: RepositoryName is not in an expected format for row: {row}")
-                continue
-
-            for repositoryName in repositoryNames:
-                print(f'Created repository {repositoryName}')
-                item = {
-                    'RepositoryName': repositoryName,
-                    'Domain': row['Domain'],
-                    'Tier': row.get('Tier', 5),
-                    'Subdomain': row['SubDomain'],
-                    'Team': row['TeamName'],
-                    'BuildDefinitionName': row['BuildDefinitionName']
-                }
-                repos.append(item)
+
+        for repositoryName in repositoryNames:
+            print(f'Created repository {repositoryName}')
+            item = Repo(
+                RepositoryName=repositoryName,
+                Domain=row['Domain'],
+                Tier=row.get('Tier', 5),
+                Subdomain=row['SubDomain'],
+                Team=row['TeamName'],
+                BuildDefinitionName=row['BuildDefinitionName']
+            )
+            repos.append(item)
 
     return repos
 
@@ -67,76 +173,59 @@ def populate_environments_from_env_groups(resource_folder):
 
     banking_core = os.path.join(resource_folder, "core-structure.yaml")
 
-    with open(banking_core, 'r') as stream:
-        repos_yaml = yaml.safe_load(stream)
+    repos_yaml = load_yaml_file(banking_core)
 
     for row in repos_yaml['Environment Groups']:
-        # Check if TeamName exists, otherwise, log and continue.
-        if not 'TeamName' in row:
-            print(f"Skipping environment {row['Name']}, as TeamName is missing.")
-            continue
-
-        # Define the environment item
-        item = {
-            'Name': row['Name'],
-            'Type': row['Type'],
-            'Criticality': calculate_criticality(row['Tier']),
-            'CloudAccounts': [""],  # Add CloudAccounts if applicable
-            'Status': row['Status'],
-            'Responsable': row['Responsable'],
-            'TeamName': row.get('TeamName', None),  # Add TeamName from the environment or set as None
-            'Services': []  # To populate services later
-        }
-
-        # Now process the services under the "Team" or "Services" key
-        if 'Services' in row:
-            for service in row['Services']:
-                repository_names = service.get('RepositoryName', [])
-                if isinstance(repository_names, str):
-                    repository_names = [repository_names]
-                # Build the service entry with association details
-                service_entry = {
-                    'Service': service['Service'],
-                    'Type': service['Type'],
-                    'Tier': service.get('Tier', 5),  # Default tier to 5 if not specified
-                    'TeamName': service.get('TeamName', item['TeamName']),  # Default to environment's TeamName if missing
-                    'Deployment_set': service.get('Deployment_set', None),
-                    'Deployment_tag': service.get('Deployment_tag', None),
-                    'MultiConditionRule': load_multi_condition_rule(service),
-                    'RepositoryName': repository_names,  # Properly handle missing 'RepositoryName'
-                    'SearchName': service.get('SearchName', None),
-                    "Tag": service.get("Tag", None),
-                    "Cidr": service.get("Cidr", None),
-                    "Fqdn": service.get("Fqdn", None),
-                    "Netbios": service.get("Netbios", None),
-                    "OsNames": service.get("OsNames", None),
-                    "Hostnames": service.get("Hostnames", None),
-                    "ProviderAccountId": service.get("ProviderAccountId", None),
-                    "ProviderAccountName": service.get("ProviderAccountName", None),
-                    "ResourceGroup": service.get("ResourceGroup", None),
-                    "AssetType": service.get("AssetType", None)
-                }
-                item['Services'].append(service_entry)
-
-        # Append the environment entry to the list of environments
-        envs.append(item)
+        item = environment_from_group(row)
+        if item:
+            envs.append(item)
 
     return envs
 
-# Function to populate subdomain owners
-def populate_subdomain_owners(repos):
-    subdomains = {}
-
-    for repo in repos:
-        print(repo['RepositoryName'])
-
-        if repo['Subdomain'] not in subdomains:
-            subdomains[repo['Subdomain']] = []
+# Function to build the environment of one Environment Group, None when it is skipped
+def environment_from_group(row):
+    # Check if TeamName exists, otherwise, log and continue.
+    if not 'TeamName' in row:
+        print(f"Skipping environment {row['Name']}, as TeamName is missing.")
+        return None
 
-        if repo['Team'] not in subdomains[repo['Subdomain']]:
-            subdomains[repo['Subdomain']].append(repo['Team'])
+    # Define the environment item
+    item = Environment(
+        Name=row['Name'],
+        Type=row['Type'],
+        Criticality=calculate_criticality(row['Tier']),
+        CloudAccounts=[""],  # Add CloudAccounts if applicable
+        Status=row['Status'],
+        Responsable=row['Responsable'],
+        TeamName=row.get('TeamName', None),  # Add TeamName from the environment or set as None
+        Services=[]  # To populate services later
+    )
+
+    # Now process the services under the "Team" or "Services" key
+    if 'Services' in row:
+        for service in row['Services']:
+            repository_names = service.get('RepositoryName', [])
+            if isinstance(repository_names, str):
+                repository_names = [repository_names]
+            # Build the service entry with association details
+            service_entry = Service(
+                Service=service['Service'],
+                Type=service['Type'],
+                Tier=service.get('Tier', 5),  # Default tier to 5 if not specified
+                TeamName=service.get('TeamName', item.TeamName),  # Default to environment's TeamName if missing
+                Deployment_set=service.get('Deployment_set', None),
+                Deployment_tag=service.get('Deployment_tag', None),
+                MultiConditionRule=load_multi_condition_rule(service),
+                RepositoryName=repository_names,  # Properly handle missing 'RepositoryName'
+                extra=sparse(service, SERVICE_FILTERS)  # SearchName, Tag, Cidr, ... only when set
+            )
+            item.Services.append(service_entry)
+
+    return item
 
-    return subdomains
+# Function to populate subdomain owners
+def populate_subdomain_owners(repos):
+    return summarize_repositories(repos)[2]
 
 
 # Function to populate teams
@@ -144,12 +233,18 @@ def populate_subdomain_owners(repos):
 # Example of populating repositories - already in place, no changes needed unless additional processing is required
 
 # Function to populate teams
-def populate_teams(resource_folder):
-    teams = []
+def populate_teams(resource_folder, workers=TEAM_FILE_WORKERS):
+    """
+    Loads every Teams/*.yaml, parsed concurrently by up to `workers` threads. Teams are deduplicated
+    by TeamName, the first file wins; a later file with the same TeamName but different content is
+    reported as a conflict. Files that can't be read or parsed are all reported together before the
+    run stops.
+    """
+    teams = {}
 
     if not resource_folder:
         print("Please supply path for the resources")
-        return teams
+        return []
 
     teams_file_path = os.path.join(resource_folder, "Teams")
 
@@ -157,20 +252,41 @@ def populate_teams(resource_folder):
         print(f"Path does not exist: {teams_file_path}")
         exit(1)
 
-    for team_file in Path(teams_file_path).glob("*.yaml"):
-        with open(team_file, 'r') as stream:
-            team = yaml.safe_load(stream)
+    team_files = list(Path(teams_file_path).glob("*.yaml"))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(team_files) or 1)), thread_name_prefix='team-files') as pool:
+        results = list(pool.map(_load_team_file, team_files))
 
-        found = False
-        for t in teams:
-            if t['TeamName'] == team['TeamName']:
-                found = True
-                break
+    errors = []
+    sources = {}
+    for team_file, team, error in results:
+        if error:
+            errors.append(f"{team_file}: {error}")
+            continue
+        if team.TeamName not in teams:
+            teams[team.TeamName] = team
+            sources[team.TeamName] = team_file
+        elif team != teams[team.TeamName]:
+            print(f"Warning: team {team.TeamName} in {team_file} differs from {sources[team.TeamName]}, keeping {sources[team.TeamName]}")
+
+    if errors:
+        print(f"Error: {len(errors)} team file(s) could not be loaded:")
+        for error in errors:
+            print(f"  {error}")
+        exit(1)
 
-        if not found:
-            teams.append(team)
+    return list(teams.values())
 
-    return teams
+def _load_team_file(team_file):
+    # Returns (file, team, error message), errors are reported by populate_teams once every file was read
+    try:
+        document = load_yaml_file(team_file)
+        if not isinstance(document, dict):
+            return team_file, None, "expected a mapping with TeamName and TeamMembers"
+        if not document.get('TeamName'):
+            return team_file, None, "TeamName is missing"
+        return team_file, Team.from_yaml(document), None
+    except (OSError, yaml.YAMLError) as e:
+        return team_file, None, str(e).replace("\n", " ")
 
 
 # Function to populate hives
@@ -187,8 +303,7 @@ def populate_hives(resource_folder):
         print(f"File not found or invalid path: {yaml_file}")
         return hives
 
-    with open(yaml_file, 'r') as stream:
-        yaml_content = yaml.safe_load(stream)
+    yaml_content = load_yaml_file(yaml_file)
 
     is_custom_email = yaml_content.get('CustomEmail', False)
     company_email_domain = yaml_content.get('CompanyEmailDomain', None)
@@ -235,8 +350,7 @@ def populate_all_access_emails(resource_folder):
 
     core_structure = os.path.join(resource_folder, "core-structure.yaml")
 
-    with open(core_structure, 'r') as stream:
-        repos_yaml = yaml.safe_load(stream)
+    repos_yaml = load_yaml_file(core_structure)
 
     return repos_yaml['AllAccessAccounts']
 
@@ -252,61 +366,57 @@ def populate_applications(resource_folder):
 
     core_structure = os.path.join(resource_folder, "core-structure.yaml")
 
-    with open(core_structure, 'r') as stream:
-        apps_yaml = yaml.safe_load(stream)
+    apps_yaml = load_yaml_file(core_structure)
 
     for row in apps_yaml['DeploymentGroups']:
-        if not 'TeamNames' in row:
-            print(f"Skipping application {row['AppName']}, as TeamNames are missing.")
-            continue
+        app = application_from_group(row)
+        if app:
+            apps.append(app)
 
-        app = {
-            'AppName': row['AppName'],
-            'Status': row.get('Status', None),
-            'TeamNames': row['TeamNames'],
-            'ReleaseDefinitions': row['ReleaseDefinitions'],
-            'Responsable': row['Responsable'],
-            'Criticality': calculate_criticality(row.get('Tier', 5)),  # Use .get() to handle missing 'Tier'
-            'Deployment_set': row.get('Deployment_set', None),
-            'Components': []
-        }
-
-        if not 'Components' in row:
-            continue
+    return apps
 
-        for component in row['Components']:
-            # Handle RepositoryName properly
-            repository_names = component.get('RepositoryName', [])
-            if isinstance(repository_names, str):
-                repository_names = [repository_names]
+# Function to build the application of one DeploymentGroup, None when it is skipped
+def application_from_group(row):
+    if not 'TeamNames' in row:
+        print(f"Skipping application {row['AppName']}, as TeamNames are missing.")
+        return None
 
-            comp = {
-                'ComponentName': component['ComponentName'],
-                'Status': component.get('Status', None),
-                'Type': component.get('Type', None),
-                'TeamNames': component.get('TeamNames', app['TeamNames']),  # Fallback to app's TeamNames if missing
-                'RepositoryName': repository_names,  # Properly handle missing 'RepositoryName'
-                'SearchName': component.get('SearchName', None),
-                "Tags": component.get("Tags", None),
-                "Cidr": component.get("Cidr", None),
-                "Fqdn": component.get("Fqdn", None),
-                "Netbios": component.get("Netbios", None),
-                "OsNames": component.get("OsNames", None),
-                "Hostnames": component.get("Hostnames", None),
-                "ProviderAccountId": component.get("ProviderAccountId", None),
-                "ProviderAccountName": component.get("ProviderAccountName", None),
-                "ResourceGroup": component.get("ResourceGroup", None),
-                "AssetType": component.get("AssetType", None),
-                'MultiConditionRule': load_multi_condition_rule(component),
-                'Criticality': calculate_criticality(component.get('Tier', 5)),  # Handle missing 'Tier'
-                'Domain': component.get('Domain', None),  # Handle missing 'Domain'
-                'SubDomain': component.get('SubDomain', None),  # Handle missing 'SubDomain'
-                'AutomaticSecurityReview': component.get('AutomaticSecurityReview', None)  # Handle missing 'AutomaticSecurityReview'
-            }
-            app['Components'].append(comp)
-        apps.append(app)
+    app = Application(
+        AppName=row['AppName'],
+        Status=row.get('Status', None),
+        TeamNames=row['TeamNames'],
+        ReleaseDefinitions=row['ReleaseDefinitions'],
+        Responsable=row['Responsable'],
+        Criticality=calculate_criticality(row.get('Tier', 5)),  # Use .get() to handle missing 'Tier'
+        Deployment_set=row.get('Deployment_set', None),
+        Components=[]
+    )
+
+    if not 'Components' in row:
+        return None
 
-    return apps
+    for component in row['Components']:
+        # Handle RepositoryName properly
+        repository_names = component.get('RepositoryName', [])
+        if isinstance(repository_names, str):
+            repository_names = [repository_names]
+
+        comp = Component(
+            ComponentName=component['ComponentName'],
+            Status=component.get('Status', None),
+            Type=component.get('Type', None),
+            TeamNames=component.get('TeamNames', app.TeamNames),  # Fallback to app's TeamNames if missing
+            RepositoryName=repository_names,  # Properly handle missing 'RepositoryName'
+            MultiConditionRule=load_multi_condition_rule(component),
+            Criticality=calculate_criticality(component.get('Tier', 5)),  # Handle missing 'Tier'
+            Domain=component.get('Domain', None),  # Handle missing 'Domain'
+            SubDomain=component.get('SubDomain', None),  # Handle missing 'SubDomain'
+            AutomaticSecurityReview=component.get('AutomaticSecurityReview', None),  # Handle missing 'AutomaticSecurityReview'
+            extra=sparse(component, COMPONENT_FILTERS)  # SearchName, Tags, Cidr, ... only when set
+        )
+        app.Components.append(comp)
+
+    return app
 
 def load_multi_condition_rule(component):
     if not 'MultiConditionRule' in component or not component['MultiConditionRule']:
@@ -333,4 +443,61 @@ def load_multi_condition_rule(component):
         return None
 
     return rule
-    
\ No newline at end of file
+    
+
+
+def stream_core_structure(resource_folder):
+    """
+    Populates the environments, repos, all access emails and applications of core-structure.yaml in one
+    streamed pass: every DeploymentGroup and Environment Group is built into its models and dropped
+    before the next one is read, instead of holding the parsed file and the models at the same time.
+
+    Sections missing from the file are returned empty.
+
+    Returns:
+    - Dict with the environments, repos, all_access_emails and applications.
+    """
+    core_structure = os.path.join(resource_folder, "core-structure.yaml")
+    config = {'environments': [], 'repos': [], 'all_access_emails': [], 'applications': []}
+
+    for key, item in stream_yaml_sections(core_structure, ('DeploymentGroups', 'Environment Groups'), values=('AllAccessAccounts',)):
+        if key == 'DeploymentGroups':
+            config['repos'].extend(repositories_from_group(item))
+            app = application_from_group(item)
+            if app:
+                config['applications'].append(app)
+        elif key == 'Environment Groups':
+            environment = environment_from_group(item)
+            if environment:
+                config['environments'].append(environment)
+        else:
+            config['all_access_emails'] = item
+
+    return config
+
+
+def populate_configuration(resource_folder, streaming=False):
+    """
+    Populates everything read from the resource folder, in the order the run reads it.
+
+    Args:
+    - resource_folder: Folder containing core-structure.yaml, hives.yaml and the Teams folder.
+    - streaming: Read core-structure.yaml one group at a time (stream_core_structure) instead of parsing it whole.
+
+    Returns:
+    - Dict with the environments, repos, teams, hives, all_access_emails and applications.
+    """
+    if streaming:
+        config = stream_core_structure(resource_folder)
+        config['teams'] = populate_teams(resource_folder)
+        config['hives'] = populate_hives(resource_folder)
+        return config
+
+    return {
+        'environments': populate_environments_from_env_groups(resource_folder),
+        'repos': populate_repositories(resource_folder),
+        'teams': populate_teams(resource_folder),
+        'hives': populate_hives(resource_folder),
+        'all_access_emails': populate_all_access_emails(resource_folder),
+        'applications': populate_applications(resource_folder)
+    }
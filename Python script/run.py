@@ -1,14 +1,27 @@
 import time
 import csv
 import os
-from providers.Phoenix import get_phoenix_components, populate_phoenix_teams, get_auth_token , create_teams, create_team_rules, assign_users_to_team, populate_applications_and_environments, create_environment, add_environment_services, add_cloud_asset_rules, add_thirdparty_services, create_applications, create_deployments, create_autolink_deployments, create_teams_from_pteams
+import sys
+import argparse
+import atexit
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+from providers.Phoenix import get_phoenix_components, populate_phoenix_teams, get_access_token, create_teams, create_team_rules, assign_users_to_team, populate_applications_and_environments, create_environment, add_environment_services, add_cloud_asset_rules, add_thirdparty_services, create_applications, create_deployments, create_autolink_deployments, create_teams_from_pteams
 import providers.Phoenix as phoenix_module
-from providers.Utils import populate_domains, get_subdomains, populate_users_with_all_team_access
-from providers.YamlHelper import populate_repositories, populate_teams, populate_hives, populate_subdomain_owners, populate_environments_from_env_groups, populate_all_access_emails, populate_applications
+from providers.PhoenixClient import DEFAULT_POOL_SIZE
+from providers.RemoteSnapshot import RemoteSnapshot
+from providers.ConfigCache import ConfigCache, config_key
+from providers.Scope import RunScope
+from providers.Scheduler import PhaseScheduler
+from providers.Utils import summarize_repositories, populate_users_with_all_team_access
+from providers.YamlHelper import populate_configuration, populate_hives
 #from providers.Aks import get_subscriptions, get_clusters, get_cluster_images
 
 # Global Variables
 resource_folder = os.path.join(os.path.dirname(__file__), 'Resources')
+config_cache_folder = os.path.join(os.path.dirname(__file__), '.cache')
 client_id = ""
 client_secret = ""
 access_token = ""
@@ -19,9 +32,113 @@ action_deployment = True
 action_autolink_deploymentset = True
 action_autocreate_teams_from_pteam = True
 
+def get_peak_memory_mb():
+    # Peak resident memory of the run so far, ru_maxrss is in KB on Linux and bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def report_phase(phase, start_time):
+    # Prints the phase diagnostics and records them in the client metrics, returns the start time of the next phase
+    elapsed_time = time.time() - start_time
+    peak_mb = get_peak_memory_mb()
+    print(f"[Diagnostic] [{phase}] Time Taken: {elapsed_time}")
+    if peak_mb is not None:
+        print(f"[Diagnostic] [{phase}] Peak memory: {peak_mb:.1f} MB")
+    metrics = phoenix_module.client.metrics
+    metrics.record_phase(phase, elapsed_time, peak_mb)
+    if metrics.phases[phase]['requests'] is not None:
+        print(f"[Diagnostic] [{phase}] Requests: {metrics.phases[phase]['requests']}")
+    if phoenix_module.journal is not None and not options.plan:
+        # entities applied by the completed phase are written to the journal, not those of phases still running
+        phoenix_module.journal.commit(phase)
+    return time.time()
+
+def finish_run():
+    phoenix_module.rule_executor.shutdown()
+    phoenix_module.token_manager.stop()
+    phoenix_module.client.print_connection_stats()
+    phoenix_module.client.rate_limiter.print_stats()
+    phoenix_module.client.retry_policy.print_stats()
+    phoenix_module.client.metrics.print_stats()
+    if phoenix_module.rule_index is not None:
+        phoenix_module.rule_index.print_stats()
+    if phoenix_module.remote_cache is not None:
+        phoenix_module.remote_cache.print_stats()
+        phoenix_module.remote_cache.close()
+    if phoenix_module.journal is not None:
+        phoenix_module.journal.print_stats()
+        phoenix_module.journal.close()
+
+def load_configuration(resource_folder):
+    # The parsed configuration is cached on disk, keyed by the content hash of the resource files
+    if options.no_config_cache:
+        return populate_configuration(resource_folder, options.stream_config)
+
+    cache = ConfigCache(options.config_cache)
+    if options.clear_config_cache:
+        print(f"Cleared {cache.clear()} cached configuration(s) from {options.config_cache}")
+    key = config_key(resource_folder)
+    config = cache.load(key)
+    if config is not None:
+        print(f"Using cached configuration {key[:12]} from {options.config_cache}")
+        # hives aren't cached, their email domain may be entered at the prompt
+        config['hives'] = populate_hives(resource_folder)
+        return config
+
+    config = populate_configuration(resource_folder, options.stream_config)
+    cache.save(key, config)
+    return config
+
+def export_metrics():
+    metrics = phoenix_module.client.metrics
+    if options.metrics_json:
+        metrics.write_json(options.metrics_json)
+    if options.metrics_prom:
+        metrics.write_prometheus(options.metrics_prom)
+
+run_start_time = time.time()
+
 # Handle command-line arguments or prompt for input
-import sys
-args = sys.argv[1:]
+parser = argparse.ArgumentParser(description="Sync repos, teams, applications and environments to Phoenix")
+parser.add_argument('args', nargs='*', help="clientID clientSecret teams code cloud deployment autolink_deploymentset autocreate_teams_from_pteam APIdomain")
+parser.add_argument('--resources', default=resource_folder, help="Folder containing core-structure.yaml, hives.yaml and the Teams folder")
+parser.add_argument('--config-cache', default=config_cache_folder, help="Folder the parsed configuration is cached in, reused while the resource files are unchanged")
+parser.add_argument('--no-config-cache', action='store_true', help="Parse the resource files without reading or writing the configuration cache")
+parser.add_argument('--clear-config-cache', action='store_true', help="Delete the cached configuration before loading the resource files")
+parser.add_argument('--stream-config', action='store_true', help="Read core-structure.yaml one DeploymentGroup / Environment Group at a time to bound peak memory on very large configurations")
+parser.add_argument('--app', action='append', default=[], help="Only sync the applications matching this glob pattern (repeatable)")
+parser.add_argument('--environment', action='append', default=[], help="Only sync the environments matching this glob pattern (repeatable)")
+parser.add_argument('--team', action='append', default=[], help="Only sync the teams, and the applications, components, services and repositories of the teams, matching this glob pattern (repeatable)")
+parser.add_argument('--domain', action='append', default=[], help="Only sync the components and repositories of the domains matching this glob pattern (repeatable)")
+parser.add_argument('--remote-cache', default=os.path.join(config_cache_folder, 'remote-state.sqlite'), help="File the application, component and team listings are cached in between runs")
+parser.add_argument('--remote-cache-ttl', type=float, default=0, help="Seconds the cached listings are used before they are fetched again (0 = don't use the cache, every run reads the live listings)")
+parser.add_argument('--refresh-remote', action='store_true', help="Fetch every listing again, ignoring the remote cache")
+parser.add_argument('--token-cache', default=None, help="File the access token is cached in (mode 0600) so later runs reuse it until it expires")
+parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help="Number of keep-alive connections kept open to the Phoenix API")
+parser.add_argument('--rate-limit', type=float, default=0, help="Maximum Phoenix API requests per second (0 = no limit, still backs off on 429/503)")
+parser.add_argument('--max-attempts', type=int, default=5, help="Attempts per Phoenix request before giving up (1 = no retries)")
+parser.add_argument('--retry-base-delay', type=float, default=0.5, help="Backoff in seconds before the first retry, doubled on every attempt (with jitter)")
+parser.add_argument('--retry-max-delay', type=float, default=30, help="Maximum backoff in seconds between two attempts")
+parser.add_argument('--page-size', type=int, default=None, help="Items per page requested when listing components, applications and teams")
+parser.add_argument('--page-workers', type=int, default=4, help="Number of listing pages fetched concurrently")
+parser.add_argument('--rule-batch-size', type=int, default=20, help="Maximum number of rules for the same application/component sent in one request (1 = one rule per request)")
+parser.add_argument('--team-user-batch-size', type=int, default=50, help="Maximum number of users assigned to a team in one request (1 = one user per request)")
+parser.add_argument('--team-delete-workers', type=int, default=4, help="Number of team member removals sent concurrently")
+parser.add_argument('--rule-index', action='store_true', help="Fetch the existing rules of each targeted component first and skip the rules already present, instead of posting every rule and relying on 409. Sends one GET /v1/components/{id}/rules per component, an endpoint assumed to exist (not in the documented API)")
+parser.add_argument('--max-in-flight', type=int, default=1, help="Maximum number of concurrent component rule writes (1 = sequential)")
+parser.add_argument('--max-in-flight-per-endpoint', type=int, default=None, help="Maximum number of concurrent writes to a single endpoint")
+parser.add_argument('--state-file', default=os.path.join(config_cache_folder, 'applied-state.sqlite'), help="Journal of the entities applied by previous runs, unchanged entities are not sent again")
+parser.add_argument('--full', action='store_true', help="Send every entity regardless of the journal (full resync), the journal is still updated")
+parser.add_argument('--phase-workers', type=int, default=1, help="Maximum number of independent phases run at the same time (1 = one phase after another, more buffers the log of each phase until it ends)")
+parser.add_argument('--plan', default=None, help="Compute the changes against the remote state and the journal (--state-file) and write them to this file instead of sending them")
+parser.add_argument('--apply', default=None, help="Execute the operations of a plan file written by --plan, without reading the configuration")
+parser.add_argument('--metrics-json', default=None, help="File the per endpoint request metrics are written to as JSON at the end of the run")
+parser.add_argument('--metrics-prom', default=None, help="Prometheus textfile (e.g. for the node_exporter textfile collector) the metrics are written to at the end of the run")
+options = parser.parse_args()
+args = options.args
+resource_folder = options.resources
 
 print("Arguments supplied:", len(args))
 
@@ -53,20 +170,57 @@ else:
     client_id = input("Please enter clientID: ")
     client_secret = input("Please enter clientSecret: ")
 
-environments = populate_environments_from_env_groups(resource_folder)
+phoenix_module.configure_client(pool_size=max(options.pool_size, options.max_in_flight, options.page_workers, options.team_delete_workers, options.phase_workers), rate_limit=options.rate_limit,
+                                max_attempts=options.max_attempts, retry_base_delay=options.retry_base_delay, retry_max_delay=options.retry_max_delay)
+phoenix_module.configure_concurrency(options.max_in_flight, options.max_in_flight_per_endpoint)
+phoenix_module.configure_pagination(options.page_size, options.page_workers)
+phoenix_module.configure_rule_batching(options.rule_batch_size)
+phoenix_module.configure_team_membership(options.team_user_batch_size, options.team_delete_workers)
+if options.remote_cache_ttl > 0:
+    phoenix_module.configure_remote_cache(options.remote_cache, options.remote_cache_ttl, options.refresh_remote)
+# exported on exit so failed runs, which exit early, still leave their metrics behind
+atexit.register(export_metrics)
+
+if options.plan and options.apply:
+    parser.error("--plan and --apply can't be used together")
+
+if options.apply:
+    access_token = get_access_token(client_id, client_secret, options.token_cache)
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    }
+    # the entities the plan applies are recorded, so the next plan leaves them out
+    journal = phoenix_module.configure_journal(options.state_file)
+    failures = phoenix_module.apply_plan(options.apply, headers)
+    report_phase("Apply", run_start_time)
+    journal.commit()
+    finish_run()
+    if failures:
+        print(f"{failures} operations of the plan failed")
+    sys.exit(1 if failures else 0)
+
+# a plan leaves out the entities the journal records as applied, like a direct run. Rules and deployments
+# can't be listed from the API, without the journal every plan would list all of them.
+phoenix_module.configure_journal(options.state_file, options.full)
+if options.plan:
+    print("[Plan] Computing plan, writes below are recorded in the plan and not sent")
+    phoenix_module.start_plan()
 
 # Populate data from various resources
-repos = populate_repositories(resource_folder)
-domains = populate_domains(repos)
-teams = populate_teams(resource_folder)
-hive_staff = populate_hives(resource_folder)  # List of Hive team staff
-subdomain_owners = populate_subdomain_owners(repos)
-subdomains = get_subdomains(repos)
-access_token = get_auth_token(client_id, client_secret)
-pteams = populate_phoenix_teams(access_token)  # Pre-existing Phoenix teams
-defaultAllAccessAccounts = populate_all_access_emails(resource_folder)
+config = load_configuration(resource_folder)
+environments = config['environments']
+repos = config['repos']
+domains, subdomains, subdomain_owners = summarize_repositories(repos)  # one pass over the repos
+teams = config['teams']
+hive_staff = config['hives']  # List of Hive team staff
+defaultAllAccessAccounts = config['all_access_emails']
 all_team_access = populate_users_with_all_team_access(teams, defaultAllAccessAccounts)  # Populate users with full team access
-applications = populate_applications(resource_folder)
+applications = config['applications']
+# every resource file is parsed once above (or read from the configuration cache), the remote state is fetched from here on
+config_time = report_phase("Configuration", run_start_time)
+access_token = get_access_token(client_id, client_secret, options.token_cache)
+pteams = populate_phoenix_teams(access_token)  # Pre-existing Phoenix teams
 
 # Display teams
 print("[Teams]")
@@ -78,6 +232,21 @@ for team in teams:
     except Exception as e:
         print(f"Error: {e}")
 
+# Scope filters prune the model before any phase runs, out of scope entities are neither read remotely nor sent
+scope = RunScope(options.app, options.environment, options.team, options.domain)
+all_teams = teams
+deployment_environments = scope.deployment_environments(environments)
+applications = scope.select_applications(applications)
+environments = scope.select_environments(environments)
+teams = scope.select_teams(teams)
+scoped_repos = scope.select_repos(repos)
+thirdparty_in_scope = scope.includes_service("Thirdparty", "Thirdparty")
+if scope.active:
+    phoenix_module.configure_scope(scope)
+    print(f"[Scope] {scope.describe()}: {len(applications)} applications "
+          f"({sum(len(application['Components']) for application in applications)} components), {len(environments)} environments "
+          f"({sum(len(environment['Services']) for environment in environments)} services), {len(teams)} teams, {len(scoped_repos)} repositories")
+
 # Display domains and repos
 print("\n[Domains]")
 print(domains)
@@ -86,81 +255,121 @@ print("\n[Repos]")
 for repo in repos:
     print(repo['RepositoryName'])
 
-# Get authentication token
-access_token = get_auth_token(client_id, client_secret)
-
 headers = {
     "Authorization": f"Bearer {access_token}",
     "Content-Type": "application/json"
 }
 
-phoenix_components = get_phoenix_components(access_token)
+if applications or environments or thirdparty_in_scope:
+    phoenix_components = get_phoenix_components(access_token)
+    app_environments = populate_applications_and_environments(headers)  # Should be populated using the equivalent PopulateApplicationsAndEnvironments
+else:
+    # nothing in scope is looked up in the component and application listings
+    phoenix_components, app_environments = [], []
 pteams = populate_phoenix_teams(access_token)
 # pteams created in this run
 new_pteams = []
 
-app_environments = populate_applications_and_environments(headers)  # Should be populated using the equivalent PopulateApplicationsAndEnvironments
+# indexed once, every existence check and lookup of the actions below uses the snapshot
+snapshot = RemoteSnapshot(app_environments, phoenix_components)
+if (action_code or action_cloud) and options.rule_index:
+    # rules already present on the targeted components are skipped instead of posted and answered with 409,
+    # only on request: listing component rules isn't part of the documented Phoenix API
+    rule_targets = phoenix_module.component_rule_targets(applications if action_code else [], environments if action_cloud else [],
+                                                         scoped_repos if action_cloud else [])
+    phoenix_module.index_component_rules(rule_targets, snapshot, headers)
 
 # Stopwatch logic
-start_time = time.time()
+report_phase("Startup", config_time)
 
 # Team actions
-if action_teams:
+def teams_phase():
+    global new_pteams
     print("Performing Teams Actions")
-    all_team_access = populate_users_with_all_team_access(teams, defaultAllAccessAccounts)
     new_pteams = create_teams(teams, pteams, access_token)
+
+def team_rules_phase():
     create_team_rules(teams, pteams, access_token)
-    assign_users_to_team(pteams, new_pteams, teams, all_team_access, hive_staff, access_token)
 
-    elapsed_time = time.time() - start_time
-    print(f"[Diagnostic] [Teams] Time Taken: {elapsed_time}")
-    start_time = time.time()
+def team_members_phase():
+    # users with access to every team come from the whole configuration, also in a scoped run
+    all_team_access = populate_users_with_all_team_access(all_teams, defaultAllAccessAccounts)
+    assign_users_to_team(pteams, new_pteams, teams, all_team_access, hive_staff, access_token)
 
 # Cloud actions
-if action_cloud:
+def cloud_phase():
+    start_time = time.time()
     print("Performing Cloud Actions")
     for environment in environments:
-        if not any(env['name'] == environment['Name'] and env.get('type') == "ENVIRONMENT" for env in app_environments):
+        if not snapshot.application_exists(environment['Name'], "ENVIRONMENT"):
             # Create environments as needed
             print(f"Creating environment: {environment['Name']}")
             create_environment(environment, headers)
 
     # Perform cloud services
-    add_environment_services(repos, subdomains, environments, app_environments, phoenix_components, subdomain_owners, teams, access_token)
+    add_environment_services(scoped_repos, subdomains, environments, snapshot, subdomain_owners, teams, access_token)
+    phoenix_module.wait_for_rule_writes()
     print("[Diagnostic] [Cloud] Time Taken:", time.time() - start_time)
     print("Starting Cloud Asset Rules")
-    add_cloud_asset_rules(repos, access_token)
+    add_cloud_asset_rules(scoped_repos, access_token)
+    phoenix_module.wait_for_rule_writes()
     print("[Diagnostic] [Cloud] Time Taken:", time.time() - start_time)
-    print("Starting Third Party Rules")
-    add_thirdparty_services(phoenix_components, app_environments, subdomain_owners, headers)
-    
-    elapsed_time = time.time() - start_time
-    print(f"[Diagnostic] [Cloud] Time Taken: {elapsed_time}")
-    start_time = time.time()
+    if thirdparty_in_scope:
+        print("Starting Third Party Rules")
+        add_thirdparty_services(snapshot, subdomain_owners, headers)
 
-if action_code:
+def code_phase():
     print("Performing Code Actions")
-    create_applications(applications, app_environments, phoenix_components, headers)
-        
-    print(f"[Diagnostic] [Code] Time Taken: {time.time() - start_time}")
-    start_time = time.time()
+    create_applications(applications, snapshot, headers)
+    phoenix_module.wait_for_rule_writes()
 
-if action_deployment:
+def deployment_phase():
     print("Performing deployment action")
-    create_deployments(applications, environments, app_environments, headers)
-    print(f"[Diagnostic] [Deployment] Time Taken: {time.time() - start_time}")
-    start_time = time.time()
+    create_deployments(applications, deployment_environments, snapshot, headers)
 
-if action_autolink_deploymentset:
+def autolink_phase():
     print("Performing autolink deployment set action")
-    create_autolink_deployments(applications, environments, headers)
-    print(f"[Diagnostic] [Autolink deploymentset] Time Taken: {time.time() - start_time}")
-    start_time = time.time()
+    create_autolink_deployments(applications, deployment_environments, headers)
 
-if action_autocreate_teams_from_pteam:
+def autocreate_teams_phase():
     print("Performing autocreate teams from pteam")
-    create_teams_from_pteams(applications, environments, pteams, access_token)
-    print(f"[Diagnostic] [Autocreate teams from pteam] Time Taken: {time.time() - start_time}")
+    # teams created by the Teams phase aren't in pteams, without them they would be created again (400)
+    # and their rules posted with the missing id
+    create_teams_from_pteams(applications, environments, pteams + new_pteams, access_token)
+
+# Phases start once the phases they depend on are done, independent phases overlap. A plan is computed
+# one phase after another so the operations of the plan file come in a stable order.
+scheduler = PhaseScheduler(1 if options.plan else options.phase_workers)
+if action_teams:
+    scheduler.add("Teams", teams_phase)
+    scheduler.add("Team rules", team_rules_phase, after=["Teams"])
+    scheduler.add("Team members", team_members_phase, after=["Teams"])
+if action_cloud:
+    scheduler.add("Cloud", cloud_phase)
+if action_code:
+    scheduler.add("Code", code_phase)
+if action_deployment:
+    # deployments link applications to services, both created by the code and cloud phases
+    scheduler.add("Deployment", deployment_phase, after=["Code", "Cloud"])
+if action_autolink_deploymentset:
+    scheduler.add("Autolink deploymentset", autolink_phase, after=["Code", "Cloud"])
+if action_autocreate_teams_from_pteam:
+    # creates the teams still missing once the team actions are done, as the last action did before
+    scheduler.add("Autocreate teams from pteam", autocreate_teams_phase, after=["Teams", "Team rules", "Team members"])
+scheduler.run(on_finished=lambda phase: report_phase(phase.name, phase.started_at))
+scheduler.print_timeline()
+
+if options.plan:
+    # nothing was sent, the journal records are written to the plan and committed by --apply
+    phoenix_module.write_plan(options.plan)
+elif phoenix_module.journal is not None:
+    if not scope.active and all((action_teams, action_cloud, action_code, action_deployment, action_autolink_deploymentset)):
+        # every entity of the configuration was seen, the ones it no longer has are forgotten
+        phoenix_module.journal.prune()
+    else:
+        phoenix_module.journal.commit()
+
+finish_run()
 
 
 # Code actions
@@ -0,0 +1,69 @@
+import pytest
+
+from providers.ConfigCache import ConfigCache, config_key
+
+
+@pytest.fixture
+def resources(tmp_path):
+    folder = tmp_path / 'Resources'
+    (folder / 'Teams').mkdir(parents=True)
+    (folder / 'core-structure.yaml').write_text('DeploymentGroups: []\n')
+    (folder / 'hives.yaml').write_text('CompanyEmailDomain: example.com\nHives: []\n')
+    (folder / 'Teams' / 'payments.yaml').write_text('TeamName: payments\n')
+    return folder
+
+
+CONFIG = {'repos': [{'RepositoryName': 'payments-api'}], 'teams': [{'TeamName': 'payments'}],
+          'hives': [{'Team': 'payments', 'Lead': 'lead@example.com', 'Product': []}]}
+
+
+def test_unchanged_resources_hit_the_cache(resources, tmp_path):
+    cache = ConfigCache(tmp_path / 'cache')
+    key = config_key(resources)
+    assert cache.load(key) is None
+
+    cache.save(key, CONFIG)
+
+    assert config_key(resources) == key
+    assert cache.load(key)['repos'] == CONFIG['repos']
+
+
+@pytest.mark.parametrize('change', [
+    lambda folder: (folder / 'core-structure.yaml').write_text('DeploymentGroups: [{}]\n'),
+    lambda folder: (folder / 'hives.yaml').write_text('CompanyEmailDomain: example.org\nHives: []\n'),
+    lambda folder: (folder / 'Teams' / 'ledger.yaml').write_text('TeamName: ledger\n'),
+    lambda folder: (folder / 'Teams' / 'payments.yaml').unlink(),
+])
+def test_a_changed_resource_file_misses_the_cache(resources, tmp_path, change):
+    cache = ConfigCache(tmp_path / 'cache')
+    key = config_key(resources)
+    cache.save(key, CONFIG)
+
+    change(resources)
+
+    assert config_key(resources) != key
+    assert cache.load(config_key(resources)) is None
+
+
+def test_hives_are_not_cached(resources, tmp_path):
+    # their emails may be built with a company email domain typed at a prompt
+    cache = ConfigCache(tmp_path / 'cache')
+    key = config_key(resources)
+    cache.save(key, CONFIG)
+    assert 'hives' not in cache.load(key)
+
+
+def test_only_the_latest_configuration_is_kept(resources, tmp_path):
+    cache = ConfigCache(tmp_path / 'cache')
+    cache.save('old', CONFIG)
+    cache.save('new', CONFIG)
+    assert cache.load('old') is None
+    assert cache.clear() == 1
+    assert cache.load('new') is None
+
+
+def test_an_unreadable_cache_is_a_miss(tmp_path, capsys):
+    cache = ConfigCache(tmp_path)
+    (tmp_path / 'config-broken.pickle').write_bytes(b'not a pickle')
+    assert cache.load('broken') is None
+    assert 'Ignoring unreadable configuration cache' in capsys.readouterr().out
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+
+from providers.Utils import calculate_criticality
+from providers.YamlHelper import (populate_all_access_emails, populate_applications, populate_environments_from_env_groups,
+                                  populate_repositories, stream_core_structure)
+
+CORE_STRUCTURE = """\
+AllAccessAccounts:
+  - ciso@example.com
+defaults: &component
+  Status: Production
+  Type: Release
+  Tier: 3
+DeploymentGroups:
+  - AppName: payments
+    TeamNames: [payments]
+    ReleaseDefinitions: []
+    Responsable: lead@example.com
+    Tier: 8
+    BuildDefinitions:
+      - BuildDefinitionName: payments-build
+        RepositoryName: [org/payments-api, org/payments-web]
+        TeamName: payments
+        Domain: Banking
+        SubDomain: Payments
+    Components:
+      - <<: *component
+        ComponentName: api
+        RepositoryName: org/payments-api
+        Domain: Banking
+        SubDomain: Payments
+      - <<: *component
+        ComponentName: web
+        Tier: 6
+        SearchName: payments-web
+        MultiConditionRule:
+          RepositoryName: org/payments-web
+          SearchName: web
+  - AppName: untracked
+    ReleaseDefinitions: []
+    Responsable: lead@example.com
+Environment Groups:
+  - Name: Production
+    Type: CLOUD
+    Tier: 9
+    Status: Production
+    Responsable: ops@example.com
+    TeamName: platform
+    Services:
+      - Service: gateway
+        Type: Cloud
+        RepositoryName: org/gateway
+        Tag: env:prod
+  - Name: Sandbox
+    Type: CLOUD
+    Tier: 1
+    Status: Production
+    Responsable: ops@example.com
+"""
+
+
+def load_full(resource_folder):
+    return {
+        'environments': populate_environments_from_env_groups(resource_folder),
+        'repos': populate_repositories(resource_folder),
+        'all_access_emails': populate_all_access_emails(resource_folder),
+        'applications': populate_applications(resource_folder)
+    }
+
+
+@pytest.fixture
+def written_resources(tmp_path):
+    (tmp_path / 'core-structure.yaml').write_text(CORE_STRUCTURE)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('resource_folder', ['written', str(Path(__file__).parent.parent / 'Resources')])
+def test_streaming_loader_matches_the_full_loader(resource_folder, written_resources):
+    if resource_folder == 'written':
+        resource_folder = written_resources
+
+    streamed = stream_core_structure(resource_folder)
+
+    assert streamed == load_full(resource_folder)
+
+
+def test_streaming_loader_resolves_anchors_and_merge_keys(written_resources):
+    streamed = stream_core_structure(written_resources)
+
+    [payments] = streamed['applications']
+    # both components take Status, Type and Tier from the anchor, web overrides the Tier
+    assert [(component.ComponentName, component.Status, component.Type, component.Criticality) for component in payments.Components] == \
+        [('api', 'Production', 'Release', calculate_criticality(3)), ('web', 'Production', 'Release', calculate_criticality(6))]
+    assert [repo.RepositoryName for repo in streamed['repos']] == ['org/payments-api', 'org/payments-web']
+    assert [environment.Name for environment in streamed['environments']] == ['Production']
+    assert streamed['all_access_emails'] == ['ciso@example.com']
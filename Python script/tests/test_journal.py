@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import providers.Phoenix as phoenix
+from providers.Journal import AppliedJournal, payload_hash
+from providers.Scheduler import PhaseScheduler, current_phase
+
+
+class Model:
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def to_dict(self):
+        return self.fields
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / 'state' / 'applied.sqlite')
+
+
+def test_payload_hash_is_canonical():
+    assert payload_hash({'a': 1, 'b': [1, 2]}) == payload_hash({'b': [1, 2], 'a': 1})
+    assert payload_hash({'a': 1}) != payload_hash({'a': 2})
+    assert payload_hash(Model(name='api', criticality=5)) == payload_hash({'criticality': 5, 'name': 'api'})
+
+
+def test_records_are_only_visible_once_committed(state_file):
+    journal = AppliedJournal(state_file, 'https://api.example.com')
+    assert not journal.is_current('rule', 'app/api/rule', {'keyLike': 'x'})
+    journal.record('rule', 'app/api/rule', {'keyLike': 'x'})
+    assert not AppliedJournal(state_file, 'https://api.example.com').is_current('rule', 'app/api/rule', {'keyLike': 'x'})
+
+    journal.commit()
+    assert journal.is_current('rule', 'app/api/rule', {'keyLike': 'x'})
+    reopened = AppliedJournal(state_file, 'https://api.example.com')
+    assert reopened.is_current('rule', 'app/api/rule', {'keyLike': 'x'})
+    assert not reopened.is_current('rule', 'app/api/rule', {'keyLike': 'y'})
+    # journals of other API domains sharing the file are separate
+    assert not AppliedJournal(state_file, 'https://other.example.com').is_current('rule', 'app/api/rule', {'keyLike': 'x'})
+
+
+def test_full_resync_sends_everything_and_still_records(state_file):
+    journal = AppliedJournal(state_file, 'scope')
+    journal.record('component', 'app/api', {'Status': 'live'})
+    journal.commit()
+
+    full = AppliedJournal(state_file, 'scope', full=True)
+    assert not full.is_current('component', 'app/api', {'Status': 'live'})
+    assert not full.unchanged('component', 'app/api', {'Status': 'live'})
+    full.record('component', 'app/api', {'Status': 'retired'})
+    full.commit()
+    assert AppliedJournal(state_file, 'scope').is_current('component', 'app/api', {'Status': 'retired'})
+
+
+def test_prune_forgets_entities_the_run_did_not_see(state_file):
+    journal = AppliedJournal(state_file, 'scope')
+    for key in ('kept', 'checked', 'left alone', 'removed'):
+        journal.record('rule', key, key)
+    journal.commit()
+
+    run = AppliedJournal(state_file, 'scope')
+    assert run.is_current('rule', 'checked', 'checked')
+    run.record('rule', 'kept', 'kept')
+    run.keep('rule', 'left alone')
+    assert run.unchanged('rule', 'removed', 'removed')  # looking without marking as seen
+    assert run.prune() == 1
+
+    after = AppliedJournal(state_file, 'scope')
+    assert [after.is_current('rule', key, key) for key in ('kept', 'checked', 'left alone', 'removed')] == [True, True, True, False]
+
+
+def test_a_completed_phase_commits_its_own_records_only(state_file):
+    journal = AppliedJournal(state_file, 'scope')
+    cloud_recorded = threading.Event()
+
+    def code():
+        journal.record('component', 'app/api', 'api')
+        # Code completes while Cloud, which fails later, has records staged
+        cloud_recorded.wait(5)
+
+    def cloud():
+        journal.record('service', 'Production/db', 'db')
+        cloud_recorded.set()
+        time.sleep(0.05)
+        exit(1)
+
+    scheduler = PhaseScheduler(workers=2)
+    scheduler.add("Code", code)
+    scheduler.add("Cloud", cloud)
+    with pytest.raises(SystemExit):
+        scheduler.run(on_finished=lambda phase: journal.commit(phase.name))
+
+    reopened = AppliedJournal(state_file, 'scope')
+    assert reopened.is_current('component', 'app/api', 'api')
+    assert not reopened.is_current('service', 'Production/db', 'db')
+
+
+def test_commit_without_phases_writes_every_phase(state_file):
+    journal = AppliedJournal(state_file, 'scope')
+    journal.record('rule', 'outside', 1)
+    token = current_phase.set("Code")
+    journal.record('rule', 'inside', 1)
+    current_phase.reset(token)
+    journal.commit()
+    assert journal.is_current('rule', 'outside', 1) and journal.is_current('rule', 'inside', 1)
+
+
+def test_stats_count_skipped_and_sent_per_kind(state_file, capsys):
+    journal = AppliedJournal(state_file, 'scope')
+    journal.record('deployment', 'a', 1)
+    journal.commit()
+    journal.is_current('deployment', 'a', 1)
+    journal.is_current('deployment', 'b', 1)
+    journal.print_stats()
+    assert "deployment: 1/2" in capsys.readouterr().out
+
+
+def conflict_client(status_code):
+    class Client:
+        def post(self, url, **kwargs):
+            response = requests.Response()
+            response.status_code = status_code
+            response.url = url
+            response._content = b'{}'
+            return response
+    return Client()
+
+
+@pytest.mark.parametrize('status_code, journaled', [(201, True), (409, False)])
+def test_created_applications_and_components_are_journaled_unless_they_already_existed(monkeypatch, state_file, capsys,
+                                                                                        status_code, journaled):
+    journal = AppliedJournal(state_file, 'scope')
+    monkeypatch.setattr(phoenix, 'journal', journal)
+    monkeypatch.setattr(phoenix, 'client', conflict_client(status_code))
+    monkeypatch.setattr(phoenix, 'create_component_rules', lambda applicationName, component, headers: None)
+    component = {'ComponentName': 'api', 'Status': 'live', 'Type': 'service', 'TeamNames': ['payments'], 'Criticality': 5}
+    application = {'AppName': 'payments', 'Criticality': 5, 'Responsable': 'owner@example.com', 'TeamNames': ['payments'],
+                   'Components': [component]}
+
+    phoenix.create_application(application, {})
+    journal.commit()
+
+    # an entity answered with 409 has unknown values, the next run has to compare it with the remote state
+    assert journal.unchanged('application', 'payments', phoenix.application_state(application)) is journaled
+    assert journal.unchanged('component', 'payments/api', component) is journaled
@@ -0,0 +1,53 @@
+import random
+import string
+
+import Levenshtein
+import pytest
+
+import providers.NameMatcher as name_matcher_module
+from providers.NameMatcher import NameMatcher, qgram_tokens
+
+
+def pairwise_matches(query, names, threshold):
+    # the comparison NameMatcher replaces
+    return [index for index, name in enumerate(names)
+            if name is not None and (query.lower() == name.lower() or Levenshtein.ratio(query, name) > threshold)]
+
+
+def generate_names(rng, count):
+    names = []
+    for _ in range(count):
+        if names and rng.random() < 0.4:
+            # a variant of an earlier name: case change, typo, suffix, deletion
+            name = rng.choice(names)
+            position = rng.randrange(len(name))
+            name = rng.choice([name.upper(), name[:position] + rng.choice('abc-_') + name[position + 1:],
+                               name + rng.choice(['-svc', '1', '_api']), name[:position] + name[position + 1:] or name])
+        else:
+            name = ''.join(rng.choice(string.ascii_lowercase + '-_') for _ in range(rng.randint(1, 24)))
+        names.append(name)
+    return names
+
+
+def test_qgram_tokens_count_repeated_grams():
+    assert qgram_tokens("abcabc") == [('abc', 1), ('bca', 1), ('cab', 1), ('abc', 2)]
+    assert qgram_tokens("ab") == []
+
+
+@pytest.mark.parametrize('threshold', [0.9, 0.8, 0.6])
+@pytest.mark.parametrize('batched', [True, False])
+def test_matches_like_the_pairwise_comparison(monkeypatch, threshold, batched):
+    if not batched:
+        monkeypatch.setattr(name_matcher_module, 'rapidfuzz_process', None)
+    rng = random.Random(threshold)
+    names = generate_names(rng, 400) + [None]
+    matcher = NameMatcher(names, threshold)
+    for query in generate_names(rng, 150) + names[:150:7]:
+        expected = pairwise_matches(query, names, threshold)
+        assert [index for index, _ in matcher.matches(query)] == expected, query
+
+
+def test_case_insensitive_equal_names_match_without_a_ratio():
+    matcher = NameMatcher(["Payments-API", "payments-api2", "ledger"], 0.9)
+    assert matcher.matches("payments-api") == [(0, None), (1, Levenshtein.ratio("payments-api", "payments-api2"))]
+    assert matcher.matches(None) == []
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+import providers.Phoenix as phoenix
+
+TOTAL_PAGES = 6
+
+
+class Response:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class PagedApi:
+    """
+    Serves TOTAL_PAGES pages of two items, answering the later pages first.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requested = []
+        self.threads = set()
+
+    def get(self, url, headers=None, params=None):
+        page = params['pageNumber']
+        with self.lock:
+            self.requested.append(params)
+            self.threads.add(threading.get_ident())
+        time.sleep((TOTAL_PAGES - page) * 0.01)
+        return Response({'content': [f"item-{page}-0", f"item-{page}-1"], 'totalPages': TOTAL_PAGES})
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = PagedApi()
+    monkeypatch.setattr(phoenix, 'client', api)
+    monkeypatch.setattr(phoenix, 'remote_cache', None)
+    monkeypatch.setattr(phoenix, 'PAGE_SIZE', None)
+    monkeypatch.setattr(phoenix, 'PAGE_WORKERS', 4)
+    return api
+
+
+def test_pages_fetched_concurrently_are_merged_in_page_order(api):
+    items = phoenix.get_all_pages('/v1/teams', {})
+
+    assert items == [f"item-{page}-{index}" for page in range(TOTAL_PAGES) for index in range(2)]
+    assert sorted(params['pageNumber'] for params in api.requested) == list(range(TOTAL_PAGES))
+    assert len(api.threads) > 1
+
+
+def test_page_size_is_sent_with_every_page_request(api):
+    phoenix.configure_pagination(page_size=500)
+
+    phoenix.get_all_pages('/v1/teams', {})
+
+    assert {params.get('pageSize') for params in api.requested} == {500}
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+import requests
+
+import providers.Phoenix as phoenix
+from providers.Journal import AppliedJournal, payload_hash
+from providers.Plan import PlanRecorder, already_applied_statuses, load_plan, operation_kind, resolve_refs, save_plan
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    def url(self, url):
+        return url if url.startswith('http') else f"https://api.example.com{url}"
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, url))
+        return 'remote response'
+
+
+def test_resolve_refs_replaces_planned_ids_everywhere():
+    value = {'endpoint': '/v1/teams/planned-op-3/users', 'users': [{'team': 'planned-op-12'}], 'criticality': 5}
+    assert resolve_refs(value, {3: 'team-a', 12: 'team-b'}) == \
+        {'endpoint': '/v1/teams/team-a/users', 'users': [{'team': 'team-b'}], 'criticality': 5}
+
+
+def test_resolve_refs_raises_when_the_creating_operation_returned_no_id():
+    with pytest.raises(KeyError):
+        resolve_refs('/v1/teams/planned-op-4/users', {3: 'team-a'})
+
+
+def test_operation_kind():
+    assert operation_kind('POST', '/v1/applications', {'type': 'ENVIRONMENT'}) == ('create', 'environment')
+    assert operation_kind('POST', '/v1/applications', {'type': 'APPLICATION'}) == ('create', 'application')
+    assert operation_kind('PUT', '/v1/teams/planned-op-2/users') == ('create', 'team member')
+    assert operation_kind('PUT', '/v1/unknown') == ('update', '/v1/unknown')
+
+
+def test_already_applied_statuses():
+    assert already_applied_statuses('/v1/teams') == (400, 409)
+    assert already_applied_statuses('/v1/teams/planned-op-0/users') == (400, 409)
+    assert already_applied_statuses('/v1/components') == (409,)
+
+
+def test_recorder_records_writes_and_sends_reads():
+    client = FakeClient()
+    recorder = PlanRecorder(client)
+
+    response = recorder.post('/v1/teams', json={'name': 'payments', 'type': 'GENERAL'})
+    assert response.status_code == 201
+    team_id = response.json()['id']
+    assert team_id == 'planned-op-0'
+
+    recorder.put(f'/v1/teams/{team_id}/users', json={'users': [{'email': 'a@example.com'}]})
+    assert recorder.get(f'/v1/teams/{team_id}/users').json() == []
+    assert recorder.get('/v1/teams') == 'remote response'
+
+    assert client.sent == [('GET', 'https://api.example.com/v1/teams')]
+    assert [(operation['id'], operation['action'], operation['kind']) for operation in recorder.operations] == \
+        [(0, 'create', 'team'), (1, 'create', 'team member')]
+
+
+def test_save_and_load_plan(tmp_path, capsys):
+    path = tmp_path / 'plan.json'
+    operations = [{'id': 1, 'action': 'create', 'kind': 'rule', 'method': 'POST', 'endpoint': '/v1/components/rules', 'payload': {}},
+                  {'id': 0, 'action': 'create', 'kind': 'team', 'method': 'POST', 'endpoint': '/v1/teams', 'payload': {}}]
+    save_plan(path, operations, 'https://api.example.com')
+
+    plan = load_plan(path)
+    assert [operation['id'] for operation in plan['operations']] == [0, 1]
+    assert plan['summary'] == {'create': {'rule': 1, 'team': 1}}
+
+    plan['version'] = 99
+    path.write_text(json.dumps(plan))
+    with pytest.raises(ValueError):
+        load_plan(path)
+
+
+def test_apply_plan_counts_failed_rule_writes(tmp_path, monkeypatch, capsys):
+    class FailingClient:
+        def post(self, url, **kwargs):
+            response = requests.Response()
+            response.status_code = 500
+            response.url = url
+            response._content = b'{}'
+            return response
+
+    monkeypatch.setattr(phoenix, 'client', FailingClient())
+    monkeypatch.setattr(phoenix, 'journal', None)
+    rules = {'selector': {'applicationSelector': {'name': 'app'}, 'componentSelector': {'name': 'api'}},
+             'rules': [{'name': 'one', 'filter': {'keyLike': 'one'}}, {'name': 'two', 'filter': {'keyLike': 'two'}}]}
+    path = tmp_path / 'plan.json'
+    save_plan(path, [{'id': 0, 'action': 'create', 'kind': 'rule', 'method': 'POST', 'endpoint': '/v1/components/rules', 'payload': rules}],
+              phoenix.APIdomain)
+
+    assert phoenix.apply_plan(path, {}) == 2
+
+
+def test_apply_plan_journals_the_records_of_a_plan_that_succeeded(tmp_path, monkeypatch, capsys):
+    class AcceptingClient:
+        def __init__(self):
+            self.sent = []
+
+        def request(self, method, url, **kwargs):
+            self.sent.append((method, url))
+            response = requests.Response()
+            response.status_code = 201
+            response.url = url
+            response._content = b'{"id": "team-42"}'
+            return response
+
+    journal = AppliedJournal(tmp_path / 'state.sqlite', phoenix.APIdomain)
+    monkeypatch.setattr(phoenix, 'client', AcceptingClient())
+    monkeypatch.setattr(phoenix, 'journal', journal)
+    path = tmp_path / 'plan.json'
+    team_rule = {'match': 'ANY', 'tags': [{'key': 'pteam', 'value': 'payments'}]}
+    save_plan(path, [{'id': 0, 'action': 'create', 'kind': 'team', 'method': 'POST', 'endpoint': '/v1/teams', 'payload': {'name': 'payments'}}],
+              phoenix.APIdomain, records=[['team rule', 'planned-op-0/pteam=payments', payload_hash(team_rule)]])
+
+    assert phoenix.apply_plan(path, {}) == 0
+    journal.commit()
+    # the team is journaled under the id it got when the plan was applied
+    assert AppliedJournal(tmp_path / 'state.sqlite', phoenix.APIdomain).is_current('team rule', 'team-42/pteam=payments', team_rule)
+
+
+def test_plan_leaves_out_what_the_journal_records_and_carries_its_records(tmp_path, monkeypatch, capsys):
+    journal = AppliedJournal(tmp_path / 'state.sqlite', 'https://api.example.com')
+    deployment = {'applicationSelector': {'name': 'payments'}, 'serviceSelector': {'name': 'payments'}}
+    journal.record('deployment', phoenix.deployment_key(deployment), deployment)
+    journal.commit()
+    recorder = PlanRecorder(FakeClient())
+    monkeypatch.setattr(phoenix, 'client', recorder)
+    monkeypatch.setattr(phoenix, 'journal', journal)
+
+    phoenix.create_autolink_deployments([{'AppName': 'payments'}, {'AppName': 'ledger'}],
+                                        [{'Services': [{'Service': 'payments'}, {'Service': 'ledger'}]}], {})
+    plan = phoenix.write_plan(tmp_path / 'plan.json')
+
+    assert [operation['payload']['applicationSelector']['name'] for operation in plan['operations']] == ['ledger']
+    assert [record[:2] for record in plan['records']] == \
+        [['deployment', phoenix.deployment_key({'applicationSelector': {'name': 'ledger'}, 'serviceSelector': {'name': 'ledger'}})]]
@@ -0,0 +1,77 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import providers.RateLimiter as rate_limiter_module
+from providers.RateLimiter import RateLimiter, parse_retry_after
+
+
+class FakeClock:
+    """
+    Stands in for time.monotonic and time.sleep, sleeping moves the clock forward.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limiter_module.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(format_datetime(datetime.now(timezone.utc) - timedelta(minutes=1), usegmt=True)) == 0.0
+    assert 50 < parse_retry_after(format_datetime(datetime.now(timezone.utc) + timedelta(minutes=1), usegmt=True)) <= 60
+
+
+def test_unlimited_never_waits(clock):
+    limiter = RateLimiter()
+    assert [limiter.acquire() for _ in range(100)] == [0.0] * 100
+    assert clock.slept == []
+
+
+def test_bucket_waits_once_the_burst_is_spent(clock):
+    limiter = RateLimiter(rate=2)
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(0.5)
+    clock.now += 1.0
+    assert limiter.acquire() == 0.0
+    assert limiter.throttled_seconds == pytest.approx(0.5)
+
+
+def test_backoff_pauses_halves_the_rate_and_recovers(clock):
+    limiter = RateLimiter(rate=10)
+    limiter.backoff(retry_after=2)
+    assert limiter.current_rate == 5
+    assert limiter.acquire() == pytest.approx(2.0)
+    assert limiter.throttle_count == 1
+
+    for _ in range(100):
+        limiter.record_success()
+    assert limiter.current_rate == 10
+
+
+def test_backoff_without_a_rate_limits_to_half_the_observed_rate(clock):
+    limiter = RateLimiter(min_rate=1)
+    for _ in range(8):
+        limiter.acquire()
+    limiter.backoff(retry_after=0)
+    assert limiter.current_rate == 4
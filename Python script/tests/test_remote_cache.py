@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+import providers.RemoteCache as remote_cache_module
+from providers.RemoteCache import RemoteStateCache
+
+API = "https://api.example.com"
+GATEWAY, SEARCH, LEDGER = (f"5f0c2a52-4b8e-4a43-9d61-0e7f4f0b1a0{number}" for number in (1, 2, 3))
+COMPONENTS = [{'id': GATEWAY, 'name': 'gateway', 'tags': []}, {'id': SEARCH, 'name': 'search', 'tags': []}]
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("no body")
+        return self.body
+
+
+@pytest.fixture
+def cache(tmp_path, capsys):
+    cache = RemoteStateCache(str(tmp_path / 'remote.sqlite'), API, ttl=60)
+    cache.store('/v1/components', COMPONENTS)
+    yield cache
+    cache.close()
+
+
+def test_listings_are_read_back_in_order_until_the_ttl(cache, monkeypatch):
+    assert cache.load('/v1/components') == COMPONENTS
+    assert cache.load('/v1/teams') is None
+
+    now = remote_cache_module.time.time()
+    monkeypatch.setattr(remote_cache_module.time, 'time', lambda: now + 61)
+    assert cache.load('/v1/components') is None
+    assert (cache.stats['hits'], cache.stats['misses']) == (1, 2)
+
+
+def test_cache_of_an_older_layout_is_not_used(cache):
+    with sqlite3.connect(cache.path) as connection:
+        connection.execute("UPDATE listings SET version = version - 1")
+    assert cache.load('/v1/components') is None
+
+
+def test_created_and_updated_entities_are_stored_in_place(cache):
+    cache.observe_write('POST', f"{API}/v1/components", {'name': 'ledger'}, Response(201, {'id': LEDGER, 'name': 'ledger', 'tags': []}))
+    cache.observe_write('PATCH', f"{API}/v1/components/{GATEWAY}", {'criticality': 9}, Response(200))
+    cache.observe_write('PATCH', f"{API}/v1/components/{SEARCH}", {'name': 'search'}, Response(200, {'id': SEARCH, 'name': 'search-v2'}))
+
+    assert cache.load('/v1/components') == [{'id': GATEWAY, 'name': 'gateway', 'tags': [], 'criticality': 9},
+                                            {'id': SEARCH, 'name': 'search-v2'},
+                                            {'id': LEDGER, 'name': 'ledger', 'tags': []}]
+
+
+@pytest.mark.parametrize('method, endpoint, payload, response', [
+    ('POST', '/v1/components', {'name': 'gateway'}, Response(409)),
+    ('POST', '/v1/components', {'name': 'ledger'}, Response(201)),
+    ('PATCH', f'/v1/components/{GATEWAY}', {'tags': [{'key': 'pteam', 'value': 'payments'}]}, Response(200)),
+    ('PUT', f'/v1/components/{GATEWAY}/tags', [{'key': 'Status', 'value': 'live'}], Response(200)),
+])
+def test_writes_with_an_unknown_outcome_invalidate_the_listing(cache, method, endpoint, payload, response):
+    cache.observe_write(method, f"{API}{endpoint}", payload, response)
+    assert cache.load('/v1/components') is None
+
+
+@pytest.mark.parametrize('method, endpoint, response', [
+    ('POST', '/v1/components/rules', Response(201)),
+    ('GET', '/v1/components', Response(200, {'content': []})),
+    ('PATCH', f'/v1/components/{GATEWAY}', Response(500)),
+    ('POST', '/v1/applications', Response(409)),
+])
+def test_other_requests_leave_the_listing_alone(cache, method, endpoint, response):
+    cache.observe_write(method, f"{API}{endpoint}", {}, response)
+    assert cache.load('/v1/components') == COMPONENTS
+
+
+def test_team_creation_answered_with_400_invalidates_teams(cache):
+    cache.store('/v1/teams', [{'id': 't1', 'name': 'payments'}])
+    cache.observe_write('POST', f"{API}/v1/teams", {'name': 'payments'}, Response(400))
+    assert cache.load('/v1/teams') is None
+
+
+def test_caches_of_other_domains_and_clear(cache):
+    other = RemoteStateCache(cache.path, "https://other.example.com", ttl=60)
+    assert other.load('/v1/components') is None
+    other.close()
+
+    cache.clear()
+    assert cache.load('/v1/components') is None
+    assert cache.stats['invalidated'] == 1
@@ -0,0 +1,42 @@
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import providers.RetryPolicy as retry_policy_module
+from providers.RetryPolicy import RetryPolicy, endpoint_template
+
+
+def test_endpoint_template_replaces_ids_and_emails():
+    assert endpoint_template("https://api.example.com/v1/teams/123/users/a.b@example.com") == "/v1/teams/{id}/users/{id}"
+    assert endpoint_template("https://api.example.com/v1/applications/0b6f3e2a-1c2d-4e5f-8a9b-0c1d2e3f4a5b/deploy") == "/v1/applications/{id}/deploy"
+    assert endpoint_template("https://api.example.com/v1/components/rules/") == "/v1/components/rules"
+
+
+def test_backoff_doubles_up_to_max_delay(monkeypatch):
+    # full jitter draws between 0 and the cap, the upper bound shows the cap
+    monkeypatch.setattr(retry_policy_module.random, 'uniform', lambda low, high: high)
+    policy = RetryPolicy(base_delay=0.5, max_delay=3)
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3, 3]
+
+
+def test_should_retry_stops_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry(2, 'GET', '/v1/teams', status_code=503)
+    assert not policy.should_retry(3, 'GET', '/v1/teams', status_code=503)
+
+
+def test_client_errors_are_not_retried():
+    policy = RetryPolicy()
+    assert not policy.should_retry(1, 'GET', '/v1/teams', status_code=404)
+    assert policy.should_retry(1, 'GET', '/v1/teams', status_code=429)
+
+
+def test_post_is_only_retried_when_it_cannot_duplicate():
+    policy = RetryPolicy()
+    # the team may have been created before the 500, /v1/teams doesn't answer 409 for duplicates
+    assert not policy.should_retry(1, 'POST', '/v1/teams', status_code=500)
+    assert not policy.should_retry(1, 'POST', '/v1/teams', error=requests.exceptions.ReadTimeout())
+    assert policy.should_retry(1, 'POST', '/v1/teams', status_code=429)
+    assert policy.should_retry(1, 'POST', '/v1/components/rules', status_code=500)
+
+    not_connected = requests.exceptions.ConnectionError(NewConnectionError(None, "connection refused"))
+    assert policy.should_retry(1, 'POST', '/v1/teams', error=not_connected)
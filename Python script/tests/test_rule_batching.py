@@ -0,0 +1,87 @@
+import pytest
+import requests
+
+import providers.Phoenix as phoenix
+from providers.RuleIndex import RuleIndex
+
+
+class RulesApi:
+    """
+    Answers /v1/components/rules like the API: 409 when any rule of the request already exists.
+    """
+
+    def __init__(self, existing=()):
+        self.rules = set(existing)
+        self.sent = []
+
+    def post(self, url, json=None, **kwargs):
+        names = [rule['name'] for rule in json['rules']]
+        self.sent.append(names)
+        response = requests.Response()
+        response.url = url
+        response._content = b'{}'
+        response.status_code = 409 if self.rules.intersection(names) else 201
+        if response.status_code == 201:
+            self.rules.update(names)
+        return response
+
+
+@pytest.fixture
+def rules_api(monkeypatch):
+    def install(existing=()):
+        api = RulesApi(existing)
+        monkeypatch.setattr(phoenix, 'client', api)
+        return api
+
+    monkeypatch.setattr(phoenix, 'journal', None)
+    monkeypatch.setattr(phoenix, 'rule_index', None)
+    monkeypatch.setattr(phoenix, 'new_rule_targets', set())
+    monkeypatch.setattr(phoenix, 'RULE_BATCH_SIZE', 20)
+    return install
+
+
+def rules(*names):
+    return [phoenix.component_rule('keyLike', name, name) for name in names]
+
+
+def test_rules_of_a_component_created_by_the_run_are_sent_together(rules_api):
+    api = rules_api()
+    phoenix.mark_new_rule_target('Payments', 'API')
+
+    phoenix.submit_component_rules('payments', 'api', rules('a', 'b', 'c'), {})
+
+    assert api.sent == [['a', 'b', 'c']]
+
+
+def test_rules_of_an_existing_component_are_sent_one_per_request(rules_api, capsys):
+    api = rules_api(existing={'a', 'b', 'c'})
+
+    phoenix.submit_component_rules('payments', 'api', rules('a', 'b', 'c'), {})
+
+    # one request per rule, a batch would add a rejected request in front of them
+    assert api.sent == [['a'], ['b'], ['c']]
+    assert capsys.readouterr().out.count('already exists') == 3
+
+
+def test_rules_missing_from_the_rule_index_are_sent_together(rules_api):
+    api = rules_api(existing={'a'})
+    index = RuleIndex()
+    index.add_rules('payments', 'api', [{'name': 'a', 'filter': {'keyLike': 'a'}}])
+    phoenix.rule_index = index
+
+    phoenix.submit_component_rules('payments', 'api', rules('a', 'b', 'c'), {})
+
+    assert api.sent == [['b', 'c']]
+
+
+def test_a_rejected_batch_is_sent_again_in_halves(rules_api, capsys):
+    api = rules_api(existing={'c'})
+    pending_rules = rules('a', 'b', 'c', 'd')
+
+    phoenix.post_component_rules(phoenix.rule_selector('payments', 'api'), pending_rules, {})
+
+    assert api.sent == [['a', 'b', 'c', 'd'], ['a', 'b'], ['c', 'd'], ['c'], ['d']]
+    out = capsys.readouterr().out
+    assert [line for line in out.splitlines() if 'created' in line or 'already exists' in line] == \
+        ['Rule for a created.', 'Rule for b created.', ' > Rule for c already exists.', 'Rule for d created.']
+    assert not any(pending['failed'] for pending in pending_rules)
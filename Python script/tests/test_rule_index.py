@@ -0,0 +1,52 @@
+import requests
+
+import providers.Phoenix as phoenix
+from providers.RemoteSnapshot import RemoteSnapshot
+from providers.RuleIndex import RuleIndex, rule_fingerprint, rules_of
+
+
+def test_fingerprint_ignores_the_case_of_the_selector_names_only():
+    assert rule_fingerprint('Payments', 'API', {'keyLike': 'x', 'tags': []}) == rule_fingerprint('payments', 'api', {'tags': [], 'keyLike': 'x'})
+    assert rule_fingerprint('payments', 'api', {'keyLike': 'x'}) != rule_fingerprint('payments', 'api', {'keyLike': 'X'})
+
+
+def test_rules_of_lists_and_pages():
+    rule = {'name': 'r', 'filter': {'keyLike': 'x'}}
+    assert rules_of([rule, {'name': 'no filter'}]) == [rule]
+    assert rules_of({'content': [rule]}) == [rule]
+    assert rules_of({'rules': [rule]}) == [rule]
+    assert rules_of(None) == []
+
+
+def test_index_only_answers_for_indexed_components():
+    index = RuleIndex()
+    index.add_rules('Payments', 'API', [{'name': 'r', 'filter': {'keyLike': 'x'}}])
+    assert index.indexed('payments', 'api') and not index.indexed('payments', 'web')
+    assert index.contains('payments', 'api', {'name': 'other name', 'filter': {'keyLike': 'x'}})
+    assert not index.contains('payments', 'api', {'name': 'r', 'filter': {'keyLike': 'y'}})
+    assert (index.stats['skipped'], index.stats['sent']) == (1, 1)
+
+
+SNAPSHOT = RemoteSnapshot([{'id': 'a1', 'name': 'payments', 'type': 'APPLICATION'}],
+                          [{'id': 'c1', 'name': 'api', 'applicationId': 'a1'}, {'id': 'c2', 'name': 'web', 'applicationId': 'a1'}])
+
+
+def test_index_component_rules_fetches_the_targeted_components(monkeypatch, capsys):
+    rules = {'c1': [{'name': 'r', 'filter': {'keyLike': 'x'}}], 'c2': []}
+    monkeypatch.setattr(phoenix, 'get_component_rules', lambda component_id, headers: rules[component_id])
+    monkeypatch.setattr(phoenix, 'rule_index', None)
+
+    index = phoenix.index_component_rules([('payments', 'api'), ('payments', 'web'), ('payments', 'new')], SNAPSHOT, {})
+    assert phoenix.rule_index is index
+    assert index.indexed('payments', 'api') and index.indexed('payments', 'web') and not index.indexed('payments', 'new')
+
+
+def test_index_component_rules_falls_back_when_rules_cant_be_listed(monkeypatch, capsys):
+    def get_component_rules(component_id, headers):
+        raise requests.exceptions.HTTPError("404 Not Found")
+    monkeypatch.setattr(phoenix, 'get_component_rules', get_component_rules)
+    monkeypatch.setattr(phoenix, 'rule_index', None)
+
+    assert phoenix.index_component_rules([('payments', 'api')], SNAPSHOT, {}) is None
+    assert phoenix.rule_index is None
+    assert "--rule-index ignored" in capsys.readouterr().out
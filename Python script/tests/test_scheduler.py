@@ -0,0 +1,171 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from providers.Concurrency import BoundedExecutor, _ThreadOutput, with_context
+from providers.Scheduler import PhaseScheduler, current_phase
+
+
+def recording(log, name, seconds=0.0):
+    def action():
+        log.append(('start', name))
+        time.sleep(seconds)
+        log.append(('end', name))
+    return action
+
+
+def test_phases_start_once_their_dependencies_are_done():
+    log = []
+    scheduler = PhaseScheduler(workers=4)
+    scheduler.add("Teams", recording(log, "Teams", 0.05))
+    scheduler.add("Team rules", recording(log, "Team rules"), after=["Teams"])
+    scheduler.add("Code", recording(log, "Code", 0.02))
+    scheduler.add("Deployment", recording(log, "Deployment"), after=["Code", "Cloud"])  # Cloud switched off
+    finished = []
+    scheduler.run(on_finished=lambda phase: finished.append(phase.name))
+
+    assert log.index(('end', "Teams")) < log.index(('start', "Team rules"))
+    assert log.index(('end', "Code")) < log.index(('start', "Deployment"))
+    # independent phases overlap
+    assert log.index(('start', "Code")) < log.index(('end', "Teams"))
+    assert sorted(finished) == ["Code", "Deployment", "Team rules", "Teams"]
+
+
+def test_one_worker_runs_the_phases_in_the_order_added():
+    log = []
+    scheduler = PhaseScheduler(workers=1)
+    for name in ("Teams", "Cloud", "Code"):
+        scheduler.add(name, recording(log, name))
+    scheduler.run()
+    assert [name for event, name in log if event == 'start'] == ["Teams", "Cloud", "Code"]
+
+
+def test_a_failure_stops_the_phases_not_started_and_is_raised():
+    log = []
+
+    def failing():
+        time.sleep(0.02)
+        exit(1)
+
+    scheduler = PhaseScheduler(workers=2)
+    scheduler.add("Cloud", failing)
+    scheduler.add("Code", recording(log, "Code", 0.05))
+    scheduler.add("Deployment", recording(log, "Deployment"), after=["Code"])
+    finished = []
+    with pytest.raises(SystemExit):
+        scheduler.run(on_finished=lambda phase: finished.append(phase.name))
+    # the running phase completes, the dependent phase is never started
+    assert log == [('start', "Code"), ('end', "Code")]
+    assert finished == ["Code"]
+
+
+def test_phases_can_only_be_added_once():
+    scheduler = PhaseScheduler()
+    scheduler.add("Teams", lambda: None)
+    with pytest.raises(ValueError):
+        scheduler.add("Teams", lambda: None)
+
+
+def test_critical_path_is_the_longest_chain_of_dependent_phases(capsys):
+    scheduler = PhaseScheduler(workers=4)
+    durations = {"Teams": 1, "Team rules": 2, "Cloud": 4, "Code": 3, "Deployment": 1}
+    scheduler.add("Teams", None)
+    scheduler.add("Team rules", None, after=["Teams"])
+    scheduler.add("Cloud", None)
+    scheduler.add("Code", None)
+    scheduler.add("Deployment", None, after=["Code", "Cloud"])
+    scheduler.started_at = 0
+    for name, phase in scheduler.phases.items():
+        phase.started_at = 0
+        phase.finished_at = durations[name]
+
+    assert scheduler.critical_path() == (5, ["Cloud", "Deployment"])
+    scheduler.print_timeline()
+    assert "[Critical path] Cloud -> Deployment: 5.0s (phases one after another: 11.0s)" in capsys.readouterr().out
+
+
+def test_current_phase_follows_the_phase_into_its_worker_threads():
+    seen = {}
+
+    def phase(name):
+        def action():
+            seen[name] = (current_phase.get(), with_context(current_phase.get)())
+            thread = threading.Thread(target=with_context(lambda: seen.setdefault(f"{name} thread", current_phase.get())))
+            thread.start()
+            thread.join()
+        return action
+
+    scheduler = PhaseScheduler(workers=2)
+    scheduler.add("Cloud", phase("Cloud"))
+    scheduler.add("Code", phase("Code"))
+    scheduler.run()
+    assert seen == {"Cloud": ("Cloud", "Cloud"), "Code": ("Code", "Code"), "Cloud thread": "Cloud", "Code thread": "Code"}
+    assert current_phase.get() is None
+
+
+def test_drain_waits_for_the_tasks_of_the_calling_thread_only():
+    executor = BoundedExecutor(max_in_flight=4)
+    release = threading.Event()
+    submitted = threading.Event()
+    failures = []
+
+    def slow_failure():
+        release.wait(5)
+        exit(1)
+
+    def other_phase():
+        executor.submit('/v1/components/rules', slow_failure)
+        submitted.set()
+        release.wait(5)
+        try:
+            executor.drain()
+        except SystemExit as e:
+            failures.append(e)
+
+    other = threading.Thread(target=other_phase)
+    other.start()
+    submitted.wait(5)
+    done = []
+    try:
+        executor.submit('/v1/components/rules', lambda: done.append(True))
+        started = time.time()
+        # neither waits for the other thread's write nor gets its failure
+        executor.drain()
+        assert done == [True]
+        assert time.time() - started < 1
+    finally:
+        release.set()
+        other.join(5)
+        executor.shutdown()
+    assert len(failures) == 1
+
+
+def test_parallel_phases_write_their_output_as_one_block(capsys):
+    both_started = threading.Barrier(2, timeout=5)
+    executor = BoundedExecutor(max_in_flight=2)
+
+    def phase(name):
+        def action():
+            print(f"{name} 1")
+            both_started.wait()
+            executor.submit('/v1/components/rules', print, f"{name} rule")
+            executor.drain()
+            print(f"{name} 2")
+        return action
+
+    scheduler = PhaseScheduler(workers=2)
+    scheduler.add("Cloud", phase("Cloud"))
+    scheduler.add("Code", phase("Code"))
+    try:
+        scheduler.run(on_finished=lambda phase: print(f"{phase.name} done"))
+    finally:
+        executor.shutdown()
+    lines = capsys.readouterr().out.splitlines()
+    for name in ("Cloud", "Code"):
+        start = lines.index(f"{name} 1")
+        # the rule task printed on a worker thread lands inside the block of its phase
+        assert lines[start:start + 3] == [f"{name} 1", f"{name} rule", f"{name} 2"]
+        assert lines.index(f"{name} done") > start + 2
+    assert not isinstance(sys.stdout, _ThreadOutput)
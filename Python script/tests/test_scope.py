@@ -0,0 +1,116 @@
+import pytest
+
+import providers.Phoenix as phoenix
+from providers.Models import Application, Component, Environment, Repo, Service, Team
+from providers.Scope import RunScope
+
+
+def component(name, teams, domain=None):
+    return Component(name, 'live', 'service', teams, [], 5, Domain=domain)
+
+
+def application(name, teams, components):
+    return Application(name, 'live', teams, [], 'owner@example.com', 5, Components=components)
+
+
+def environment(name, services):
+    return Environment(name, 'Production', 5, [], 'live', 'owner@example.com', Services=services)
+
+
+def service(name, team):
+    return Service(name, 'Cloud', 3, team)
+
+
+APPLICATIONS = [
+    application('payments-api', ['SP_payments'], [component('gateway', ['SP_payments'], 'finance'),
+                                                    component('search', ['SP_search'], 'discovery')]),
+    application('ledger', ['SP_ledger'], [component('journal', ['SP_ledger'], 'finance')]),
+    application('catalog', ['SP_search'], [])
+]
+ENVIRONMENTS = [environment('Production', [service('payments-db', 'SP_payments'), service('search-index', 'SP_search')]),
+                environment('Staging', [service('payments-db', 'SP_payments')])]
+TEAMS = [Team('SP_payments'), Team('SP_search'), Team('SP_ledger')]
+REPOS = [Repo('payments-repo', 'finance', 3, 'cards', 'SP_payments', 'build'),
+         Repo('search-repo', 'discovery', 3, 'index', 'SP_search', 'build')]
+
+
+def names(entities, key):
+    return [entity[key] for entity in entities]
+
+
+def test_without_filters_everything_is_kept():
+    scope = RunScope()
+    assert not scope.active
+    assert scope.select_applications(APPLICATIONS) is APPLICATIONS
+    assert scope.select_environments(ENVIRONMENTS) is ENVIRONMENTS
+    assert scope.select_teams(TEAMS) == TEAMS
+    assert scope.select_repos(REPOS) is REPOS
+    assert scope.selects_team('anything') and scope.includes_service('Production', 'SP_search')
+
+
+def test_app_filter_leaves_the_other_kinds_out():
+    scope = RunScope(apps=['PAYMENTS-*'])
+    selected = scope.select_applications(APPLICATIONS)
+    assert names(selected, 'AppName') == ['payments-api']
+    assert names(selected[0]['Components'], 'ComponentName') == ['gateway', 'search']
+    assert scope.select_environments(ENVIRONMENTS) == []
+    assert scope.select_teams(TEAMS) == []
+    assert scope.select_repos(REPOS) == []
+    assert not scope.selects_team('SP_payments')
+    assert not scope.includes_service('Thirdparty', 'Thirdparty')
+
+
+def test_team_filter_selects_what_the_team_owns():
+    scope = RunScope(teams=['sp_search'])
+    selected = scope.select_applications(APPLICATIONS)
+    # components of the team in other teams' applications, and the team's applications even without components
+    assert [(app['AppName'], names(app['Components'], 'ComponentName')) for app in selected] == \
+        [('payments-api', ['search']), ('catalog', [])]
+    assert [(env['Name'], names(env['Services'], 'Service')) for env in scope.select_environments(ENVIRONMENTS)] == \
+        [('Production', ['search-index'])]
+    assert names(scope.select_teams(TEAMS), 'TeamName') == ['SP_search']
+    assert names(scope.select_repos(REPOS), 'RepositoryName') == ['search-repo']
+
+
+def test_filters_combine():
+    scope = RunScope(teams=['SP_*'], domains=['finance'])
+    selected = scope.select_applications(APPLICATIONS)
+    assert [(app['AppName'], names(app['Components'], 'ComponentName')) for app in selected] == \
+        [('payments-api', ['gateway']), ('ledger', ['journal'])]
+    assert names(scope.select_repos(REPOS), 'RepositoryName') == ['payments-repo']
+
+    scope = RunScope(environments=['staging'], teams=['SP_payments'])
+    assert [(env['Name'], names(env['Services'], 'Service')) for env in scope.select_environments(ENVIRONMENTS)] == \
+        [('Staging', ['payments-db'])]
+    assert not scope.includes_service('Production', 'SP_payments')
+
+
+def test_deployment_environments_only_narrowed_by_environment():
+    assert RunScope(apps=['ledger']).deployment_environments(ENVIRONMENTS) is ENVIRONMENTS
+    assert names(RunScope(environments=['prod*']).deployment_environments(ENVIRONMENTS), 'Name') == ['Production']
+
+
+def test_describe():
+    assert RunScope(apps=['a*', 'b'], domains=['Finance']).describe() == "--app a* b, --domain finance"
+
+
+@pytest.mark.parametrize('run_scope, fetched', [
+    (RunScope(apps=['payments-api']), []),
+    (RunScope(domains=['finance']), []),
+    (RunScope(teams=['ledger']), ['team-ledger']),
+    (None, ['team-payments', 'team-ledger'])
+])
+def test_hive_team_members_only_fetched_for_teams_in_scope(monkeypatch, run_scope, fetched):
+    calls = []
+    monkeypatch.setattr(phoenix, 'scope', run_scope)
+    monkeypatch.setattr(phoenix, 'fetch_team_members', lambda pteams, headers: calls.extend(pteam['id'] for pteam in pteams) or
+                        {pteam['id']: [] for pteam in pteams})
+    monkeypatch.setattr(phoenix, 'assign_team_users', lambda team_id, emails, headers, exit_on_error=True: 0)
+    monkeypatch.setattr(phoenix, 'remove_team_members', lambda removals, headers: None)
+    teams = [{'TeamName': 'payments', 'TeamMembers': []}]
+    teams = teams if run_scope is None else [team for team in teams if run_scope.selects_team(team['TeamName'])]
+    hives = [{'Team': 'ledger', 'Lead': 'lead@example.com', 'Product': []}]
+
+    phoenix.assign_users_to_team([{'id': 'team-payments', 'name': 'payments'}, {'id': 'team-ledger', 'name': 'ledger'}],
+                                 [], teams, [], hives, 'token')
+    assert calls == fetched
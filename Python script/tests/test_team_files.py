@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+from providers.YamlHelper import populate_teams
+
+PAYMENTS = "TeamName: payments\nTeamMembers:\n- Name: dev\n  EmailAddress: dev@example.com\n"
+
+
+@pytest.fixture
+def resources(tmp_path):
+    (tmp_path / 'Teams').mkdir()
+    return tmp_path
+
+
+def write_team(resources, file_name, content):
+    (resources / 'Teams' / file_name).write_text(content)
+
+
+def test_teams_are_deduplicated_by_team_name(resources, capsys):
+    write_team(resources, 'payments.yaml', PAYMENTS)
+    write_team(resources, 'payments-copy.yaml', PAYMENTS)
+    write_team(resources, 'ledger.yaml', "TeamName: ledger\nTeamMembers: []\n")
+
+    teams = populate_teams(str(resources), workers=4)
+
+    assert sorted(team.TeamName for team in teams) == ['ledger', 'payments']
+    # identical duplicates are dropped silently
+    assert 'Warning' not in capsys.readouterr().out
+
+
+def test_a_conflicting_team_name_is_reported_with_both_files(resources, capsys):
+    write_team(resources, 'payments.yaml', PAYMENTS)
+    write_team(resources, 'payments-old.yaml', "TeamName: payments\nTeamMembers:\n- Name: old\n  EmailAddress: old@example.com\n")
+
+    [team] = populate_teams(str(resources), workers=4)
+
+    warning = re.search(r"Warning: team payments in (\S+) differs from (\S+), keeping (\S+)", capsys.readouterr().out)
+    assert warning
+    dropped, kept, keeping = warning.groups()
+    assert {dropped.rsplit('/', 1)[-1], kept.rsplit('/', 1)[-1]} == {'payments.yaml', 'payments-old.yaml'}
+    assert keeping == kept
+    expected_email = 'dev@example.com' if kept.endswith('/payments.yaml') else 'old@example.com'
+    assert [member['EmailAddress'] for member in team.TeamMembers] == [expected_email]
+
+
+def test_every_broken_team_file_is_reported_before_exiting(resources, capsys):
+    write_team(resources, 'payments.yaml', PAYMENTS)
+    write_team(resources, 'unnamed.yaml', "TeamMembers: []\n")
+    write_team(resources, 'list.yaml', "- payments\n")
+    write_team(resources, 'broken.yaml', "TeamName: [payments\n")
+
+    with pytest.raises(SystemExit):
+        populate_teams(str(resources), workers=4)
+
+    out = capsys.readouterr().out
+    assert 'Error: 3 team file(s) could not be loaded:' in out
+    assert 'unnamed.yaml: TeamName is missing' in out
+    assert 'list.yaml: expected a mapping with TeamName and TeamMembers' in out
+    assert 'broken.yaml: ' in out
@@ -0,0 +1,55 @@
+import pytest
+
+import providers.Phoenix as phoenix
+from providers.Scope import RunScope
+
+
+@pytest.fixture
+def team_api(monkeypatch):
+    """
+    Replaces the team member requests of assign_users_to_team, returns what was fetched, added and removed.
+    """
+    calls = {'fetched': [], 'added': {}, 'removed': []}
+    members = {
+        'team-payments': [{'email': 'dev@example.com'}, {'email': 'po@example.com'}, {'email': 'gone@example.com'}],
+        'team-ledger': [{'email': 'lead@example.com'}]
+    }
+
+    def fetch_team_members(pteams, headers):
+        calls['fetched'] += [pteam['id'] for pteam in pteams]
+        return {pteam['id']: members[pteam['id']] for pteam in pteams}
+
+    def assign_team_users(team_id, emails, headers, exit_on_error=True):
+        if emails:
+            calls['added'][team_id] = emails
+        return 0
+
+    monkeypatch.setattr(phoenix, 'fetch_team_members', fetch_team_members)
+    monkeypatch.setattr(phoenix, 'assign_team_users', assign_team_users)
+    monkeypatch.setattr(phoenix, 'remove_team_members', lambda removals, headers: calls['removed'].extend(removals))
+    monkeypatch.setattr(phoenix, 'scope', None)
+    return calls
+
+
+PTEAMS = [{'id': 'team-payments', 'name': 'payments'}, {'id': 'team-ledger', 'name': 'ledger'}]
+TEAMS = [{'TeamName': 'payments', 'TeamMembers': [{'EmailAddress': 'Dev@Example.com'}]}]
+HIVES = [{'Team': 'ledger', 'Lead': 'Lead@Example.com', 'Product': ['PO@Example.com', None]}]
+
+
+def test_members_are_reconciled_case_insensitively(team_api):
+    phoenix.assign_users_to_team(PTEAMS, [], TEAMS, [], HIVES, 'token')
+
+    assert team_api['fetched'] == ['team-payments', 'team-ledger']
+    # the product owner is hive staff whatever the case it is configured with, only the unknown member goes
+    assert team_api['removed'] == [('gone@example.com', 'team-payments')]
+    assert team_api['added'] == {'team-ledger': ['PO@Example.com']}
+
+
+def test_a_hive_without_lead_adds_no_lead(team_api, capsys):
+    hives = [{'Team': 'ledger', 'Lead': None, 'Product': [None]}]
+    phoenix.assign_users_to_team(PTEAMS, [], TEAMS, [], hives, 'token')
+
+    out = capsys.readouterr().out
+    assert 'Adding team lead' not in out
+    assert 'Adding Product Owner' not in out
+    assert 'team-ledger' not in team_api['added']
@@ -0,0 +1,99 @@
+import base64
+import json
+import os
+import time
+
+import requests
+
+from providers.PhoenixClient import PhoenixClient
+from providers.TokenManager import DEFAULT_TOKEN_TTL, TokenManager, get_token_expiry
+
+
+def jwt(name, expires_in):
+    claims = base64.urlsafe_b64encode(json.dumps({'sub': name, 'exp': time.time() + expires_in}).encode()).decode().rstrip('=')
+    return f"header.{claims}.signature"
+
+
+class TokenSource:
+    """
+    Hands out the given tokens one after another, counting the requests.
+    """
+
+    def __init__(self, *tokens):
+        self.tokens = list(tokens)
+        self.fetched = 0
+
+    def __call__(self):
+        self.fetched += 1
+        return self.tokens.pop(0)
+
+
+def test_token_expiry_is_read_from_the_exp_claim():
+    token = jwt('a', 600)
+    assert abs(get_token_expiry(token) - (time.time() + 600)) < 5
+    # tokens without an exp claim are assumed valid for the default ttl
+    assert abs(get_token_expiry('opaque-token') - (time.time() + DEFAULT_TOKEN_TTL)) < 5
+
+
+def test_token_is_reused_until_it_nears_expiry():
+    fresh, expiring, renewed = jwt('fresh', 3600), jwt('expiring', 60), jwt('renewed', 3600)
+    source = TokenSource(fresh)
+    manager = TokenManager(source, refresh_margin=300)
+    assert manager.get_token() == fresh
+    assert manager.get_token() == fresh
+    assert source.fetched == 1
+
+    # a token expiring within the refresh margin is replaced before it is used
+    source = TokenSource(expiring, renewed)
+    manager = TokenManager(source, refresh_margin=300)
+    assert manager.get_token() == expiring
+    assert manager.get_token() == renewed
+    assert source.fetched == 2
+
+
+def test_token_cache_file_is_private_and_reused_per_key(tmp_path):
+    cache_file = str(tmp_path / 'token.json')
+    token = jwt('cached', 3600)
+    TokenManager(TokenSource(token), 'tenant-a', cache_file).get_token()
+    assert os.stat(cache_file).st_mode & 0o777 == 0o600
+
+    source = TokenSource()
+    assert TokenManager(source, 'tenant-a', cache_file).get_token() == token
+    assert source.fetched == 0
+
+    other = jwt('other', 3600)
+    assert TokenManager(TokenSource(other), 'tenant-b', cache_file).get_token() == other
+    assert set(json.loads((tmp_path / 'token.json').read_text())) == {'tenant-a', 'tenant-b'}
+
+
+def test_expired_cached_token_is_not_reused(tmp_path):
+    cache_file = str(tmp_path / 'token.json')
+    TokenManager(TokenSource(jwt('old', 60)), 'tenant', cache_file).get_token()
+    renewed = jwt('renewed', 3600)
+    source = TokenSource(renewed)
+    assert TokenManager(source, 'tenant', cache_file).get_token() == renewed
+    assert source.fetched == 1
+
+
+def test_client_refreshes_the_token_once_on_401(monkeypatch):
+    first, second = jwt('first', 3600), jwt('second', 3600)
+    manager = TokenManager(TokenSource(first, second))
+    client = PhoenixClient("https://api.example.com")
+    client.use_token_manager(manager)
+    manager.get_token()
+    sent = []
+
+    def request(method, url, headers=None, **kwargs):
+        sent.append(headers['Authorization'])
+        response = requests.Response()
+        response.status_code = 200 if headers['Authorization'] == f"Bearer {second}" else 401
+        response.url = url
+        return response
+
+    monkeypatch.setattr(client.session, 'request', request)
+    # the caller's headers still carry the token it was given at the start of the run
+    response = client.get('/v1/teams', headers={'Authorization': f"Bearer {first}"})
+
+    assert response.status_code == 200
+    assert sent == [f"Bearer {first}", f"Bearer {second}"]
+    assert manager.refresh_count == 2
@@ -0,0 +1,23 @@
+import pytest
+
+from providers.Models import Repo
+from providers.Utils import get_subdomains, populate_domains, summarize_repositories
+from providers.YamlHelper import populate_subdomain_owners
+
+
+REPOS = [
+    {'RepositoryName': 'payments-api', 'Domain': 'finance', 'Tier': 1, 'Subdomain': 'payments', 'Team': 'payments', 'BuildDefinitionName': 'api'},
+    {'RepositoryName': 'payments-web', 'Domain': 'finance', 'Tier': 2, 'Subdomain': 'payments', 'Team': 'web', 'BuildDefinitionName': 'web'},
+    {'RepositoryName': 'ledger', 'Domain': 'core', 'Tier': 3, 'Subdomain': 'ledger', 'Team': 'payments', 'BuildDefinitionName': 'ledger'},
+]
+
+
+@pytest.mark.parametrize('repos', [REPOS, [Repo(**repo) for repo in REPOS]], ids=['dicts', 'models'])
+def test_repositories_are_summarized_from_dicts_and_models(repos):
+    domains, subdomains, owners = summarize_repositories(repos)
+
+    assert domains == populate_domains(repos) == ['finance', 'core']
+    # a subdomain keeps the domain and tier of its first repo
+    assert subdomains == get_subdomains(repos) == [{'Name': 'payments', 'Domain': 'finance', 'Tier': 1},
+                                                   {'Name': 'ledger', 'Domain': 'core', 'Tier': 3}]
+    assert owners == populate_subdomain_owners(repos) == {'payments': ['payments', 'web'], 'ledger': ['payments']}